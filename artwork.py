@@ -0,0 +1,195 @@
+# /opt/radio/artwork.py
+
+import io
+import os
+import hashlib
+import threading
+import config
+import http_client
+import id3_tags
+from logger import log
+
+try:
+    from PIL import Image  # Pillow
+except ImportError:
+    Image = None
+
+# Локальный кэш обложек.
+# Обложка трека скачивается один раз (при подготовке трека) или берется из
+# тегов локального файла и сохраняется в уменьшенных вариантах WebP и JPEG.
+# Слушатели получают их с нашего веб-сервера, а не с CDN Suno. Имя варианта — хэш адреса обложки, поэтому
+# содержимое по имени не меняется и браузер может кэшировать его надолго.
+# Кэш ограничен по размеру: удаляются обложки, которые дольше всех не звучали.
+
+ARTWORK_DIR = getattr(config, "ARTWORK_DIR", os.path.join(config.BASE_DIR, "artwork"))
+MAX_SIZE_MB = float(getattr(config, "ARTWORK_CACHE_MAX_MB", 100))
+# URL, по которому WebServerModule отдает варианты (относительно сайта)
+URL_PREFIX = "artwork/"
+# Адрес обложки, встроенной в теги локального файла (id3:<хэш картинки>)
+EMBEDDED_PREFIX = "id3:"
+
+COVER_SIZE = 512  # Обложка на странице и в MediaSession
+THUMB_SIZE = 96   # Миниатюра
+# Расширение -> (формат Pillow, параметры сохранения)
+_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+# Больше не качаем: это не обложка
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+_lock = threading.Lock()
+_pending = set()
+_warned = False
+
+
+def _key(url):
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+
+
+def _name(key, size, ext):
+    return f"{key}_{size}.{ext}"
+
+
+def _names(key):
+    return [_name(key, size, ext) for size in (COVER_SIZE, THUMB_SIZE) for ext in _FORMATS]
+
+
+def _cached(key):
+    return all(os.path.exists(os.path.join(ARTWORK_DIR, name)) for name in _names(key))
+
+
+def variants(url):
+    """
+    Адреса локальных вариантов обложки для now_playing.json или None,
+    если обложки еще нет в кэше. Отмечает обложку как недавно использованную.
+    """
+    if not url or Image is None:
+        return None
+    key = _key(url)
+    if not _cached(key):
+        return None
+    try:
+        os.utime(os.path.join(ARTWORK_DIR, _name(key, COVER_SIZE, "jpg")))
+    except OSError:
+        pass
+    return {
+        "image": URL_PREFIX + _name(key, COVER_SIZE, "jpg"),
+        "image_webp": URL_PREFIX + _name(key, COVER_SIZE, "webp"),
+        "thumb": URL_PREFIX + _name(key, THUMB_SIZE, "webp"),
+    }
+
+
+def _pillow_ready():
+    global _warned
+    if Image is None and not _warned:
+        _warned = True
+        log("⚠️ [Artwork] Pillow не установлен — обложки отдаются напрямую с CDN.")
+    return Image is not None
+
+
+def _save_variants(key, data):
+    """Сохраняет уменьшенные варианты картинки data под ключом key."""
+    with Image.open(io.BytesIO(data)) as source:
+        image = source.convert("RGB")
+    os.makedirs(ARTWORK_DIR, exist_ok=True)
+    for size in (COVER_SIZE, THUMB_SIZE):
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for ext, (fmt, params) in _FORMATS.items():
+            path = os.path.join(ARTWORK_DIR, _name(key, size, ext))
+            tmp_path = path + ".tmp"
+            resized.save(tmp_path, fmt, **params)
+            os.replace(tmp_path, path)
+    _evict(keep=key)
+
+
+def _download(url):
+    with http_client.session().get(url, timeout=15, stream=True) as r:
+        if r.status_code != 200:
+            log(f"⚠️ [Artwork] Ошибка скачивания обложки: HTTP {r.status_code}")
+            return None
+        data = r.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+    if len(data) > MAX_SOURCE_BYTES:
+        log(f"⚠️ [Artwork] Обложка больше {MAX_SOURCE_BYTES // 1048576} МБ, пропуск: {url}")
+        return None
+    return data
+
+
+def _embedded(filepath):
+    tags = id3_tags.read(filepath)
+    return tags.get("picture")
+
+
+def fetch(url, filepath=None):
+    """
+    Скачивает обложку и сохраняет ее варианты (если их еще нет).
+    Встроенная обложка (адрес id3:...) заново читается из тегов filepath.
+    Вызывается из потоков загрузки музыки. Возвращает True, если обложка в кэше.
+    """
+    if not url or not _pillow_ready():
+        return False
+    embedded = url.startswith(EMBEDDED_PREFIX)
+    if embedded and not filepath:
+        return False
+
+    key = _key(url)
+    with _lock:
+        if key in _pending:
+            return False
+        if _cached(key):
+            return True
+        _pending.add(key)
+
+    try:
+        data = _embedded(filepath) if embedded else _download(url)
+        if not data:
+            return False
+        _save_variants(key, data)
+        return True
+    except Exception as e:
+        log(f"⚠️ [Artwork] Не удалось обработать обложку {url}: {e}")
+        return False
+    finally:
+        with _lock:
+            _pending.discard(key)
+
+
+def embedded_url(data):
+    """
+    Адрес обложки, встроенной в теги файла (id3:<хэш картинки>), для поля
+    image трека или "", если картинки нет. Сама обложка не обрабатывается:
+    варианты создаст fetch(url, filepath), когда трек будет готовиться к эфиру.
+    """
+    if not data:
+        return ""
+    return EMBEDDED_PREFIX + hashlib.sha1(data).hexdigest()[:20]
+
+
+def _evict(keep):
+    """Удаляет обложки, которые дольше всех не использовались, пока кэш не влезет в лимит (кроме keep)."""
+    with _lock:
+        groups = {}  # ключ -> [время использования, размер]
+        total = 0
+        for entry in os.scandir(ARTWORK_DIR):
+            if not entry.is_file() or entry.name.endswith(".tmp"):
+                continue
+            key = entry.name.split("_", 1)[0]
+            st = entry.stat()
+            group = groups.setdefault(key, [0.0, 0])
+            group[0] = max(group[0], st.st_mtime)
+            group[1] += st.st_size
+            total += st.st_size
+
+        max_size = MAX_SIZE_MB * 1024 * 1024
+        for key, (_, size) in sorted(groups.items(), key=lambda item: item[1][0]):
+            if total <= max_size:
+                break
+            if key == keep:
+                continue
+            for name in _names(key):
+                try:
+                    os.remove(os.path.join(ARTWORK_DIR, name))
+                except FileNotFoundError:
+                    pass
+            total -= size
@@ -3,15 +3,177 @@
 import subprocess
 import os
 import time
+import errno
+import queue
+import threading
 import config
+import mp3_frames
+import stream_server
+import pretranscode
 from logger import log
 
+if getattr(config, "BROADCAST_MODE", "transcode") == "mixer":
+    import mixer  # Требует numpy
+
 _ffmpeg_process = None
 
+# Режим вещания:
+#   "transcode"   — FFmpeg декодирует вход и заново кодирует в libmp3lame (по умолчанию)
+#   "passthrough" — MP3-кадры уходят в Icecast без перекодирования (-c:a copy)
+#   "mixer"       — элементы сводятся микшером (mixer.py) в PCM с crossfade и ducking
+BROADCAST_MODE = getattr(config, "BROADCAST_MODE", "transcode")
+BROADCAST_BITRATE = int(getattr(config, "BROADCAST_BITRATE", 320))
+BROADCAST_SAMPLE_RATE = int(getattr(config, "BROADCAST_SAMPLE_RATE", 44100))
+AIR_DIR = getattr(config, "AIR_DIR", os.path.join(config.BASE_DIR, "air"))
+
+# Сколько секунд аудио держим "впереди" реального времени (запас в трубе FFmpeg)
+PACING_LEAD_SEC = float(getattr(config, "PACING_LEAD_SEC", 1.0))
+# Отставание, после которого часы эфира пересчитываются, а не догоняют рывком
+PACING_MAX_LAG_SEC = 0.5
+# Сколько секунд аудио отправлять в FFmpeg одним системным вызовом
+FEED_BATCH_SEC = 0.5
+# Размер блока для записи, если os.sendfile недоступен
+FEED_CHUNK_SIZE = 256 * 1024
+# Сколько раз подряд пробуем перезапустить FFmpeg и продолжить один и тот же трек
+MAX_RESUME_ATTEMPTS = 3
+# После сбоя трек продолжается на столько секунд раньше места, которое успело прозвучать
+RESUME_MARGIN_SEC = 0.5
+
+# Дополнительные качества, кодируемые из одного декодирования основного потока.
+# Пример: [{"mount": "/stream128", "codec": "libmp3lame", "bitrate": "128k"},
+#          {"mount": "/stream64.ogg", "codec": "libopus", "bitrate": "64k",
+#           "format": "ogg", "content_type": "audio/ogg"}]
+RENDITIONS = getattr(config, "RENDITIONS", [])
+PCM_CHANNELS = 2
+
+# Вещание в Icecast и/или во встроенный сервер раздачи (stream_server.py)
+ICECAST_ENABLED = getattr(config, "ICECAST_ENABLED", True)
+STREAM_SERVER_ENABLED = getattr(config, "STREAM_SERVER_ENABLED", False)
+PCM_CHUNK_SIZE = 64 * 1024
+# Как часто писать в лог загрузку CPU кодировщиками (сек)
+RENDITION_STATS_INTERVAL = 300
+# Сколько секунд PCM копится для отставшего кодировщика; дальше куски для него выбрасываются
+RENDITION_BUFFER_SEC = 2.0
+
+_mixer = None
+
+# [{"config": ..., "process": Popen, "cpu": (сек CPU, момент замера), "queue": Queue, "dropped": кусков}]
+_renditions = []
+_pump_thread = None
+# Поколение кодировщиков: растет при каждой остановке, потоки старого поколения завершаются
+_renditions_generation = 0
+_renditions_lock = threading.Lock()
+# Основной процесс в том же формате, что и кодировщики, — для общей статистики CPU
+_main_stream = {
+    "config": {"mount": config.MOUNT_POINT,
+               "codec": "copy" if BROADCAST_MODE == "passthrough" else "libmp3lame",
+               "bitrate": f"{BROADCAST_BITRATE}k"},
+    "process": None,
+    "cpu": (0.0, time.monotonic())
+}
+
+# --- ЗАЩИТА ОТ ПРОВАЛОВ (UNDERRUN) ---
+# Если дольше UNDERRUN_GRACE_SEC нечего играть, в эфир идет заполнитель
+# (тишина или джингл FILLER_FILE по кругу), чтобы Icecast не сбросил источник.
+UNDERRUN_GRACE_SEC = float(getattr(config, "UNDERRUN_GRACE_SEC", 1.0))
+FILLER_FILE = getattr(config, "FILLER_FILE", "")
+FILLER_CHUNK_SEC = 0.1
+
+_write_lock = threading.Lock()
+_content_arrived = threading.Event()
+# Оператор попросил пропустить текущий элемент (skip_current)
+_skip_requested = threading.Event()
+_feeding = False
+_last_feed_end = time.monotonic()
+_filler_chunks = None
+_watchdog_started = False
+_underrun_stats = {"events": 0, "seconds": 0.0, "active": False}
+
+_sendfile_supported = hasattr(os, "sendfile")
+
+# Счетчики передачи данных в FFmpeg (за все время работы)
+_feed_stats = {"bytes": 0, "syscalls": 0, "seconds": 0.0, "tracks": 0}
+
+class PacingClock:
+    """
+    Часы эфира: темп задает Python, а не FFmpeg (-re).
+    Считают, сколько аудио отдано (по длительности кадров/PCM), и выпускают
+    данные по монотонному времени с опережением PACING_LEAD_SEC. Часы общие
+    для всех элементов, поэтому паузы между ними не накапливают дрейф:
+    небольшое отставание догоняется, большое — сбрасывается (коррекция дрейфа),
+    чтобы не завалить Icecast рывком данных.
+    """
+
+    def __init__(self, lead_sec, max_lag_sec):
+        self.lead_sec = lead_sec
+        self.max_lag_sec = max_lag_sec
+        self.lock = threading.Lock()
+        self.origin = None      # Момент monotonic, соответствующий media_time = 0
+        self.media_time = 0.0   # Сколько секунд аудио отдано с момента origin
+        self.corrections = 0
+
+    def advance(self, duration):
+        """Учитывает только что отправленные duration секунд аудио."""
+        with self.lock:
+            now = time.monotonic()
+            if self.origin is None:
+                self.origin = now
+            # Отстали сильнее допустимого (провал, перезапуск) — пересчитываем часы
+            elif self.media_time - (now - self.origin) < -self.max_lag_sec:
+                self.origin = now - self.media_time
+                self.corrections += 1
+            self.media_time += duration
+
+    def offset(self):
+        """Опережение (>0) или отставание (<0) отданного аудио от реального времени, сек."""
+        with self.lock:
+            if self.origin is None:
+                return 0.0
+            return self.media_time - (time.monotonic() - self.origin)
+
+    def wait(self, interrupt=None):
+        """Ждет, пока опережение не станет меньше PACING_LEAD_SEC (или до interrupt)."""
+        ahead = self.offset() - self.lead_sec
+        if ahead > 0:
+            if interrupt is not None:
+                interrupt.wait(ahead)
+            else:
+                time.sleep(ahead)
+
+_clock = PacingClock(PACING_LEAD_SEC, PACING_MAX_LAG_SEC)
+
+def get_clock_stats():
+    """
+    Состояние часов эфира: lead_sec — сколько секунд уже отданного аудио
+    еще не прозвучало (>0) или насколько эфир отстает (<0). Позволяет
+    точно рассчитать момент окончания текущего трека.
+    """
+    return {
+        "lead_sec": _clock.offset(),
+        "media_time": _clock.media_time,
+        "drift_corrections": _clock.corrections
+    }
+
+class _Skipped(Exception):
+    """Текущий элемент прерван по команде skip_current()."""
+
+def skip_current():
+    """
+    Прерывает элемент, который сейчас идет в эфир (с границы ближайшей пачки кадров).
+    Возвращает False, если в эфир сейчас ничего не передается.
+    """
+    if not _feeding:
+        return False
+    _skip_requested.set()
+    return True
+
+def _icecast_url(mount=None):
+    return f'icecast://source:{config.ICECAST_PASSWORD}@{config.ICECAST_HOST}:{config.ICECAST_PORT}{mount or config.MOUNT_POINT}'
+
 def start_stream():
     """Запускает FFmpeg один раз, ожидая данные через stdin (трубу)."""
-    global _ffmpeg_process
-    
+    global _ffmpeg_process, _watchdog_started
+
     # Убиваем старый процесс, если он есть
     if _ffmpeg_process and _ffmpeg_process.poll() is None:
         try:
@@ -19,35 +181,595 @@ def start_stream():
             _ffmpeg_process.wait(timeout=2)
         except:
             _ffmpeg_process.kill()
+    _stop_renditions()
+
+    # Темп задают часы эфира (PacingClock), поэтому FFmpeg запускается без -re
+    if BROADCAST_MODE == "passthrough":
+        command = [
+            config.FFMPEG_PATH,
+            '-f', 'mp3',
+            '-i', 'pipe:0',  # Читаем из stdin
+            '-c:a', 'copy',
+        ]
+    elif BROADCAST_MODE == "mixer":
+        # На вход идет уже смикшированный PCM
+        command = [
+            config.FFMPEG_PATH,
+            '-f', 's16le',
+            '-ar', str(BROADCAST_SAMPLE_RATE),
+            '-ac', str(PCM_CHANNELS),
+            '-i', 'pipe:0',  # Читаем из stdin
+            '-acodec', 'libmp3lame',
+            '-ab', f'{BROADCAST_BITRATE}k',
+            '-q:a', '0',
+        ]
+    else:
+        command = [
+            config.FFMPEG_PATH,
+            '-f', 'mp3',
+            '-i', 'pipe:0',  # Читаем из stdin
+            '-acodec', 'libmp3lame',
+            '-ab', f'{BROADCAST_BITRATE}k',
+            '-ar', str(BROADCAST_SAMPLE_RATE),
+            '-q:a', '0',
+        ]
+
+    # Параметры кодека относятся к конкретному выходу, поэтому повторяем их для каждого
+    codec_args = command[command.index('pipe:0') + 1:]
+    pass_fds = ()
+    fanout_read_fd = None
+
+    if ICECAST_ENABLED:
+        command += [
+            '-content_type', 'audio/mpeg',
+            '-ice_name', 'Mafioznik Radio',
+            '-ice_description', 'Non-stop AI Music',
+            '-f', 'mp3',
+            _icecast_url()
+        ]
 
-    command = [
+    if STREAM_SERVER_ENABLED:
+        # Тот же MP3 во встроенный сервер раздачи — через отдельную трубу
+        fanout_read_fd, fanout_write_fd = os.pipe()
+        pass_fds = (fanout_write_fd,)
+        if ICECAST_ENABLED:
+            command += codec_args
+        command += ['-f', 'mp3', f'pipe:{fanout_write_fd}']
+
+    if RENDITIONS:
+        # Второй выход того же процесса: декодированный PCM в stdout для доп. качеств
+        command += [
+            '-c:a', 'pcm_s16le',
+            '-ar', str(BROADCAST_SAMPLE_RATE),
+            '-ac', str(PCM_CHANNELS),
+            '-f', 's16le',
+            'pipe:1'
+        ]
+
+    log(f"🎙️ Запуск основного процесса вещания FFmpeg (режим: {BROADCAST_MODE})...")
+    _ffmpeg_process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE if RENDITIONS else subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        pass_fds=pass_fds
+    )
+
+    if fanout_read_fd is not None:
+        os.close(pass_fds[0])
+        server = stream_server.start()
+        threading.Thread(target=_pump_fanout, args=(fanout_read_fd, server), daemon=True).start()
+
+    _main_stream["process"] = _ffmpeg_process
+    _main_stream["cpu"] = (0.0, time.monotonic())
+
+    if RENDITIONS:
+        _start_renditions(_ffmpeg_process.stdout)
+
+    if not _watchdog_started:
+        _watchdog_started = True
+        threading.Thread(target=_underrun_watchdog, daemon=True).start()
+
+def _pump_fanout(read_fd, server):
+    """Переносит закодированный поток из FFmpeg в кольцевой буфер сервера раздачи."""
+    with os.fdopen(read_fd, 'rb', buffering=0) as source:
+        while True:
+            chunk = source.read(PCM_CHUNK_SIZE)
+            if not chunk: break  # FFmpeg завершился
+            server.feed(chunk)
+
+# --- ДОПОЛНИТЕЛЬНЫЕ КАЧЕСТВА (RENDITIONS) ---
+
+def _rendition_command(rendition):
+    """Команда FFmpeg-кодировщика одного качества: PCM из stdin -> свой mount в Icecast."""
+    return [
         config.FFMPEG_PATH,
-        '-re',
-        '-f', 'mp3',
-        '-i', 'pipe:0',  # Читаем из stdin
-        '-acodec', 'libmp3lame',
-        '-ab', '320k',
-        '-ar', '44100',
-        '-q:a', '0', 
-        '-content_type', 'audio/mpeg',
+        '-f', 's16le',
+        '-ar', str(BROADCAST_SAMPLE_RATE),
+        '-ac', str(PCM_CHANNELS),
+        '-i', 'pipe:0',
+        '-c:a', rendition.get('codec', 'libmp3lame'),
+        '-b:a', rendition.get('bitrate', '128k'),
+        '-content_type', rendition.get('content_type', 'audio/mpeg'),
         '-ice_name', 'Mafioznik Radio',
         '-ice_description', 'Non-stop AI Music',
-        '-f', 'mp3',
-        f'icecast://source:{config.ICECAST_PASSWORD}@{config.ICECAST_HOST}:{config.ICECAST_PORT}{config.MOUNT_POINT}'
+        '-f', rendition.get('format', 'mp3'),
+        _icecast_url(rendition['mount'])
     ]
-    
-    log("🎙️ Запуск основного процесса вещания FFmpeg...")
-    _ffmpeg_process = subprocess.Popen(
-        command, 
-        stdin=subprocess.PIPE, 
-        stdout=subprocess.DEVNULL, 
+
+def _start_rendition(rendition):
+    return subprocess.Popen(
+        _rendition_command(rendition),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL
     )
 
-def feed_to_stream(filepath):
-    """Отправляет аудиофайл в запущенный процесс FFmpeg."""
-    global _ffmpeg_process
-    
+def _start_renditions(pcm_source):
+    """
+    Запускает кодировщики всех качеств и поток, раздающий им общий PCM.
+    У каждого кодировщика своя ограниченная очередь и свой поток записи,
+    поэтому медленный кодировщик не задерживает остальные и основной поток.
+    """
+    global _pump_thread
+    bytes_per_sec = BROADCAST_SAMPLE_RATE * PCM_CHANNELS * 2
+    queue_size = max(2, int(RENDITION_BUFFER_SEC * bytes_per_sec / PCM_CHUNK_SIZE))
+    with _renditions_lock:
+        generation = _renditions_generation
+        for rendition in RENDITIONS:
+            item = {
+                "config": rendition,
+                "process": _start_rendition(rendition),
+                "cpu": (0.0, time.monotonic()),
+                "queue": queue.Queue(maxsize=queue_size),
+                "dropped": 0
+            }
+            _renditions.append(item)
+            threading.Thread(target=_write_rendition, args=(item, generation), daemon=True).start()
+            log(f"📶 Качество {rendition.get('bitrate', '128k')} ({rendition.get('codec', 'libmp3lame')}) -> {rendition['mount']}")
+        renditions = list(_renditions)
+
+    _pump_thread = threading.Thread(target=_pump_pcm, args=(pcm_source, renditions, generation), daemon=True)
+    _pump_thread.start()
+
+def _stop_renditions():
+    global _renditions_generation
+    with _renditions_lock:
+        # Потоки старого поколения больше не перезапускают кодировщики
+        _renditions_generation += 1
+        renditions = list(_renditions)
+        _renditions.clear()
+
+    for item in renditions:
+        _wake_writer(item["queue"])
+        process = item["process"]
+        if process.poll() is None:
+            try:
+                process.terminate()
+                process.wait(timeout=2)
+            except:
+                process.kill()
+
+def _wake_writer(chunks):
+    """Будит поток записи кодировщика, чтобы он увидел смену поколения."""
+    while True:
+        try:
+            chunks.put_nowait(None)
+            return
+        except queue.Full:
+            try:
+                chunks.get_nowait()
+            except queue.Empty:
+                pass
+
+def _write_rendition(item, generation):
+    """Поток записи одного кодировщика: берет PCM из его очереди. Упавший кодировщик перезапускается."""
+    while True:
+        chunk = item["queue"].get()
+        if chunk is None or generation != _renditions_generation:
+            return
+        try:
+            item["process"].stdin.write(chunk)
+        except (BrokenPipeError, IOError):
+            with _renditions_lock:
+                if generation != _renditions_generation:
+                    return  # Кодировщики уже остановлены или запущены заново
+                log(f"⚠️ Кодировщик {item['config']['mount']} упал, перезапускаем...")
+                item["process"] = _start_rendition(item["config"])
+                item["cpu"] = (0.0, time.monotonic())
+
+def _pump_pcm(pcm_source, renditions, generation):
+    """
+    Читает PCM, один раз декодированный основным FFmpeg, и раздает его
+    в очереди кодировщиков всех качеств. Если очередь кодировщика полна
+    (он не успевает), кусок для него выбрасывается, а не задерживает эфир.
+    """
+    last_report = time.monotonic()
+    while generation == _renditions_generation:
+        chunk = pcm_source.read1(PCM_CHUNK_SIZE)
+        if not chunk: break  # Основной FFmpeg завершился — start_stream поднимет все заново
+
+        for item in renditions:
+            try:
+                item["queue"].put_nowait(chunk)
+            except queue.Full:
+                if not item["dropped"]:
+                    log(f"⚠️ Кодировщик {item['config']['mount']} не успевает, часть PCM для него пропускается.")
+                item["dropped"] += 1
+
+        if time.monotonic() - last_report >= RENDITION_STATS_INTERVAL:
+            last_report = time.monotonic()
+            for stat in get_rendition_stats():
+                log(f"📈 CPU кодировщика {stat['mount']} ({stat['bitrate']} {stat['codec']}): {stat['cpu_percent']:.1f}%"
+                    f", пропущено кусков PCM: {stat['dropped']}")
+
+def _process_cpu_seconds(pid):
+    """Процессорное время процесса (user + system) из /proc, в секундах."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # После имени процесса: поля 14 и 15 (utime, stime) идут 12-м и 13-м
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def get_rendition_stats():
+    """
+    Загрузка CPU каждым кодировщиком с прошлого замера (в % одного ядра).
+    Первой строкой идет основной процесс (декодирование + основной mount).
+    """
+    stats = []
+    now = time.monotonic()
+    items = ([_main_stream] if _main_stream["process"] is not None else []) + list(_renditions)
+
+    for item in items:
+        cpu_now = _process_cpu_seconds(item["process"].pid)
+        if cpu_now is None: continue
+        cpu_before, measured_at = item["cpu"]
+        item["cpu"] = (cpu_now, now)
+        stats.append({
+            "mount": item["config"]["mount"],
+            "codec": item["config"].get("codec", "libmp3lame"),
+            "bitrate": item["config"].get("bitrate", "128k"),
+            "cpu_percent": (cpu_now - cpu_before) * 100 / (now - measured_at) if now > measured_at else 0.0,
+            "dropped": item.get("dropped", 0)
+        })
+    return stats
+
+def _matches_broadcast_format(filepath):
+    """Проверяет, что все кадры файла — MPEG-1 Layer III с целевыми частотой и битрейтом."""
+    try:
+        data = mp3_frames.read_file(filepath)
+    except OSError:
+        return False
+
+    found = False
+    for _, header in mp3_frames.iter_frames(data):
+        found = True
+        if (header.version != 1 or header.layer != 3
+                or header.sample_rate != BROADCAST_SAMPLE_RATE
+                or header.bitrate != BROADCAST_BITRATE):
+            return False
+    return found
+
+def _air_copy_path(filepath):
+    os.makedirs(AIR_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(AIR_DIR, f"{name}_{int(time.time() * 1000)}.mp3")
+
+def prepare_for_air(filepath, gain_db=None):
+    """
+    Готовит файл к эфиру заранее (вызывается конвейером подготовки, а не в момент эфира).
+    Если файл уже перекодирован в фоне (pretranscode.submit), берется готовый
+    результат. Иначе в passthrough-режиме файлы с "чужими" параметрами
+    перекодируются здесь. Усиление (из индекса громкости) применяется без
+    перекодирования — сдвигом global_gain в MP3-кадрах.
+    Возвращает путь к файлу, который нужно отдавать в эфир.
+    """
+    gain_steps = round(gain_db / mp3_frames.GAIN_STEP_DB) if gain_db else 0
+    air_path = pretranscode.take(filepath)
+    if air_path is None and BROADCAST_MODE == "passthrough" and not _matches_broadcast_format(filepath):
+        air_path = pretranscode.transcode(filepath)
+    source = air_path or filepath
+
+    if not gain_steps:
+        return source
+    try:
+        adjusted = mp3_frames.apply_gain(mp3_frames.read_file(source), gain_steps)
+        if adjusted is None:
+            return source
+        target = air_path or _air_copy_path(filepath)
+        with open(target, 'wb') as f:
+            f.write(adjusted)
+    except OSError as e:
+        log(f"⚠️ Не удалось применить усиление ({e}): {filepath}")
+        return source
+    log(f"🔊 Громкость выровнена ({gain_steps * mp3_frames.GAIN_STEP_DB:+.1f} дБ): {os.path.basename(filepath)}")
+    return target
+
+def _send_range(f, offset, count, stats):
+    """
+    Передает диапазон файла в трубу FFmpeg без копирования через Python:
+    os.sendfile, а если он недоступен — крупными блоками через memoryview.
+    """
+    global _sendfile_supported
+    out_fd = _ffmpeg_process.stdin.fileno()
+    end = offset + count
+    buf = None
+
+    while offset < end:
+        if _sendfile_supported:
+            try:
+                sent = os.sendfile(out_fd, f.fileno(), offset, end - offset)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+                    raise
+                # Ядро не умеет sendfile в трубу — переходим на обычную запись
+                log("ℹ️ os.sendfile недоступен для трубы FFmpeg, пишу блоками.")
+                _sendfile_supported = False
+                continue
+        else:
+            if buf is None:
+                buf = bytearray(FEED_CHUNK_SIZE)
+            f.seek(offset)
+            read = f.readinto(memoryview(buf)[:min(FEED_CHUNK_SIZE, end - offset)])
+            stats["syscalls"] += 1
+            if not read: break
+            sent = os.write(out_fd, memoryview(buf)[:read])
+
+        stats["syscalls"] += 1
+        if not sent: break  # Файл оказался короче, чем ожидали
+        offset += sent
+        stats["bytes"] += sent
+        _note_recovered(stats)
+
+def _feed_frames(f, stats, start=None):
+    """
+    Отправляет MP3-кадры файла в FFmpeg пачками по FEED_BATCH_SEC,
+    выпуская каждую пачку по часам эфира (длительность — из заголовков кадров).
+    """
+    data = mp3_frames.read_file(f.name)
+
+    # Непрерывные участки кадров отправляем одним системным вызовом
+    batch_start, batch_end, batch_time = None, None, 0.0
+
+    def send_batch():
+        if _skip_requested.is_set():
+            raise _Skipped()
+        _send_range(f, batch_start, batch_end - batch_start, stats)
+        _clock.advance(batch_time)
+        # Где кончилась пачка в файле и на часах эфира — чтобы после сбоя продолжить с прозвучавшего места
+        stats["batches"].append((batch_end, _clock.media_time))
+        _clock.wait(_skip_requested)
+
+    for offset, header in mp3_frames.iter_frames(data, start):
+        if batch_start is not None and offset != batch_end:
+            # Между кадрами мусор — отправляем накопленное
+            send_batch()
+            batch_start = None
+
+        if batch_start is None:
+            batch_start, batch_end, batch_time = offset, offset, 0.0
+        batch_end = offset + header.size
+        batch_time += mp3_frames.frame_duration(header)
+
+        if batch_time >= FEED_BATCH_SEC:
+            send_batch()
+            batch_start = None
+
+    if batch_start is not None:
+        send_batch()
+
+def _write_all(data, stats):
+    """Пишет данные в FFmpeg напрямую в дескриптор, без буферизации."""
+    out_fd = _ffmpeg_process.stdin.fileno()
+    view = memoryview(data)
+    while view:
+        sent = os.write(out_fd, view)
+        stats["syscalls"] += 1
+        stats["bytes"] += sent
+        view = view[sent:]
+
+def _write_pcm_paced(data, stats):
+    """Пишет PCM микшера кусками по PCM_CHUNK_SIZE, выпуская их по часам эфира."""
+    bytes_per_sec = BROADCAST_SAMPLE_RATE * PCM_CHANNELS * 2
+    view = memoryview(data)
+    for i in range(0, len(view), PCM_CHUNK_SIZE):
+        if _skip_requested.is_set():
+            raise _Skipped()
+        chunk = view[i:i + PCM_CHUNK_SIZE]
+        _write_all(chunk, stats)
+        _clock.advance(len(chunk) / bytes_per_sec)
+        _clock.wait(_skip_requested)
+
+def talks_over(kind):
+    """Элемент kind звучит поверх начала следующего трека (речь в режиме микшера)."""
+    return BROADCAST_MODE == "mixer" and kind != "music"
+
+def _feed_mixer(filepath, kind, stats, bed=None):
+    """Отдает элемент микшеру (crossfade между треками, приглушение музыки под речь)."""
+    global _mixer
+    if _mixer is None:
+        _mixer = mixer.Mixer(BROADCAST_SAMPLE_RATE, PCM_CHANNELS)
+    _mixer.play(filepath, kind, lambda data: _write_pcm_paced(data, stats), bed)
+    stats["mixer_cpu"] = _mixer.stats["last_cpu_seconds"]
+
+def _load_filler():
+    """
+    Готовит заполнитель один раз: список (данные, длительность) по ~FILLER_CHUNK_SEC.
+    В режиме микшера — PCM, иначе — MP3-кадры в формате эфира.
+    """
+    if BROADCAST_MODE == "mixer":
+        pcm = b""
+        if FILLER_FILE and os.path.exists(FILLER_FILE):
+            try:
+                pcm = subprocess.run(
+                    [config.FFMPEG_PATH, '-v', 'error', '-i', FILLER_FILE, '-t', '60',
+                     '-f', 's16le', '-ac', str(PCM_CHANNELS), '-ar', str(BROADCAST_SAMPLE_RATE), 'pipe:1'],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=60
+                ).stdout
+            except Exception as e:
+                log(f"⚠️ Не удалось декодировать заполнитель {FILLER_FILE}: {e}")
+        bytes_per_sec = BROADCAST_SAMPLE_RATE * PCM_CHANNELS * 2
+        step = int(bytes_per_sec * FILLER_CHUNK_SEC) // (PCM_CHANNELS * 2) * (PCM_CHANNELS * 2)
+        if not pcm:
+            pcm = bytes(step)
+        return [(pcm[i:i + step], len(pcm[i:i + step]) / bytes_per_sec) for i in range(0, len(pcm), step)]
+
+    frames = []
+    if FILLER_FILE and os.path.exists(FILLER_FILE):
+        air_path = prepare_for_air(FILLER_FILE)
+        data = mp3_frames.read_file(air_path)
+        if air_path != FILLER_FILE:
+            # Перекодированная копия нужна только для чтения кадров — не оставляем ее в AIR_DIR
+            try:
+                os.remove(air_path)
+            except OSError:
+                pass
+        frames = [(data[o:o + h.size], mp3_frames.frame_duration(h)) for o, h in mp3_frames.iter_frames(data)]
+    if not frames:
+        silence = mp3_frames.silent_frame(BROADCAST_BITRATE, BROADCAST_SAMPLE_RATE)
+        frame_time = 1152 / BROADCAST_SAMPLE_RATE
+        frames = [(silence, frame_time)] * max(1, round(FILLER_CHUNK_SEC / frame_time))
+
+    # Склеиваем кадры в куски по FILLER_CHUNK_SEC, чтобы не писать по одному кадру
+    chunks, chunk, duration = [], b"", 0.0
+    for frame, frame_time in frames:
+        chunk += frame
+        duration += frame_time
+        if duration >= FILLER_CHUNK_SEC:
+            chunks.append((chunk, duration))
+            chunk, duration = b"", 0.0
+    if chunk:
+        chunks.append((chunk, duration))
+    return chunks
+
+def _play_filler():
+    """Играет заполнитель в темпе эфира, пока feed_to_stream не принесет контент."""
+    global _filler_chunks
+    if _filler_chunks is None:
+        _filler_chunks = _load_filler()
+
+    started = time.monotonic()
+    stats = {"bytes": 0, "syscalls": 0}
+    _underrun_stats["events"] += 1
+    _underrun_stats["active"] = True
+    log("🕳️ Нечего играть — в эфире заполнитель.")
+
+    try:
+        if _mixer is not None:
+            with _write_lock:
+                if not _content_arrived.is_set():
+                    _mixer.flush(lambda data: _write_pcm_paced(data, stats))
+
+        while not _content_arrived.is_set():
+            for chunk, duration in _filler_chunks:
+                if _content_arrived.is_set(): break
+                with _write_lock:
+                    # Пока ждали трубу, мог начаться элемент — его начало заполнитель не трогает
+                    if _content_arrived.is_set(): break
+                    _write_all(chunk, stats)
+                _clock.advance(duration)
+                _clock.wait(_content_arrived)
+    except (OSError, _Skipped):
+        pass  # FFmpeg упал — его перезапустит feed_to_stream
+    finally:
+        elapsed = time.monotonic() - started
+        _underrun_stats["seconds"] += elapsed
+        _underrun_stats["active"] = False
+        log(f"✅ Провал в эфире закрыт заполнителем: {elapsed:.1f} сек "
+            f"(всего {_underrun_stats['events']} раз, {_underrun_stats['seconds']:.0f} сек).")
+
+def _underrun_watchdog():
+    """Следит за простоем вещателя и включает заполнитель при нехватке контента."""
+    while True:
+        time.sleep(0.2)
+        if _feeding or time.monotonic() - _last_feed_end < UNDERRUN_GRACE_SEC:
+            continue
+        if _ffmpeg_process is None or _ffmpeg_process.poll() is not None:
+            continue
+        try:
+            _play_filler()
+        except Exception as e:
+            log(f"❌ Ошибка заполнителя эфира: {e}")
+            time.sleep(1)
+
+def get_underrun_stats():
+    """Сколько раз и сколько секунд в эфире звучал заполнитель."""
+    return dict(_underrun_stats)
+
+def _aired_offset(stats):
+    """
+    Смещение в файле, до которого трек точно прозвучал: отданное в FFmpeg,
+    но еще не наступившее по часам эфира (опережение) могло пропасть вместе
+    с процессом. Берется с запасом RESUME_MARGIN_SEC.
+    """
+    aired = _clock.media_time - max(0.0, _clock.offset()) - RESUME_MARGIN_SEC
+    offset = 0
+    for batch_end, media_time in stats["batches"]:
+        if media_time > aired: break
+        offset = batch_end
+    return offset
+
+def _resume_offset(filepath, aired):
+    """
+    Ближайшая к aired граница MP3-кадра, с которой можно продолжить трек.
+    Возвращает -1, если дальше в файле кадров нет.
+    """
+    data = mp3_frames.read_file(filepath)
+    if aired <= mp3_frames.id3v2_size(data):
+        return 0
+    return mp3_frames.find_frame(data, aired)
+
+def _note_recovered(stats):
+    """Первая удачная запись после перезапуска FFmpeg: звук снова идет."""
+    failed_at = stats.pop("failed_at", None)
+    if failed_at is not None:
+        log(f"⏱️ Звук снова идет через {(time.monotonic() - failed_at) * 1000:.0f} мс после сбоя FFmpeg.")
+
+def get_feed_stats():
+    """Суммарная статистика передачи в FFmpeg (байты, системные вызовы, байт/сек)."""
+    stats = dict(_feed_stats)
+    stats["bytes_per_sec"] = stats["bytes"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def _record_feed_stats(filepath, stats, elapsed):
+    """Пишет статистику по треку в лог и добавляет ее к общим счетчикам."""
+    _feed_stats["bytes"] += stats["bytes"]
+    _feed_stats["syscalls"] += stats["syscalls"]
+    _feed_stats["seconds"] += elapsed
+    _feed_stats["tracks"] += 1
+
+    rate = stats["bytes"] / elapsed if elapsed > 0 else 0.0
+    log(f"📊 Передано {stats['bytes'] / 1024:.0f} КБ за {elapsed:.1f} сек "
+        f"({rate / 1024:.1f} КБ/с, системных вызовов: {stats['syscalls']}): {os.path.basename(filepath)}")
+    clock = get_clock_stats()
+    log(f"⏱️ Часы эфира: опережение {clock['lead_sec']:+.2f} сек, коррекций дрейфа: {clock['drift_corrections']}")
+    if "mixer_cpu" in stats and elapsed > 0:
+        log(f"🎚️ Микшер: CPU {stats['mixer_cpu'] * 1000:.0f} мс ({stats['mixer_cpu'] * 100 / elapsed:.2f}% ядра)")
+
+def feed_to_stream(filepath, kind="music", bed=None):
+    """
+    Отправляет аудиофайл в запущенный процесс FFmpeg.
+    kind — тип события ("music", "dj", ...): в режиме микшера от него зависит
+    переход (crossfade для музыки, приглушение музыки под остальное).
+    bed — следующий трек, который микшер пустит приглушенным под речь (см. talks_over).
+    """
+    global _feeding, _last_feed_end
+
+    # Останавливаем заполнитель (если играл) и занимаем трубу FFmpeg
+    _feeding = True
+    _content_arrived.set()
+    try:
+        with _write_lock:
+            _feed_file(filepath, kind, bed)
+    finally:
+        _last_feed_end = time.monotonic()
+        _content_arrived.clear()
+        _feeding = False
+
+def _feed_file(filepath, kind, bed=None):
+    """Передает файл в FFmpeg (вызывается под _write_lock)."""
     if not os.path.exists(filepath):
         log(f"⚠️ Файл не найден: {filepath}")
         return
@@ -63,20 +785,46 @@ def feed_to_stream(filepath):
         start_stream()
         time.sleep(1) # Даем ему секунду на старт
 
+    stats = {"bytes": 0, "syscalls": 0, "batches": []}
+    started = time.monotonic()
+    _skip_requested.clear()
+    resume_from = None
+    attempts = 0
     try:
         with open(filepath, 'rb') as f:
             while True:
-                chunk = f.read(4096)
-                if not chunk: break
-                
                 try:
-                    _ffmpeg_process.stdin.write(chunk)
-                    _ffmpeg_process.stdin.flush()
+                    if BROADCAST_MODE == "mixer":
+                        _feed_mixer(filepath, kind, stats, bed)
+                    else:
+                        _feed_frames(f, stats, resume_from)
+                    break
+
+                except _Skipped:
+                    log(f"⏭️ Пропуск по команде оператора: {os.path.basename(filepath)}")
+                    break
+
                 except (BrokenPipeError, IOError):
+                    failed_at = time.monotonic()
+                    # Место, до которого трек успел прозвучать, — до того, как часы уйдут вперед
+                    aired = _aired_offset(stats)
                     log("❌ Ошибка записи в FFmpeg (Broken Pipe). Перезапуск потока.")
                     start_stream()
-                    # Пробуем дослать остаток файла в новый поток, или просто выходим
-                    return 
-                    
+
+                    # Продолжаем тот же трек с ближайшей границы кадра, а не с начала
+                    # (микшер работает с PCM, смещения в файле у него нет)
+                    attempts += 1
+                    resume_from = _resume_offset(filepath, aired) if BROADCAST_MODE != "mixer" else -1
+                    if resume_from < 0 or attempts > MAX_RESUME_ATTEMPTS:
+                        log("⚠️ Не удалось продолжить трек после сбоя FFmpeg. Переход к следующему.")
+                        break
+                    # Задержку считаем до первой удачной записи в новый процесс
+                    stats["failed_at"] = failed_at
+                    log(f"⏩ Продолжаю трек с байта {resume_from} "
+                        f"({resume_from * 100 // max(1, os.fstat(f.fileno()).st_size)}%).")
+
     except Exception as e:
-        log(f"❌ Ошибка передачи данных: {e}")
\ No newline at end of file
+        log(f"❌ Ошибка передачи данных: {e}")
+
+    finally:
+        _record_feed_stats(filepath, stats, time.monotonic() - started)
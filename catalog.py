@@ -0,0 +1,425 @@
+# /opt/radio/catalog.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import config
+import mp3_frames
+import id3_tags
+import artwork
+from logger import log
+
+# Постоянный каталог треков (SQLite).
+# Хранит все известные треки — скачанные из Suno и локальные — с метаданными,
+# хэшем содержимого, громкостью и статистикой эфира. Плейлист строится
+# индексированными запросами к каталогу, а не обходом папки: MUSIC_DIR
+# пересматривается, только если папка изменилась с прошлой синхронизации.
+
+CATALOG_FILE = getattr(config, "CATALOG_FILE", os.path.join(config.BASE_DIR, "catalog.db"))
+
+# Префиксы, которыми раньше помечали не-музыку в MUSIC_DIR. Учитываются один
+# раз при первом импорте файла — дальше тип хранится в каталоге (колонка kind).
+_LEGACY_KINDS = {"dj_": "dj", "ad_": "ad", "news_": "news"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    track_id TEXT NOT NULL,          -- id Suno или имя локального файла
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL DEFAULT '',
+    path TEXT UNIQUE,                -- NULL, если файла на диске больше нет
+    source TEXT NOT NULL,            -- 'suno' или 'local'
+    kind TEXT NOT NULL DEFAULT 'music',
+    image TEXT NOT NULL DEFAULT '',
+    duration REAL,
+    size INTEGER,
+    mtime REAL,
+    content_hash TEXT,
+    added REAL NOT NULL,
+    play_count INTEGER NOT NULL DEFAULT 0,
+    last_played REAL,
+    tags_mtime REAL                  -- mtime файла, для которого прочитаны теги (NULL — не читались)
+);
+CREATE INDEX IF NOT EXISTS tracks_source_id ON tracks (source, track_id);
+CREATE INDEX IF NOT EXISTS tracks_kind_path ON tracks (kind, path);
+CREATE INDEX IF NOT EXISTS tracks_hash ON tracks (content_hash);
+CREATE INDEX IF NOT EXISTS tracks_last_played ON tracks (last_played);
+CREATE TABLE IF NOT EXISTS loudness (
+    key TEXT PRIMARY KEY,            -- ключ громкости: suno:<id> или sha1:<хэш>
+    integrated REAL NOT NULL,
+    true_peak REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_conn = None
+_lock = threading.Lock()
+
+
+def _db():
+    """Соединение с каталогом (создается при первом обращении, вызывать под _lock)."""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CATALOG_FILE, check_same_thread=False)
+        _conn.row_factory = sqlite3.Row
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+        _migrate_columns(_conn)
+        _migrate_embedded_art(_conn)
+        _migrate_loudness_index(_conn)
+    return _conn
+
+
+def _migrate_columns(conn):
+    """Добавляет колонки, появившиеся после создания каталога."""
+    columns = {r["name"] for r in conn.execute("PRAGMA table_info(tracks)")}
+    with conn:
+        if "artist" not in columns:
+            conn.execute("ALTER TABLE tracks ADD COLUMN artist TEXT NOT NULL DEFAULT ''")
+        if "tags_mtime" not in columns:
+            conn.execute("ALTER TABLE tracks ADD COLUMN tags_mtime REAL")
+
+
+def _migrate_embedded_art(conn):
+    """
+    Раньше встроенная обложка без Pillow не записывалась в каталог вовсе.
+    Такие файлы один раз перечитываются (refresh_tags), чтобы получить ее адрес.
+    """
+    if conn.execute("SELECT 1 FROM state WHERE key = 'embedded_art_v2'").fetchone():
+        return
+    with conn:
+        conn.execute("UPDATE tracks SET tags_mtime = NULL WHERE source = 'local' AND image = ''")
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('embedded_art_v2', '1')")
+
+
+def _migrate_loudness_index(conn):
+    """Переносит старый JSON-индекс громкости в каталог (один раз)."""
+    index_file = getattr(config, "LOUDNESS_INDEX_FILE", os.path.join(config.BASE_DIR, "loudness_index.json"))
+    if not os.path.exists(index_file):
+        return
+    try:
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO loudness (key, integrated, true_peak) VALUES (?, ?, ?)",
+                [(key, m["i"], m["tp"]) for key, m in index.items()]
+            )
+        os.replace(index_file, index_file + ".migrated")
+        log(f"🗄️ [Catalog] Индекс громкости перенесен в каталог: {len(index)} записей.")
+    except Exception as e:
+        log(f"⚠️ [Catalog] Не удалось перенести индекс громкости: {e}")
+
+
+def _probe(filepath):
+    """Размер, время изменения и длительность MP3 (по заголовкам кадров)."""
+    st = os.stat(filepath)
+    try:
+        duration = mp3_frames.scan(mp3_frames.read_file(filepath)).duration or None
+    except OSError:
+        duration = None
+    return st.st_size, st.st_mtime, duration
+
+
+def _legacy_kind(filename):
+    for prefix, kind in _LEGACY_KINDS.items():
+        if filename.startswith(prefix):
+            return kind
+    return "music"
+
+
+def add_track(track_meta, filepath, duration=None):
+    """Регистрирует скачанный трек (или обновляет запись с тем же путем)."""
+    if duration is None:
+        size, mtime, duration = _probe(filepath)
+    else:
+        st = os.stat(filepath)
+        size, mtime = st.st_size, st.st_mtime
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute(
+                """INSERT INTO tracks (track_id, title, path, source, image, duration, size, mtime, added)
+                   VALUES (?, ?, ?, 'suno', ?, ?, ?, ?, ?)
+                   ON CONFLICT (path) DO UPDATE SET
+                       track_id = excluded.track_id, title = excluded.title, source = 'suno',
+                       image = excluded.image, duration = excluded.duration,
+                       size = excluded.size, mtime = excluded.mtime, content_hash = NULL""",
+                (str(track_meta["id"]), track_meta.get("title", ""), filepath,
+                 track_meta.get("image") or "", duration, size, mtime, time.time())
+            )
+
+
+_INSERT_LOCAL = """INSERT INTO tracks (track_id, title, artist, path, source, kind, image,
+                                      duration, size, mtime, tags_mtime, added)
+                   VALUES (:track_id, :title, :artist, :path, 'local', :kind, :image,
+                           :duration, :size, :mtime, :mtime, :added)
+                   ON CONFLICT (path) DO UPDATE SET
+                       title = excluded.title, artist = excluded.artist, image = excluded.image,
+                       duration = excluded.duration, size = excluded.size, mtime = excluded.mtime,
+                       tags_mtime = excluded.tags_mtime, content_hash = NULL
+                   WHERE tracks.source = 'local'
+                     AND (tracks.tags_mtime IS NOT excluded.tags_mtime OR tracks.size IS NOT excluded.size)"""
+
+
+def _local_row(filepath):
+    """
+    Запись каталога для локального файла. Файл читается один раз: по кадрам
+    считается длительность, из тегов ID3 берутся название, исполнитель и обложка.
+    """
+    st = os.stat(filepath)
+    data = mp3_frames.read_file(filepath)
+    tags = id3_tags.parse(data)
+    name = os.path.basename(filepath)
+    return {"track_id": name, "title": tags.get("title") or os.path.splitext(name)[0],
+            "artist": tags.get("artist", ""), "path": filepath, "kind": _legacy_kind(name),
+            "image": artwork.embedded_url(tags.get("picture")),
+            "duration": mp3_frames.scan(data).duration or None,
+            "size": st.st_size, "mtime": st.st_mtime, "added": time.time()}
+
+
+def add_local(filepath):
+    """
+    Регистрирует один файл из MUSIC_DIR (новый или перезаписанный).
+    Возвращает метаданные трека, если это новая музыка, иначе None.
+    """
+    row = _local_row(filepath)
+    with _lock:
+        conn = _db()
+        with conn:
+            known = conn.execute("SELECT 1 FROM tracks WHERE path = ?", (filepath,)).fetchone()
+            conn.execute(_INSERT_LOCAL, row)
+    if known or row["kind"] != "music":
+        return None
+    return find_by_path(filepath)
+
+
+def sync_local():
+    """
+    Приводит каталог в соответствие с MUSIC_DIR. Папка читается, только если
+    ее mtime изменился с прошлой синхронизации; для известных файлов
+    ничего не пересчитывается. Возвращает пути (новая музыка, пропавшие файлы).
+    """
+    try:
+        dir_mtime = str(os.stat(config.MUSIC_DIR).st_mtime_ns)
+    except OSError as e:
+        log(f"⚠️ [Catalog] Папка музыки недоступна: {e}")
+        return [], []
+
+    with _lock:
+        conn = _db()
+        row = conn.execute("SELECT value FROM state WHERE key = 'music_dir_mtime'").fetchone()
+        if row and row["value"] == dir_mtime:
+            return [], []
+        known = {r["path"] for r in conn.execute("SELECT path FROM tracks WHERE path IS NOT NULL")}
+
+    on_disk = set()
+    new_files = []
+    for entry in os.scandir(config.MUSIC_DIR):
+        if entry.is_file() and entry.name.endswith(".mp3"):
+            on_disk.add(entry.path)
+            if entry.path not in known:
+                new_files.append(entry)
+
+    rows = []
+    for entry in new_files:
+        try:
+            rows.append(_local_row(entry.path))
+        except OSError:
+            continue
+
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.executemany(_INSERT_LOCAL, rows)
+            gone = [path for path in known - on_disk
+                    if os.path.dirname(path) == config.MUSIC_DIR]
+            conn.executemany("UPDATE tracks SET path = NULL WHERE path = ?", [(path,) for path in gone])
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('music_dir_mtime', ?)", (dir_mtime,))
+    if rows or gone:
+        log(f"🗄️ [Catalog] Синхронизация библиотеки: +{len(rows)}, -{len(gone)}.")
+    return [row["path"] for row in rows if row["kind"] == "music"], gone
+
+
+def refresh_tags(batch=100):
+    """
+    Читает теги локальных файлов, которые еще не разбирались или изменились
+    (по размеру и mtime). Неизменные файлы повторно не читаются.
+    Возвращает число обновленных записей.
+    """
+    with _lock:
+        known = _db().execute(
+            "SELECT path, size, tags_mtime FROM tracks WHERE source = 'local' AND path IS NOT NULL"
+        ).fetchall()
+
+    def flush(rows):
+        with _lock:
+            conn = _db()
+            with conn:
+                conn.executemany(_INSERT_LOCAL, rows)
+
+    rows, updated = [], 0
+    for r in known:
+        try:
+            st = os.stat(r["path"])
+            if r["tags_mtime"] == st.st_mtime and r["size"] == st.st_size:
+                continue
+            rows.append(_local_row(r["path"]))
+        except OSError:
+            continue
+        if len(rows) >= batch:
+            flush(rows)
+            updated += len(rows)
+            rows = []
+    if rows:
+        flush(rows)
+        updated += len(rows)
+    if updated:
+        log(f"🏷️ [Catalog] Прочитаны теги локальных файлов: {updated}.")
+    return updated
+
+
+def local_tracks(limit, source=None):
+    """
+    Музыкальные треки с файлами на диске (резервный плейлист): не больше limit,
+    сначала не звучавшие и звучавшие раньше всех. source — только 'local' или 'suno'.
+    Страница выбирается по индексу last_played, размер библиотеки на цену не влияет.
+    """
+    query = f"""SELECT track_id, title, artist, path, source, image, play_count, last_played
+                FROM tracks INDEXED BY tracks_last_played
+                WHERE kind = 'music' AND path IS NOT NULL{" AND source = ?" if source else ""}
+                ORDER BY last_played LIMIT ?"""
+    with _lock:
+        rows = _db().execute(query, (source, limit) if source else (limit,)).fetchall()
+    return [_local_meta(r) for r in rows]
+
+
+def _local_meta(r):
+    return {'title': r["title"], 'artist': r["artist"], 'url': r["path"], 'id': r["track_id"],
+            'image': r["image"], 'play_count': r["play_count"], 'last_played': r["last_played"],
+            'is_local': r["source"] == 'local'}
+
+
+def find_by_path(filepath):
+    """Метаданные трека по пути к файлу (как в local_tracks) или None."""
+    with _lock:
+        r = _db().execute(
+            "SELECT track_id, title, artist, path, source, image, play_count, last_played FROM tracks WHERE path = ?",
+            (filepath,)
+        ).fetchone()
+    return _local_meta(r) if r else None
+
+
+def forget_path(filepath):
+    """Файл удален с диска (например, вытеснен из кэша) — запись остается без пути."""
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("UPDATE tracks SET path = NULL WHERE path = ?", (filepath,))
+
+
+def record_play(filepath):
+    """Учитывает выход трека в эфир."""
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("UPDATE tracks SET play_count = play_count + 1, last_played = ? WHERE path = ?",
+                         (time.time(), filepath))
+
+
+def play_stats(track_ids):
+    """{id: (play_count, last_played)} для треков Suno из списка."""
+    track_ids = list(track_ids)
+    stats = {}
+    with _lock:
+        conn = _db()
+        # Ограничение SQLite на число параметров — запрашиваем порциями
+        for i in range(0, len(track_ids), 500):
+            chunk = track_ids[i:i + 500]
+            rows = conn.execute(
+                f"""SELECT track_id, SUM(play_count) AS plays, MAX(last_played) AS last
+                    FROM tracks WHERE source = 'suno' AND track_id IN ({','.join('?' * len(chunk))})
+                    GROUP BY track_id""", chunk
+            ).fetchall()
+            stats.update({r["track_id"]: (r["plays"], r["last"]) for r in rows})
+    return stats
+
+
+def get_state(key, default=None):
+    """Служебное значение, сохраненное между запусками (курсоры и т.п.)."""
+    with _lock:
+        row = _db().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else default
+
+
+def set_state(key, value):
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+
+def track_duration(filepath):
+    """
+    Длительность трека (сек). Берется из каталога, если файл не менялся,
+    иначе измеряется по кадрам и сохраняется.
+    """
+    st = os.stat(filepath)
+    with _lock:
+        row = _db().execute("SELECT duration, size, mtime FROM tracks WHERE path = ?", (filepath,)).fetchone()
+    if row and row["duration"] and row["size"] == st.st_size and row["mtime"] == st.st_mtime:
+        return row["duration"]
+
+    size, mtime, duration = _probe(filepath)
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("UPDATE tracks SET duration = ?, size = ?, mtime = ?, content_hash = NULL WHERE path = ?",
+                         (duration, size, mtime, filepath))
+    return duration
+
+
+def content_hash(filepath):
+    """
+    SHA-1 содержимого файла. Берется из каталога, если файл не менялся
+    (размер и mtime совпадают), иначе считается и сохраняется.
+    """
+    st = os.stat(filepath)
+    with _lock:
+        row = _db().execute("SELECT content_hash, size, mtime FROM tracks WHERE path = ?", (filepath,)).fetchone()
+    if row and row["content_hash"] and row["size"] == st.st_size and row["mtime"] == st.st_mtime:
+        return row["content_hash"]
+
+    digest = hashlib.sha1()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    value = digest.hexdigest()
+
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("UPDATE tracks SET content_hash = ?, size = ?, mtime = ? WHERE path = ?",
+                         (value, st.st_size, st.st_mtime, filepath))
+    return value
+
+
+def get_loudness(key):
+    """Измеренная громкость {'i': LUFS, 'tp': dBTP} или None."""
+    with _lock:
+        row = _db().execute("SELECT integrated, true_peak FROM loudness WHERE key = ?", (key,)).fetchone()
+    return {"i": row["integrated"], "tp": row["true_peak"]} if row else None
+
+
+def set_loudness(key, measured):
+    with _lock:
+        conn = _db()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO loudness (key, integrated, true_peak) VALUES (?, ?, ?)",
+                         (key, measured["i"], measured["tp"]))
@@ -7,6 +7,15 @@ ICECAST_HOST = "localhost"
 ICECAST_PORT = "8000"
 ICECAST_PASSWORD = "hackme" #ICECAST пароль
 MOUNT_POINT = "/stream"
+ICECAST_ENABLED = True  # False — вещать только через встроенный сервер раздачи
+
+# --- ВСТРОЕННЫЙ СЕРВЕР РАЗДАЧИ (вместо или вместе с Icecast) ---
+STREAM_SERVER_ENABLED = False
+STREAM_SERVER_HOST = "127.0.0.1"
+STREAM_SERVER_PORT = 8001
+STREAM_SERVER_PATH = "/stream"
+STREAM_SERVER_BUFFER_SEC = 30  # Сколько секунд эфира держать в общем буфере
+STREAM_SERVER_BURST_SEC = 3    # Сколько секунд отдать слушателю сразу при подключении
 
 # --- СИСТЕМНЫЕ ПУТИ ---
 FFMPEG_PATH = "/usr/bin/ffmpeg"
@@ -16,10 +25,54 @@ WEB_DIR = os.path.join(BASE_DIR, "web")
 LOG_FILE = os.path.join(WEB_DIR, "logs.txt")
 
 # --- НАСТРОЙКИ ВЕЩАНИЯ ---
-BUFFER_SIZE = 3  # Сколько треков готовить заранее
+PREFETCH_TARGET_SEC = 600  # Сколько секунд музыки держать скачанными заранее (растет автоматически при плохой сети)
+PREFETCH_MAX_SEC = 3600  # Верхний предел автоматического роста буфера
+DOWNLOAD_WORKERS = 4  # Сколько треков скачивать одновременно
+DOWNLOAD_PER_HOST = 2  # Не больше стольких одновременных загрузок с одного хоста
+HTTP_RETRIES = 3  # Повторы запроса при сетевых ошибках и ответах 429/5xx
+HTTP_BACKOFF_SEC = 0.5  # Начальная пауза между повторами (удваивается)
+DOWNLOAD_RESUME_ATTEMPTS = 3  # Сколько раз докачивать оборванную загрузку через Range
+TRACK_CACHE_MAX_MB = 2048  # Максимальный размер кэша скачанных треков (МБ)
+TRACK_CACHE_MAX_AGE_DAYS = 30  # Удалять скачанные треки, не звучавшие столько дней (0 — не удалять по возрасту)
+TRACK_CACHE_INDEX_FILE = os.path.join(BASE_DIR, "track_cache.json")  # Индекс кэша треков
+LOOKAHEAD_DEPTH = 2  # Сколько событий расписания готовить заранее, пока играет текущее (минимум 2: одно в очереди, одно ждет места)
+BROADCAST_MODE = "transcode"  # "transcode" — перекодировать в FFmpeg, "passthrough" — слать MP3-кадры как есть, "mixer" — crossfade и ducking (нужен numpy)
+BROADCAST_BITRATE = 320  # Битрейт эфира (кбит/с)
+BROADCAST_SAMPLE_RATE = 44100  # Частота дискретизации эфира
+AIR_DIR = os.path.join(BASE_DIR, "air")  # Временные файлы, подготовленные к эфиру
+PRETRANSCODE_WORKERS = 2  # Сколько процессов FFmpeg заранее приводят треки и речь DJ к формату эфира в режиме "passthrough" (0 — выключить)
+PRETRANSCODE_TRIM_DB = -50.0  # Тишина тише этого уровня обрезается в начале и конце трека (дБ)
+PACING_LEAD_SEC = 1.0  # Сколько секунд аудио отдавать в FFmpeg с опережением эфира
+LOUDNESS_TARGET_LUFS = -14.0  # Целевая громкость треков (LUFS)
+LOUDNESS_INDEX_FILE = os.path.join(BASE_DIR, "loudness_index.json")  # Старый индекс громкости (переносится в каталог)
+CATALOG_FILE = os.path.join(BASE_DIR, "catalog.db")  # Каталог треков (SQLite)
+ARTWORK_DIR = os.path.join(BASE_DIR, "artwork")  # Кэш уменьшенных обложек (нужен Pillow)
+ARTWORK_CACHE_MAX_MB = 100  # Максимальный размер кэша обложек (МБ)
+LIBRARY_POLL_SEC = 10  # Как часто проверять MUSIC_DIR, если inotify недоступен
+MIXER_CROSSFADE_SEC = 4.0  # Длина crossfade между треками в режиме "mixer"
+MIXER_DUCK_DB = -12.0  # Насколько приглушать музыку под речь DJ
+UNDERRUN_GRACE_SEC = 1.0  # Через сколько секунд простоя включать заполнитель эфира
+FILLER_FILE = ""  # Джингл-заполнитель (MP3), пусто — тишина
+
+# Дополнительные качества потока (декодируются один раз, каждое — на свой mount).
+# Пустой список — только основной поток MOUNT_POINT.
+RENDITIONS = [
+    # {"mount": "/stream128", "codec": "libmp3lame", "bitrate": "128k"},
+    # {"mount": "/stream64.ogg", "codec": "libopus", "bitrate": "64k", "format": "ogg", "content_type": "audio/ogg"},
+    # {"mount": "/stream64.aac", "codec": "aac", "bitrate": "64k", "format": "adts", "content_type": "audio/aac"},
+]
 
 # --- НАСТРОЙКИ SUNO API ---
 SUNO_API_URL = "https://studio-api.prod.suno.com/api/discover"
+# Разделы, которые листает фоновый поиск (по кругу, постранично)
+SUNO_DISCOVERY_SECTIONS = [
+    {"section_name": "trending_songs", "section_content": "Global", "secondary_section_content": "Now"},
+    # {"section_name": "trending_songs", "section_content": "Global", "secondary_section_content": "Weekly"},
+]
+DISCOVERY_LOW_WATER = 10  # Подгружать новые треки, когда в плейлисте их меньше
+DISCOVERY_REPEAT_HOURS = 24  # Не повторять треки, звучавшие за последние N часов
+ROTATION_TRACK_SEPARATION = 50  # Трек не повторяется раньше, чем через N выборов
+ROTATION_ARTIST_SEPARATION = 3  # Исполнитель не повторяется раньше, чем через N выборов
 HEADERS = {
     'accept': '*/*',
     'accept-language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
@@ -43,6 +96,8 @@ HEADERS = {
 }
 
 # --- НАСТРОЙКИ DJ ---
+TTS_CACHE_DIR = os.path.join(BASE_DIR, "tts_cache")  # Кэш синтезированных фраз DJ
+TTS_CACHE_MAX_MB = 200  # Максимальный размер кэша фраз (МБ), 0 — не кэшировать
 DJ_VOICE = "ru-RU-DmitryNeural"  # Голос для edge-tts
 DJ_CHANCE_TO_SPEAK_FACT = 0.5    # 50% шанс рассказать факт
 
@@ -0,0 +1,112 @@
+# /opt/radio/http_client.py
+
+import os
+import time
+import shutil
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import config
+from logger import log
+
+# Общий HTTP-клиент для модулей (Suno, CDN, факты).
+# Общие сессии с keep-alive: соединения с одним хостом переиспользуются,
+# без нового TCP+TLS рукопожатия на каждый запрос. Временные ошибки
+# сервера на GET повторяются с нарастающей паузой, а оборванная загрузка
+# докачивается с места обрыва (HTTP Range) из файла .part.
+
+HTTP_RETRIES = int(getattr(config, "HTTP_RETRIES", 3))
+HTTP_BACKOFF_SEC = float(getattr(config, "HTTP_BACKOFF_SEC", 0.5))
+# Сколько раз продолжаем одну загрузку после обрыва
+DOWNLOAD_RESUME_ATTEMPTS = int(getattr(config, "DOWNLOAD_RESUME_ATTEMPTS", 3))
+# Соединений, которые держим открытыми на один хост
+POOL_SIZE = max(4, int(getattr(config, "DOWNLOAD_WORKERS", 4)))
+
+_sessions = {}  # с повторами (True) и без (False)
+_session_lock = threading.Lock()
+
+
+def session(retries=True):
+    """
+    Общая сессия requests (создается при первом обращении).
+    retries=False — сессия без повторов для запросов, которых ждет подготовка
+    эфира (факты для DJ): ошибка должна вернуться сразу, а не после пауз.
+    """
+    with _session_lock:
+        shared = _sessions.get(retries)
+        if shared is None:
+            if retries:
+                max_retries = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=HTTP_BACKOFF_SEC,
+                    status_forcelist=(429, 500, 502, 503, 504),
+                    # POST не повторяем: факты ждет DJ, а поиск Suno сам делает паузы между раундами
+                    allowed_methods=frozenset({"GET", "HEAD"}),
+                    respect_retry_after_header=True
+                )
+            else:
+                max_retries = 0
+            adapter = HTTPAdapter(max_retries=max_retries, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            shared = _sessions[retries] = requests.Session()
+            shared.mount("http://", adapter)
+            shared.mount("https://", adapter)
+        return shared
+
+
+def _download_attempt(url, part_path, headers, timeout):
+    """
+    Один заход загрузки в part_path. Если часть файла уже скачана, просит
+    у сервера продолжение (Range). Возвращает True, когда файл докачан.
+    """
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request_headers = dict(headers or {})
+    if offset:
+        request_headers["Range"] = f"bytes={offset}-"
+
+    with session().get(url, stream=True, headers=request_headers, timeout=timeout) as r:
+        if r.status_code == 416 and offset:
+            # Сервер не может продолжить (файл изменился?) — начинаем заново
+            os.remove(part_path)
+            raise IOError("HTTP 416, загрузка начнется заново")
+
+        if r.status_code == 206 and r.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+            mode = "ab"
+        elif r.status_code == 200:
+            mode = "wb"  # Сервер не поддерживает Range — качаем целиком
+        else:
+            log(f"⚠️ [HTTP] Ошибка скачивания {url}: HTTP {r.status_code}")
+            return False
+
+        with open(part_path, mode) as f:
+            shutil.copyfileobj(r.raw, f)
+
+        expected = r.headers.get("Content-Length")
+        written = os.path.getsize(part_path) - (offset if mode == "ab" else 0)
+        if expected is not None and written < int(expected):
+            raise IOError(f"получено {written} из {expected} байт")
+        return True
+
+
+def download(url, filepath, headers=None, timeout=30):
+    """
+    Скачивает url в filepath через общую сессию.
+    Данные пишутся в filepath + '.part'; при обрыве загрузка продолжается
+    с места остановки, а готовый файл атомарно переименовывается.
+    Возвращает True при успехе.
+    """
+    part_path = filepath + ".part"
+    for attempt in range(DOWNLOAD_RESUME_ATTEMPTS + 1):
+        try:
+            if not _download_attempt(url, part_path, headers, timeout):
+                return False
+            os.replace(part_path, filepath)
+            return True
+        except Exception as e:
+            done = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            if attempt == DOWNLOAD_RESUME_ATTEMPTS:
+                log(f"❌ [HTTP] Загрузка не удалась ({e}), .part сохранен ({done // 1024} КБ): {url}")
+                return False
+            log(f"🔄 [HTTP] Обрыв загрузки ({e}), продолжаем с {done // 1024} КБ...")
+            time.sleep(HTTP_BACKOFF_SEC * (2 ** attempt))
+    return False
@@ -0,0 +1,197 @@
+# /opt/radio/id3_tags.py
+
+import os
+
+# Разбор тегов ID3 без внешних библиотек.
+# Читает из ID3v2 (версии 2.2–2.4) название, исполнителя, альбом и
+# встроенную обложку (APIC/PIC), а если их нет — ID3v1 в конце файла.
+# С диска читается только заголовок с тегом и последние 128 байт.
+
+# Кадры: (v2.2, v2.3/2.4) -> поле результата
+_TEXT_FRAMES = {"TT2": "title", "TIT2": "title",
+                "TP1": "artist", "TPE1": "artist",
+                "TAL": "album", "TALB": "album"}
+# Тип картинки "обложка спереди" (APIC)
+_FRONT_COVER = 3
+_IMAGE_FORMATS = {b"JPG": "image/jpeg", b"PNG": "image/png"}
+
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+
+def _decode_legacy(raw):
+    # Старые теги без указания кодировки в русских библиотеках почти всегда в cp1251
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("cp1251", "replace")
+
+
+def _decode(encoding, raw):
+    if encoding == 0:
+        return _decode_legacy(raw)
+    if encoding == 1:
+        return raw.decode("utf-16", "replace")
+    if encoding == 2:
+        return raw.decode("utf-16-be", "replace")
+    return raw.decode("utf-8", "replace")
+
+
+def _text(data):
+    """Значение текстового кадра; несколько значений (ID3v2.4) через запятую."""
+    if not data:
+        return None
+    if data[0] in (1, 2):
+        values = _split_utf16(data[1:])
+    else:
+        values = data[1:].split(b"\0")
+    text = ", ".join(v for v in (_decode(data[0], raw).strip() for raw in values) if v)
+    return text or None
+
+
+def _split_utf16(raw):
+    """Делит строку UTF-16 по двухбайтовым нулям (на четных позициях)."""
+    values, start = [], 0
+    for pos in range(0, len(raw) - 1, 2):
+        if raw[pos] == 0 and raw[pos + 1] == 0:
+            values.append(raw[start:pos])
+            start = pos + 2
+    values.append(raw[start:])
+    return values
+
+
+def _skip_string(data, pos, encoding):
+    """Позиция после строки с завершающим нулем в заданной кодировке."""
+    if encoding in (1, 2):
+        while pos + 1 < len(data):
+            if data[pos] == 0 and data[pos + 1] == 0:
+                return pos + 2
+            pos += 2
+        return len(data)
+    end = data.find(b"\0", pos)
+    return len(data) if end < 0 else end + 1
+
+
+def _picture(frame_id, data):
+    """(тип картинки, MIME, байты) из кадра APIC (v2.3/2.4) или PIC (v2.2)."""
+    if len(data) < 4:
+        return None
+    encoding = data[0]
+    if frame_id == "PIC":
+        mime = _IMAGE_FORMATS.get(data[1:4].upper(), "image/")
+        pos = 4
+    else:
+        end = data.find(b"\0", 1)
+        if end < 0:
+            return None
+        mime = data[1:end].decode("latin-1").lower()
+        pos = end + 1
+    if pos >= len(data):
+        return None
+    picture_type = data[pos]
+    pos = _skip_string(data, pos + 1, encoding)  # Описание
+    image = data[pos:]
+    if not image or mime == "-->":  # "-->" — ссылка на картинку, а не сама картинка
+        return None
+    return picture_type, mime, image
+
+
+def _parse_v2(data):
+    """Поля из тега ID3v2 в начале data (пустой dict, если тега нет или он битый)."""
+    if len(data) < 10 or data[:3] != b"ID3" or data[3] not in (2, 3, 4):
+        return {}
+    version, flags = data[3], data[5]
+    if version == 2 and flags & 0x40:
+        return {}  # Сжатый тег v2.2 — формат сжатия так и не был определен
+    end = min(len(data), 10 + _syncsafe(data[6:10]))
+    body = data[10:end]
+    if flags & 0x80 and version < 4:
+        body = body.replace(b"\xff\x00", b"\xff")  # Рассинхронизация всего тега
+
+    pos = 0
+    if flags & 0x40 and version >= 3 and len(body) >= 4:
+        # Расширенный заголовок: в 2.3 размер без учета самого поля, в 2.4 — syncsafe с учетом
+        pos = _syncsafe(body[:4]) if version == 4 else 4 + int.from_bytes(body[:4], "big")
+
+    id_len, size_len = (3, 3) if version == 2 else (4, 4)
+    header_len = id_len + size_len + (0 if version == 2 else 2)
+    tags, pictures = {}, []
+    while pos + header_len <= len(body):
+        frame_id = body[pos:pos + id_len]
+        if not frame_id.strip(b"\0") or not frame_id.isalnum():
+            break  # Началось заполнение нулями
+        raw_size = body[pos + id_len:pos + id_len + size_len]
+        size = _syncsafe(raw_size) if version == 4 else int.from_bytes(raw_size, "big")
+        frame_flags = 0 if version == 2 else int.from_bytes(body[pos + header_len - 2:pos + header_len], "big")
+        frame = body[pos + header_len:pos + header_len + size]
+        pos += header_len + size
+        frame_id = frame_id.decode("latin-1")
+
+        if version == 3:
+            if frame_flags & 0x00C0:  # Сжатие или шифрование
+                continue
+            if frame_flags & 0x0020:  # Группировка: байт идентификатора
+                frame = frame[1:]
+        elif version == 4:
+            if frame_flags & 0x000C:
+                continue
+            if frame_flags & 0x0040:
+                frame = frame[1:]
+            if frame_flags & 0x0001:  # Длина данных до рассинхронизации
+                frame = frame[4:]
+            if frame_flags & 0x0002 or flags & 0x80:
+                frame = frame.replace(b"\xff\x00", b"\xff")
+
+        if frame_id in _TEXT_FRAMES and _TEXT_FRAMES[frame_id] not in tags:
+            value = _text(frame)
+            if value:
+                tags[_TEXT_FRAMES[frame_id]] = value
+        elif frame_id in ("APIC", "PIC"):
+            picture = _picture(frame_id, frame)
+            if picture:
+                pictures.append(picture)
+
+    if pictures:
+        # Обложка спереди, если есть, иначе первая картинка
+        _, tags["picture_mime"], tags["picture"] = min(
+            pictures, key=lambda p: p[0] != _FRONT_COVER)
+    return tags
+
+
+def _parse_v1(tail):
+    """Поля из тега ID3v1 (последние 128 байт файла)."""
+    if len(tail) < 128 or tail[-128:-125] != b"TAG":
+        return {}
+    tag = tail[-128:]
+    tags = {}
+    for field, start in (("title", 3), ("artist", 33), ("album", 63)):
+        value = _decode_legacy(tag[start:start + 30].split(b"\0")[0]).strip()
+        if value:
+            tags[field] = value
+    return tags
+
+
+def parse(data, tail=None):
+    """
+    Теги из начала файла (data) и его последних 128 байт (tail; по умолчанию
+    конец data). Возвращает dict с ключами из title, artist, album,
+    picture (байты) и picture_mime; отсутствующих полей в нем нет.
+    """
+    tags = _parse_v1(data[-128:] if tail is None else tail)
+    tags.update(_parse_v2(data))
+    return tags
+
+
+def read(filepath):
+    """Читает и разбирает теги файла, не загружая аудиоданные."""
+    with open(filepath, "rb") as f:
+        head = f.read(10)
+        if head[:3] == b"ID3" and len(head) == 10:
+            head += f.read(_syncsafe(head[6:10]))
+        size = os.fstat(f.fileno()).st_size
+        tail = b""
+        if size >= 128:
+            f.seek(size - 128)
+            tail = f.read(128)
+    return parse(head, tail)
@@ -0,0 +1,186 @@
+# /opt/radio/library_watcher.py
+
+import os
+import errno
+import time
+import struct
+import ctypes
+import ctypes.util
+import threading
+import config
+import catalog
+import track_cache
+from logger import log
+
+# Наблюдатель за локальной библиотекой (MUSIC_DIR).
+# Через inotify узнает о каждом записанном, перемещенном или удаленном
+# файле и сразу обновляет каталог по одному файлу — без обхода папки.
+# Подписчики (ротация музыки) получают новые треки через секунды после
+# загрузки. Если inotify недоступен (не Linux, исчерпан лимит наблюдений),
+# папка периодически сверяется через catalog.sync_local().
+
+POLL_SEC = float(getattr(config, "LIBRARY_POLL_SEC", 10))
+
+# Флаги inotify (см. <sys/inotify.h>)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+# struct inotify_event: wd, mask, cookie, len, затем имя длиной len
+_EVENT = struct.Struct("iIII")
+
+_listeners = []
+_started = False
+_live = False
+_lock = threading.Lock()
+
+
+def add_listener(callback):
+    """callback(added, removed): новые музыкальные треки (метаданные) и пути удаленных файлов."""
+    _listeners.append(callback)
+
+
+def is_live():
+    """Каталог обновляется по событиям inotify — пересматривать папку не нужно."""
+    return _live
+
+
+def start():
+    """Запускает наблюдение (один раз на процесс)."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, daemon=True).start()
+
+
+def _is_track(filepath):
+    # .part, .tmp и прочие промежуточные файлы не трогаем; загрузки Suno
+    # регистрирует сам загрузчик после проверки
+    return filepath.endswith(".mp3") and not track_cache.is_download(filepath)
+
+
+def _notify(added, removed):
+    if not added and not removed:
+        return
+    for callback in list(_listeners):
+        try:
+            callback(added, removed)
+        except Exception as e:
+            log(f"⚠️ [Library] Ошибка подписчика: {e}")
+
+
+def _sync():
+    """Полная сверка папки с каталогом (при старте, после переполнения, в режиме опроса)."""
+    added, removed = catalog.sync_local()
+    tracks = [catalog.find_by_path(path) for path in added if _is_track(path)]
+    _notify([t for t in tracks if t], removed)
+
+
+def _init_inotify():
+    """Дескриптор inotify с наблюдением за MUSIC_DIR или None, если inotify недоступен."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        inotify_init1 = libc.inotify_init1
+        inotify_add_watch = libc.inotify_add_watch
+    except (OSError, AttributeError) as e:
+        log(f"⚠️ [Library] inotify недоступен ({e}), проверка папки раз в {POLL_SEC:g} сек.")
+        return None
+
+    fd = inotify_init1(IN_CLOEXEC)
+    if fd < 0:
+        log(f"⚠️ [Library] inotify_init1: {os.strerror(ctypes.get_errno())}, "
+            f"проверка папки раз в {POLL_SEC:g} сек.")
+        return None
+    if inotify_add_watch(fd, os.fsencode(config.MUSIC_DIR), _WATCH_MASK) < 0:
+        err = ctypes.get_errno()
+        hint = " (увеличьте fs.inotify.max_user_watches)" if err == errno.ENOSPC else ""
+        log(f"⚠️ [Library] Не удалось следить за {config.MUSIC_DIR}: {os.strerror(err)}{hint}, "
+            f"проверка папки раз в {POLL_SEC:g} сек.")
+        os.close(fd)
+        return None
+    return fd
+
+
+def _handle_events(buf):
+    """
+    Разбирает пачку событий inotify и применяет их к каталогу.
+    Возвращает False, если папка удалена/перемещена и наблюдение потеряно.
+    """
+    added, removed = [], []
+    watching = True
+    offset = 0
+    while offset + _EVENT.size <= len(buf):
+        _wd, mask, _cookie, length = _EVENT.unpack_from(buf, offset)
+        name = buf[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+        offset += _EVENT.size + length
+
+        if mask & IN_Q_OVERFLOW:
+            # Очередь событий переполнилась — часть изменений потеряна
+            log("⚠️ [Library] Переполнение очереди inotify, полная сверка папки.")
+            _sync()
+            continue
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            watching = False
+            continue
+
+        path = os.path.join(config.MUSIC_DIR, os.fsdecode(name))
+        if not name or not _is_track(path):
+            continue
+        if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+            try:
+                track = catalog.add_local(path)
+            except OSError:
+                continue  # Файл успели удалить или переименовать
+            if track:
+                added.append(track)
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            catalog.forget_path(path)
+            removed.append(path)
+
+    _notify(added, removed)
+    return watching
+
+
+def _run():
+    global _live
+    # Наблюдение ставим до сверки, чтобы не пропустить файлы, появившиеся во время нее
+    fd = _init_inotify()
+    try:
+        _sync()  # Изменения, сделанные, пока радио не работало
+        catalog.refresh_tags()  # Теги файлов, добавленных до появления разбора тегов
+    except Exception as e:
+        log(f"⚠️ [Library] Ошибка сверки библиотеки: {e}")
+
+    if fd is not None:
+        _live = True
+        log(f"👀 [Library] Слежу за {config.MUSIC_DIR} (inotify).")
+        try:
+            while True:
+                buf = os.read(fd, 64 * 1024)
+                if not _handle_events(buf):
+                    log(f"⚠️ [Library] Папка {config.MUSIC_DIR} удалена или перемещена, "
+                        f"проверка папки раз в {POLL_SEC:g} сек.")
+                    break
+        except Exception as e:
+            log(f"❌ [Library] Ошибка наблюдения ({e}), проверка папки раз в {POLL_SEC:g} сек.")
+        finally:
+            _live = False
+            os.close(fd)
+
+    while True:
+        time.sleep(POLL_SEC)
+        try:
+            _sync()
+        except Exception as e:
+            log(f"⚠️ [Library] Ошибка сверки библиотеки: {e}")
@@ -0,0 +1,112 @@
+# /opt/radio/loudness.py
+
+import os
+import re
+import json
+import queue
+import threading
+import subprocess
+import config
+import catalog
+from logger import log
+
+# Фоновый анализ громкости треков.
+# Каждый трек анализируется один раз (EBU R128 через loudnorm), результат
+# хранится в каталоге треков (catalog.py). В эфире к треку применяется
+# фиксированное усиление из каталога — без повторного анализа.
+
+TARGET_LUFS = float(getattr(config, "LOUDNESS_TARGET_LUFS", -14.0))
+# Не поднимаем пики выше этого уровня (dBTP)
+MAX_TRUE_PEAK = -1.0
+MAX_GAIN_DB = 12.0
+
+_pending = set()
+_pending_lock = threading.Lock()
+_jobs = queue.Queue()
+_worker_started = False
+
+
+def track_key(track_meta, filepath):
+    """Ключ громкости трека: id Suno или хэш содержимого для локальных файлов."""
+    if not track_meta.get("is_local") and track_meta.get("id"):
+        return f"suno:{track_meta['id']}"
+    return f"sha1:{catalog.content_hash(filepath)}"
+
+
+def _measure(filepath):
+    """Интегральная громкость (LUFS) и true peak (dBTP) через один проход loudnorm."""
+    command = [
+        config.FFMPEG_PATH, "-hide_banner", "-nostats",
+        "-i", filepath,
+        "-af", f"loudnorm=I={TARGET_LUFS}:TP={MAX_TRUE_PEAK}:print_format=json",
+        "-f", "null", "-"
+    ]
+    # Низкий приоритет: анализ не должен мешать эфиру
+    result = subprocess.run(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        timeout=300, preexec_fn=lambda: os.nice(10)
+    )
+    stderr = result.stderr.decode("utf-8", "ignore")
+    match = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", stderr)
+    if not match:
+        return None
+    data = json.loads(match.group(0))
+    return {"i": float(data["input_i"]), "tp": float(data["input_tp"])}
+
+
+def _worker():
+    while True:
+        key, filepath = _jobs.get()
+        try:
+            measured = _measure(filepath)
+            if measured is None:
+                log(f"⚠️ [Loudness] Не удалось измерить громкость: {os.path.basename(filepath)}")
+                continue
+
+            catalog.set_loudness(key, measured)
+            log(f"🔊 [Loudness] {os.path.basename(filepath)}: {measured['i']:.1f} LUFS, "
+                f"пик {measured['tp']:.1f} dBTP, усиление {get_gain_db(key):+.1f} дБ")
+        except Exception as e:
+            log(f"❌ [Loudness] Ошибка анализа {filepath}: {e}")
+        finally:
+            with _pending_lock:
+                _pending.discard(key)
+
+
+def submit(track_meta, filepath):
+    """
+    Ставит трек в очередь на анализ (если он еще не в индексе).
+    Ключ сохраняется в track_meta['loudness_key'] — по нему вещатель найдет усиление.
+    """
+    global _worker_started
+    try:
+        key = track_key(track_meta, filepath)
+    except OSError as e:
+        log(f"⚠️ [Loudness] Не удалось прочитать файл для анализа: {e}")
+        return
+    track_meta["loudness_key"] = key
+
+    if catalog.get_loudness(key) is not None:
+        return
+    with _pending_lock:
+        if not _worker_started:
+            threading.Thread(target=_worker, daemon=True).start()
+            _worker_started = True
+        if key in _pending:
+            return
+        _pending.add(key)
+    _jobs.put((key, filepath))
+
+
+def get_gain_db(key):
+    """Усиление (дБ) до целевой громкости или None, если трек еще не проанализирован."""
+    if not key:
+        return None
+    measured = catalog.get_loudness(key)
+    if not measured:
+        return None
+
+    gain = TARGET_LUFS - measured["i"]
+    # Не даем пикам уйти выше MAX_TRUE_PEAK
+    gain = min(gain, MAX_TRUE_PEAK - measured["tp"], MAX_GAIN_DB)
+    return gain
@@ -0,0 +1,213 @@
+# /opt/radio/mixer.py
+
+import subprocess
+import time
+import numpy as np
+import config
+
+# Долгоживущий микшер между оркестратором и кодировщиком (режим вещания "mixer").
+# Каждый элемент декодируется в PCM, а на стыках музыка плавно перетекает
+# (crossfade), а под речь DJ приглушается (ducking). Если после речи идет
+# трек, он начинается под речью (приглушенным) и после нее выходит на полную
+# громкость. NumPy работает только со стыками и речью — основной поток PCM
+# идет без обработки, поэтому нагрузка на CPU не зависит от длины треков.
+
+CROSSFADE_SEC = float(getattr(config, "MIXER_CROSSFADE_SEC", 4.0))
+DUCK_DB = float(getattr(config, "MIXER_DUCK_DB", -12.0))
+# За сколько музыка уходит на фон при начале речи
+DUCK_RAMP_SEC = 0.5
+READ_CHUNK = 64 * 1024
+
+
+class Mixer:
+    def __init__(self, sample_rate, channels=2):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frame_bytes = 2 * channels  # s16le
+        self.tail_bytes = int(CROSSFADE_SEC * sample_rate) * self.frame_bytes
+        # Удержанный конец предыдущего музыкального трека (PCM s16le)
+        self.tail = b""
+        # Трек, который уже начался под речью: (путь, декодер)
+        self.bed = None
+        # CPU, потраченное потоком микшера (всего и на последний элемент)
+        self.stats = {"transitions": 0, "cpu_seconds": 0.0, "last_cpu_seconds": 0.0}
+
+        # Кривые громкости считаем один раз
+        samples = self.tail_bytes // self.frame_bytes
+        theta = np.linspace(0.0, np.pi / 2, samples, dtype=np.float32)[:, None]
+        self.fade_out = np.cos(theta)
+        self.fade_in = np.sin(theta)
+        ramp = min(samples, int(DUCK_RAMP_SEC * sample_rate))
+        self.duck_gain = 10 ** (DUCK_DB / 20)
+        self.duck = np.full((samples, 1), self.duck_gain, dtype=np.float32)
+        self.duck[:ramp, 0] = np.linspace(1.0, self.duck_gain, ramp, dtype=np.float32)
+        # Подложка под речью: вход с нуля до уровня приглушения и возврат на полную громкость
+        self.ramp_samples = max(1, int(DUCK_RAMP_SEC * sample_rate))
+        self.bed_in = np.linspace(0.0, self.duck_gain, self.ramp_samples, dtype=np.float32)[:, None]
+        self.unduck = np.linspace(self.duck_gain, 1.0, self.ramp_samples, dtype=np.float32)[:, None]
+
+    def _decoder(self, filepath):
+        """FFmpeg-декодер одного элемента в PCM формата эфира."""
+        return subprocess.Popen(
+            [config.FFMPEG_PATH, '-v', 'error', '-i', filepath,
+             '-f', 's16le', '-ac', str(self.channels), '-ar', str(self.sample_rate), 'pipe:1'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def _read_exact(self, stream, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = stream.read1(size - len(data))
+            if not chunk: break
+            data += chunk
+        return data
+
+    def _to_float(self, pcm, samples):
+        x = np.frombuffer(pcm, dtype='<i2').astype(np.float32).reshape(-1, self.channels)
+        if len(x) < samples:
+            x = np.vstack([x, np.zeros((samples - len(x), self.channels), dtype=np.float32)])
+        return x
+
+    def _to_pcm(self, x):
+        return np.clip(x, -32768, 32767).astype('<i2').tobytes()
+
+    def _mix_transition(self, head, speech):
+        """Смешивает удержанный хвост с началом нового элемента."""
+        samples = len(self.tail) // self.frame_bytes
+        tail = self._to_float(self.tail, samples)
+        head = self._to_float(head, samples)
+        if speech:
+            # Речь поверх приглушенного конца трека
+            mixed = tail * self.duck[:samples] + head
+        else:
+            # Равномощностный crossfade двух треков
+            mixed = tail * self.fade_out[:samples] + head * self.fade_in[:samples]
+        return self._to_pcm(mixed)
+
+    def _close(self, decoder):
+        decoder.stdout.close()
+        if decoder.poll() is None:
+            decoder.kill()
+        decoder.wait()
+
+    def _release_bed(self, write):
+        """Подложка не понадобилась (дальше другой элемент) — уводим ее в тишину."""
+        _, decoder = self.bed
+        self.bed = None
+        try:
+            pcm = self._read_exact(decoder.stdout, self.ramp_samples * self.frame_bytes)
+            samples = len(pcm) // self.frame_bytes
+            if samples:
+                fade = self._to_float(pcm[:samples * self.frame_bytes], samples) * self.bed_in[::-1][:samples]
+                write(self._to_pcm(fade))
+        finally:
+            self._close(decoder)
+
+    def _bed_gain(self, position, samples):
+        """Громкость подложки для участка [position, position + samples) от начала речи."""
+        gain = np.full((samples, 1), self.duck_gain, dtype=np.float32)
+        if position < self.ramp_samples:
+            count = min(samples, self.ramp_samples - position)
+            gain[:count] = self.bed_in[position:position + count]
+        return gain
+
+    def _talk_over(self, decoder, bed_decoder, write):
+        """
+        Речь целиком поверх приглушенного начала следующего трека.
+        Удержанный хвост предыдущего трека в это время затухает.
+        """
+        tail_samples = len(self.tail) // self.frame_bytes
+        tail = self._to_float(self.tail, tail_samples)
+        self.tail = b""
+        position = 0
+        pending = bytearray()
+        while True:
+            chunk = decoder.stdout.read1(READ_CHUNK)
+            if chunk:
+                pending += chunk
+            ready = len(pending) - len(pending) % self.frame_bytes
+            if not ready:
+                if not chunk: break
+                continue
+            samples = ready // self.frame_bytes
+            mixed = self._to_float(pending[:ready], samples)
+            del pending[:ready]
+            bed = self._to_float(self._read_exact(bed_decoder.stdout, ready), samples)
+            mixed += bed * self._bed_gain(position, samples)
+            if position < tail_samples:
+                count = min(samples, tail_samples - position)
+                mixed[:count] += tail[position:position + count] * self.fade_out[position:position + count]
+            write(self._to_pcm(mixed))
+            position += samples
+        self.stats["transitions"] += 1
+
+    def play(self, filepath, kind, write, bed=None):
+        """
+        Проигрывает элемент: пишет его PCM через write(data).
+        Конец музыкального трека (CROSSFADE_SEC) удерживается до следующего элемента.
+        bed — трек, который пойдет следующим: речь звучит поверх его начала,
+        а сам трек потом продолжается с того же места (play с тем же путем).
+        """
+        speech = kind != "music"
+        cpu_started = time.thread_time()
+        if self.bed and (speech or self.bed[0] != filepath):
+            self._release_bed(write)
+        continued = self.bed is not None
+        if continued:
+            # Трек уже начался под речью — продолжаем его с того же места
+            _, decoder = self.bed
+            self.bed = None
+        else:
+            decoder = self._decoder(filepath)
+        try:
+            if speech and bed:
+                bed_decoder = self._decoder(bed)
+                try:
+                    self._talk_over(decoder, bed_decoder, write)
+                except BaseException:
+                    self._close(bed_decoder)
+                    raise
+                self.bed = (bed, bed_decoder)
+                return
+
+            if continued:
+                # Возвращаем приглушенный под речью трек на полную громкость
+                pcm = self._read_exact(decoder.stdout, self.ramp_samples * self.frame_bytes)
+                samples = len(pcm) // self.frame_bytes
+                write(self._to_pcm(self._to_float(pcm[:samples * self.frame_bytes], samples)
+                                   * self.unduck[:samples]))
+            elif self.tail:
+                head = self._read_exact(decoder.stdout, len(self.tail))
+                mixed = self._mix_transition(head, speech)
+                self.stats["transitions"] += 1
+                self.tail = b""
+                write(mixed)
+
+            # Основной поток — без обработки; хвост музыки придерживаем для перехода
+            keep = 0 if speech else self.tail_bytes
+            pending = bytearray()
+            while True:
+                chunk = decoder.stdout.read1(READ_CHUNK)
+                if not chunk: break
+                pending += chunk
+                ready = len(pending) - keep
+                ready -= ready % self.frame_bytes
+                if ready > 0:
+                    with memoryview(pending) as view:
+                        write(view[:ready])
+                    del pending[:ready]
+            self.tail = bytes(pending)
+        finally:
+            self._close(decoder)
+            cpu = time.thread_time() - cpu_started
+            self.stats["cpu_seconds"] += cpu
+            self.stats["last_cpu_seconds"] = cpu
+
+    def flush(self, write):
+        """Доигрывает удержанный хвост (например, когда следующего элемента нет)."""
+        if self.bed:
+            self._release_bed(write)
+        if self.tail:
+            tail, self.tail = self.tail, b""
+            write(tail)
@@ -8,6 +8,8 @@ import os
 from .base_module import RadioModule
 from logger import log
 import config as radio_config
+import broadcaster
+import pretranscode
 
 app = Flask(__name__)
 shared_modules = {}
@@ -71,6 +73,63 @@ def get_logs():
         return jsonify({"status": "ok", "logs": "".join(lines[-100:])})
     except: return jsonify({"status": "ok", "logs": "Нет логов."})
 
+def get_music_module():
+    music = shared_modules.get('music')
+    return music if music and hasattr(music, 'get_queue') else None
+
+def queue_item_id(data):
+    """id элемента очереди из тела запроса или None, если его нет или это не число."""
+    try: return int(data['id'])
+    except (KeyError, TypeError, ValueError): return None
+
+def bad_item_id():
+    return jsonify({"status": "error", "message": "Нужен числовой id элемента очереди"}), 400
+
+@app.route('/api/queue', methods=['GET'])
+@requires_auth
+def get_queue():
+    music = get_music_module()
+    if not music: return jsonify({"status": "error", "message": "Модуль music не загружен"}), 404
+    return jsonify({"status": "ok", "queue": music.get_queue(), "buffer": music.get_buffer_stats(),
+                    "pretranscode": pretranscode.get_stats()})
+
+@app.route('/api/queue/next', methods=['POST'])
+@requires_auth
+def queue_play_next():
+    """{"id": <id в очереди>} — перенести в начало; {"path": <файл в MUSIC_DIR>} — поставить следующим."""
+    music = get_music_module()
+    if not music: return jsonify({"status": "error", "message": "Модуль music не загружен"}), 404
+    data = request.get_json(silent=True) or {}
+    if 'id' in data:
+        item_id = queue_item_id(data)
+        if item_id is None: return bad_item_id()
+        ok = music.play_next(item_id)
+    elif isinstance(data.get('path'), str):
+        path = data['path'] if os.path.isabs(data['path']) else os.path.join(radio_config.MUSIC_DIR, data['path'])
+        ok = music.inject_local(path) is not None
+    else:
+        ok = False
+    if not ok: return jsonify({"status": "error", "message": "Трек не найден"}), 404
+    return jsonify({"status": "ok", "queue": music.get_queue()})
+
+@app.route('/api/queue/remove', methods=['POST'])
+@requires_auth
+def queue_remove():
+    music = get_music_module()
+    if not music: return jsonify({"status": "error", "message": "Модуль music не загружен"}), 404
+    item_id = queue_item_id(request.get_json(silent=True) or {})
+    if item_id is None: return bad_item_id()
+    if not music.remove_queued(item_id):
+        return jsonify({"status": "error", "message": "Трек не найден"}), 404
+    return jsonify({"status": "ok", "queue": music.get_queue()})
+
+@app.route('/api/skip', methods=['POST'])
+@requires_auth
+def skip_current():
+    if not broadcaster.skip_current():
+        return jsonify({"status": "error", "message": "Сейчас ничего не играет"}), 409
+    return jsonify({"status": "ok", "message": "Пропущено"})
+
 class AdminPanelModule(RadioModule):
     def __init__(self):
         super().__init__()
@@ -5,9 +5,15 @@ import random
 import time
 import subprocess
 import re
+import queue
+import threading
+import collections
 from gtts import gTTS  # Библиотека Google TTS
 from .base_module import RadioModule
+from .music_module import music_queue
 from logger import log
+import pretranscode
+import tts_cache
 
 # Импортируем значения по умолчанию из файла данных
 # (Убедитесь, что dj_data.py существует и содержит эти переменные)
@@ -18,14 +24,34 @@ from dj_data import (
     DEFAULT_TRANSITIONS_LIST
 )
 
+# Скорость речи edge-tts (немного ускоряем для динамики)
+EDGE_TTS_RATE = "+5%"
+# Сколько отыгравших треков помнить ради заранее озвученных outro
+PLAYED_RENDERS = 3
+
 class DjModule(RadioModule):
     """
     Модуль DJ. Генерирует подводки к трекам, используя разные TTS движки
     и подмешивая интересные факты из модуля Facts.
     """
     
+    _prerender_started = False
+
     def __init__(self):
         super().__init__()
+        # Заранее озвученные подводки: id трека в очереди музыки ->
+        # {"title", "engine", "voice", "intro": (текст, файл), "outro": ...} или None, пока готовится
+        self.renders = {}
+        self.played_renders = collections.OrderedDict()  # Ушедшие в эфир треки (для outro)
+        self.render_lock = threading.Lock()
+        self.render_jobs = queue.Queue()
+        self.all_modules = {}
+
+        if not DjModule._prerender_started:
+            # Озвучиваем подводки, пока трек ждет в буфере, — в момент эфира DJ только берет готовый файл
+            music_queue.add_listener(self._on_queue_change)
+            threading.Thread(target=self._prerender_worker, daemon=True).start()
+            DjModule._prerender_started = True
     
     def get_config_schema(self):
         return {
@@ -60,6 +86,12 @@ class DjModule(RadioModule):
                 "label": "Шаблоны с ФАКТАМИ (используйте {fact} и {title})",
                 "type": "textarea",
                 "default": DEFAULT_TRANSITIONS_STR
+            },
+            "prerender": {
+                "label": "Озвучивать подводки заранее (пока трек в очереди)",
+                "type": "select",
+                "options": ["yes", "no"],
+                "default": "yes"
             }
         }
 
@@ -81,15 +113,45 @@ class DjModule(RadioModule):
     def _generate_speech_file(self, text, engine, voice):
         """
         Генерирует MP3 файл с речью, используя выбранный движок.
+        Уже звучавшая фраза с теми же настройками берется из кэша (tts_cache)
+        без обращения к TTS; такой файл удалять после эфира нельзя.
         """
         clean_text = self._clean_text_for_tts(text)
         if not clean_text:
             log("⚠️ [DjModule] Пустой текст для озвучки.")
             return None
-        
-        output_filename = os.path.join("channel", f"dj_{int(time.time())}.mp3")
+
+        # Голос и скорость влияют на звук только у edge-tts
+        if engine == "edge-tts":
+            cache_key = tts_cache.key(clean_text, engine, voice, EDGE_TTS_RATE)
+        else:
+            cache_key = tts_cache.key(clean_text, engine, "", "")
+        cached = tts_cache.lookup(cache_key)
+        if cached:
+            log(f"💾 DJ (кэш): {clean_text}")
+            return cached
+
+        if tts_cache.ENABLED:
+            output_filename = tts_cache.temp_path(cache_key)
+        else:
+            output_filename = os.path.join("channel", f"dj_{int(time.time() * 1000)}.mp3")
         log(f"🗣️ DJ ({engine}): {clean_text}")
+        if self._synthesize(clean_text, engine, voice, output_filename) is None:
+            if os.path.exists(output_filename):
+                os.remove(output_filename)
+            return None
+        if not tts_cache.ENABLED:
+            return output_filename
 
+        try:
+            return tts_cache.store(cache_key, output_filename)
+        except OSError as e:
+            # Файл остается временным и удалится после эфира
+            log(f"⚠️ [DjModule] Не удалось сохранить речь в кэш: {e}")
+            return output_filename
+
+    def _synthesize(self, clean_text, engine, voice, output_filename):
+        """Синтезирует речь в output_filename. Возвращает путь или None при ошибке."""
         try:
             # --- ДВИЖОК 1: EDGE-TTS (Microsoft Azure Free) ---
             if engine == "edge-tts":
@@ -98,7 +160,7 @@ class DjModule(RadioModule):
                     "--voice", voice,
                     "--text", clean_text,
                     "--write-media", output_filename,
-                    "--rate=+5%" # Немного ускоряем для динамики
+                    f"--rate={EDGE_TTS_RATE}"
                 ]
                 # Запускаем внешний процесс с таймаутом
                 subprocess.run(
@@ -128,6 +190,109 @@ class DjModule(RadioModule):
             log(f"❌ [DjModule] Ошибка генерации ({engine}): {e}")
             return None
 
+    def _intro_text(self, next_track_title):
+        """Подводка к треку: шаблон INTRO или (с шансом fact_chance) переход с фактом."""
+        try:
+            fact_chance = float(self.config.get("fact_chance", 0.5))
+        except (ValueError, TypeError):
+            fact_chance = 0.5
+
+        # Получаем списки шаблонов из настроек
+        raw_intros = self.config.get("intros", "")
+        intros_list = [l.strip() for l in raw_intros.split('\n') if l.strip()]
+        if not intros_list: intros_list = DEFAULT_INTROS_LIST
+
+        raw_trans = self.config.get("transitions", "")
+        trans_list = [l.strip() for l in raw_trans.split('\n') if l.strip()]
+        if not trans_list: trans_list = DEFAULT_TRANSITIONS_LIST
+
+        # Решаем, говорить факт или нет
+        if random.random() < fact_chance:
+            # Пытаемся получить факт из модуля FactsModule
+            fact_text = None
+            target_module_name = self.config.get("facts_module_name", "facts")
+            facts_module = self.all_modules.get(target_module_name)
+            
+            if facts_module and hasattr(facts_module, "get_random_fact"):
+                fact_text = facts_module.get_random_fact()
+            
+            if fact_text:
+                # Есть факт -> используем шаблон переходов
+                template = random.choice(trans_list)
+                return template.replace("{fact}", fact_text).replace("{title}", next_track_title)
+
+        # Шанс не выпал или факта нет -> используем обычное интро
+        template = random.choice(intros_list)
+        return template.replace("{title}", next_track_title)
+
+    def _outro_text(self, title):
+        return f"Только что прозвучал {title}. Продолжаем эфир!"
+
+    # --- ЗАРАНЕЕ ОЗВУЧЕННЫЕ ПОДВОДКИ ---
+
+    def _on_queue_change(self, event, item):
+        """Подписчик очереди музыки (вызывается под ее блокировкой — только учет)."""
+        queue_id = item.get("queue_id")
+        with self.render_lock:
+            if event == "put":
+                self.renders[queue_id] = None
+                self.render_jobs.put((queue_id, item["meta"]))
+            elif event == "remove":
+                # Трек не прозвучит — его заготовки больше не нужны
+                self.renders.pop(queue_id, None)
+            elif event == "take":
+                # Трек ушел в эфир: intro уже не понадобится, outro — после него
+                self.played_renders[queue_id] = self.renders.pop(queue_id, None)
+                while len(self.played_renders) > PLAYED_RENDERS:
+                    self.played_renders.popitem(last=False)
+
+    def _prerender_worker(self):
+        """Фоновая озвучка intro и outro для треков, попавших в буфер."""
+        while True:
+            queue_id, meta = self.render_jobs.get()
+            with self.render_lock:
+                if queue_id not in self.renders:
+                    continue  # Трек уже убрали из очереди
+            # Заготовки живут в кэше речи; без кэша их негде держать
+            if self.config.get("prerender", "yes") != "yes" or not tts_cache.ENABLED:
+                continue
+
+            engine = self.config.get("engine", "edge-tts")
+            voice = self.config.get("voice", "ru-RU-DmitryNeural")
+            title = meta.get("title") or "следующий трек"
+            render = {"title": title, "engine": engine, "voice": voice}
+            try:
+                for mode, text in (("intro", self._intro_text(title)), ("outro", self._outro_text(title))):
+                    audio_path = self._generate_speech_file(text, engine, voice)
+                    render[mode] = (text, audio_path) if audio_path and tts_cache.owns(audio_path) else None
+            except Exception as e:
+                log(f"❌ [DjModule] Ошибка заготовки подводки: {e}")
+                continue
+
+            with self.render_lock:
+                if queue_id in self.renders:
+                    self.renders[queue_id] = render
+                elif queue_id in self.played_renders:
+                    self.played_renders[queue_id] = render
+
+    def _find_render(self, mode, title, engine, voice):
+        """Готовая подводка (текст, файл) для трека title или None."""
+        if mode == "intro":
+            # Следующий MUSIC получит голову очереди
+            item = music_queue.peek()
+            with self.render_lock:
+                candidates = [self.renders.get(item["queue_id"])] if item else []
+        else:
+            with self.render_lock:
+                candidates = list(reversed(self.played_renders.values()))
+
+        for render in candidates:
+            if (render and render.get(mode) and render["title"] == title
+                    and render["engine"] == engine and render["voice"] == voice
+                    and os.path.exists(render[mode][1])):  # Файл мог уйти из кэша речи
+                return render[mode]
+        return None
+
     def prepare(self, event_config, context):
         """
         Основной метод, вызываемый Оркестратором.
@@ -135,16 +300,14 @@ class DjModule(RadioModule):
         # 1. Читаем настройки из конфига (или берем дефолтные)
         engine = self.config.get("engine", "edge-tts")
         voice = self.config.get("voice", "ru-RU-DmitryNeural")
-        try:
-            fact_chance = float(self.config.get("fact_chance", 0.5))
-        except (ValueError, TypeError):
-            fact_chance = 0.5
+        self.all_modules = context.get("all_modules", {})
 
         # 2. Определяем, что говорить (текст или шаблон)
         mode = event_config.get("mode", "intro")
         custom_text = event_config.get("text")
         
         final_text = ""
+        audio_path = None
 
         # --- СЦЕНАРИЙ 1: Пользовательский текст (Custom) ---
         if custom_text:
@@ -153,62 +316,45 @@ class DjModule(RadioModule):
         # --- СЦЕНАРИЙ 2: Подводка к следующему треку (Intro) ---
         elif mode == "intro":
             next_track_title = context.get("next_track_title", "следующий трек")
-            
-            # Получаем списки шаблонов из настроек
-            raw_intros = self.config.get("intros", "")
-            intros_list = [l.strip() for l in raw_intros.split('\n') if l.strip()]
-            if not intros_list: intros_list = DEFAULT_INTROS_LIST
-
-            raw_trans = self.config.get("transitions", "")
-            trans_list = [l.strip() for l in raw_trans.split('\n') if l.strip()]
-            if not trans_list: trans_list = DEFAULT_TRANSITIONS_LIST
-
-            # Решаем, говорить факт или нет
-            if random.random() < fact_chance:
-                # Пытаемся получить факт из модуля FactsModule
-                fact_text = None
-                target_module_name = self.config.get("facts_module_name", "facts")
-                all_modules = context.get("all_modules", {})
-                
-                facts_module = all_modules.get(target_module_name)
-                
-                if facts_module and hasattr(facts_module, "get_random_fact"):
-                    fact_text = facts_module.get_random_fact()
-                
-                if fact_text:
-                    # Есть факт -> используем шаблон переходов
-                    template = random.choice(trans_list)
-                    final_text = template.replace("{fact}", fact_text).replace("{title}", next_track_title)
-                else:
-                    # Нет факта -> используем обычное интро
-                    template = random.choice(intros_list)
-                    final_text = template.replace("{title}", next_track_title)
+            rendered = None
+            if "next_track_title" in context:
+                rendered = self._find_render("intro", next_track_title, engine, voice)
+            if rendered:
+                final_text, audio_path = rendered
             else:
-                # Шанс не выпал -> используем обычное интро
-                template = random.choice(intros_list)
-                final_text = template.replace("{title}", next_track_title)
+                final_text = self._intro_text(next_track_title)
         
         # --- СЦЕНАРИЙ 3: Завершение (Outro) ---
         elif mode == "outro":
             last_meta = context.get('last_track_meta')
             title = last_meta.get('title') if last_meta else "хороший трек"
-            final_text = f"Только что прозвучал {title}. Продолжаем эфир!"
+            rendered = self._find_render("outro", title, engine, voice) if last_meta else None
+            if rendered:
+                final_text, audio_path = rendered
+            else:
+                final_text = self._outro_text(title)
 
         # 3. Если текст пустой, ничего не делаем
         if not final_text:
             return None
         
-        # 4. Генерируем аудиофайл
-        audio_path = self._generate_speech_file(final_text, engine, voice)
+        # 4. Генерируем аудиофайл (если он не озвучен заранее)
+        if audio_path:
+            log(f"⚡ DJ (заготовка): {final_text}")
+        else:
+            audio_path = self._generate_speech_file(final_text, engine, voice)
         
         if audio_path:
+            # Речь TTS приводим к формату эфира в фоне
+            pretranscode.submit(audio_path)
             return {
                 "audio_path": audio_path,
                 "meta": {
                     "title": "Mafioznik DJ", 
                     "image": "https://cdn-o.suno.com/Logo-7.svg"
                 },
-                "cleanup": True # Файл временный, после эфира удалить
+                # Временный файл после эфира удалить; фразу из кэша — оставить
+                "cleanup": not tts_cache.owns(audio_path)
             }
             
-        return None
\ No newline at end of file
+        return None
@@ -1,9 +1,9 @@
 # /opt/radio/modules/facts_module.py
 
 import random
-import requests
 from .base_module import RadioModule
 from logger import log
+import http_client
 
 # Дефолтные факты, если конфиг пустой
 DEFAULT_BACKUP_FACTS = [
@@ -54,7 +54,8 @@ class FactsModule(RadioModule):
         if api_url:
             try:
                 headers = {'Accept': 'application/json', 'X-Requested-With': 'XMLHttpRequest'}
-                response = requests.post(api_url, headers=headers, timeout=2)
+                # Без повторов: DJ ждет факт не дольше таймаута
+                response = http_client.session(retries=False).post(api_url, headers=headers, timeout=2)
                 if response.status_code == 200:
                     data = response.json()
                     # Адаптация под randstuff.ru, можно усложнить для других API
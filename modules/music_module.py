@@ -1,22 +1,136 @@
 # /opt/radio/modules/music_module.py
 
 import os
-import queue
-import random
 import threading
 import time
-import requests
 import re
-import shutil
+import json
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from .base_module import RadioModule
 import config
+import loudness
+import http_client
+import track_cache
+import catalog
+import rotation
+import mp3_frames
+import play_queue
+import library_watcher
+import artwork
+import pretranscode
 from logger import log
 
-# Очередь (буфер) для готовых треков
-music_queue = queue.Queue(maxsize=config.BUFFER_SIZE)
+# Очередь (буфер) для готовых треков с приоритетами ("сыграть следующим").
+# Размер буфера считается в секундах аудио (PrefetchController)
+music_queue = play_queue.PlayQueue()
+
+# Сколько секунд музыки держать готовыми и верхний предел, до которого цель может вырасти
+PREFETCH_TARGET_SEC = float(getattr(config, "PREFETCH_TARGET_SEC", 600))
+PREFETCH_MAX_SEC = float(getattr(config, "PREFETCH_MAX_SEC", 3600))
+# Запас на столько загрузок подряд, если сеть медленная
+PREFETCH_SAFETY = 3
+# Цель растет на (1 + FAILURE_FACTOR * доля неудачных загрузок)
+PREFETCH_FAILURE_FACTOR = 2.0
+# Длительность трека, пока нет замеров
+DEFAULT_TRACK_SEC = 180.0
+# Сглаживание замеров (экспоненциальное среднее)
+EWMA_ALPHA = 0.3
+
+# Проверка скачанных файлов: короче — скорее всего не трек (страница ошибки, обрывок)
+MIN_TRACK_SEC = 5.0
+# Больше этой доли мусора — файл не чиним, а отбрасываем
+MAX_JUNK_RATIO = 0.05
+
+# Параллельная загрузка: всего потоков и не больше N одновременных запросов к одному хосту
+DOWNLOAD_WORKERS = max(1, int(getattr(config, "DOWNLOAD_WORKERS", 4)))
+DOWNLOAD_PER_HOST = max(1, int(getattr(config, "DOWNLOAD_PER_HOST", 2)))
+
+# Обход разделов Suno: каждый раздел листается постранично, позиция сохраняется в каталоге
+DISCOVERY_SECTIONS = getattr(config, "SUNO_DISCOVERY_SECTIONS", None) or [
+    {"section_name": "trending_songs", "section_content": "Global", "secondary_section_content": "Now"}
+]
+DISCOVERY_PAGE_SIZE = 25
+# Когда в плейлисте остается меньше треков, фоновый поиск подгружает следующую страницу
+DISCOVERY_LOW_WATER = max(1, int(getattr(config, "DISCOVERY_LOW_WATER", 10)))
+# Не повторять треки, звучавшие за последние N часов
+DISCOVERY_REPEAT_HOURS = float(getattr(config, "DISCOVERY_REPEAT_HOURS", 24))
+# Сколько помнить id, уже поставленные в плейлист. К этому времени трек либо
+# отзвучал (и отсеивается по истории эфира), либо выпал из очереди
+DISCOVERY_MEMORY_SEC = 2 * 3600
+# После стольких раундов подряд без новых треков плейлист пополняется из каталога
+DISCOVERY_MAX_EMPTY_ROUNDS = 5
+# Пауза между пустыми раундами растет вдвое, до этого предела
+DISCOVERY_BACKOFF_MAX_SEC = 60
+# Сколько треков локальной библиотеки подгружать в ротацию за раз
+LOCAL_REFILL_LIMIT = 100
+
+class PrefetchController:
+    """
+    Адаптивная глубина упреждающей загрузки.
+    Держит в буфере PREFETCH_TARGET_SEC секунд музыки; цель растет, если
+    загрузки часто падают или один трек качается дольше, чем позволяет запас.
+    Сколько загрузок запускать параллельно, решается по нехватке секунд
+    до цели, а не по фиксированному числу треков.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.throughput = None       # байт/сек на одну загрузку
+        self.track_bytes = None      # средний размер трека
+        self.track_sec = DEFAULT_TRACK_SEC
+        self.failure_rate = 0.0
+
+    @staticmethod
+    def _ewma(old, value):
+        return value if old is None else old + EWMA_ALPHA * (value - old)
+
+    def record_download(self, ok, size=0, seconds=0.0):
+        with self.lock:
+            self.failure_rate = self._ewma(self.failure_rate, 0.0 if ok else 1.0)
+            if ok and size and seconds > 0:
+                self.throughput = self._ewma(self.throughput, size / seconds)
+                self.track_bytes = self._ewma(self.track_bytes, size)
+
+    def record_track(self, duration):
+        with self.lock:
+            self.track_sec = self._ewma(self.track_sec, duration)
+
+    def target_sec(self):
+        with self.lock:
+            target = PREFETCH_TARGET_SEC * (1 + PREFETCH_FAILURE_FACTOR * self.failure_rate)
+            if self.throughput and self.track_bytes:
+                fetch_sec = self.track_bytes / self.throughput
+                # Сеть медленная: запас должен покрывать несколько загрузок подряд
+                target = max(target, fetch_sec * PREFETCH_SAFETY)
+        return min(target, PREFETCH_MAX_SEC)
+
+    def wants_more(self, in_flight):
+        """Нужна ли еще загрузка, если in_flight треков уже качается."""
+        target = self.target_sec()
+        with self.lock:
+            return music_queue.duration + in_flight * self.track_sec < target
+
+    def get_stats(self):
+        target = self.target_sec()
+        # Очередь опрашиваем вне self.lock: wants_more вызывается под блокировкой очереди
+        buffered_sec, buffered_tracks = music_queue.duration, len(music_queue)
+        with self.lock:
+            return {
+                "buffered_sec": buffered_sec,
+                "buffered_tracks": buffered_tracks,
+                "target_sec": target,
+                "throughput_kbps": (self.throughput or 0.0) * 8 / 1000,
+                "failure_rate": self.failure_rate
+            }
+
+prefetch = PrefetchController()
 
 class MusicModule(RadioModule):
     _downloader_started = False
+    _host_slots = {}
+    _host_slots_lock = threading.Lock()
     
     def __init__(self):
         super().__init__()
@@ -26,10 +140,19 @@ class MusicModule(RadioModule):
             'Referer': 'https://suno.com/'
         }
         
+        # Пул кандидатов: пополняет фоновый поиск, выбирает ротация (без повторов)
+        self.rotation = rotation.Rotation()
+        self.track_cond = threading.Condition()
+        self.recent_ids = collections.OrderedDict()  # id -> когда поставлен в плейлист
+        self.empty_rounds = 0
+        
         if not MusicModule._downloader_started:
             log("⚙️ [MusicModule] Инициализация загрузчика...")
+            threading.Thread(target=self._discovery_thread, daemon=True).start()
             downloader = threading.Thread(target=self._downloader_thread, daemon=True)
             downloader.start()
+            library_watcher.add_listener(self._on_library_change)
+            library_watcher.start()
             MusicModule._downloader_started = True
 
     def get_config_schema(self):
@@ -98,44 +221,40 @@ class MusicModule(RadioModule):
         """Убирает плохие символы из имени файла."""
         return re.sub(r'[\\/*?:"<>|]', "", name)
 
+    def _host_slot(self, url):
+        """Семафор хоста: ограничивает число одновременных загрузок с одного CDN."""
+        host = urlparse(url).netloc
+        with MusicModule._host_slots_lock:
+            slot = MusicModule._host_slots.get(host)
+            if slot is None:
+                slot = MusicModule._host_slots[host] = threading.BoundedSemaphore(DOWNLOAD_PER_HOST)
+        return slot
+
     def _download_file(self, url, filepath):
         """Скачивает файл с учетом заголовков модуля."""
-        if os.path.exists(filepath):
-            return True
-            
-        try:
-            # Используем заголовки модуля (важно, если Suno включит защиту на CDN)
-            headers = self._get_headers()
-            
-            # Таймаут 30 сек на скачивание
-            with requests.get(url, stream=True, headers=headers, timeout=30) as r:
-                if r.status_code == 200:
-                    with open(filepath, 'wb') as f:
-                        shutil.copyfileobj(r.raw, f)
-                    return True
-                else:
-                    log(f"⚠️ [MusicModule] Ошибка скачивания {url}: HTTP {r.status_code}")
-                    return False
-        except Exception as e:
-            log(f"❌ [MusicModule] Исключение при скачивании: {e}")
-            return False
+        # Используем заголовки модуля (важно, если Suno включит защиту на CDN)
+        # Таймаут 30 сек на скачивание; оборванная загрузка докачивается из .part
+        with self._host_slot(url):
+            return http_client.download(url, filepath, headers=self._get_headers(), timeout=30)
 
-    def _fetch_suno_tracks(self):
-        """Запрашивает список треков у API."""
+    def _fetch_suno_tracks(self, section, page):
+        """Запрашивает у API одну страницу раздела. None — API недоступен."""
         url = self.config.get("suno_api_url", "https://studio-api.prod.suno.com/api/discover")
         headers = self._get_headers()
 
         payload = {
-            "start_index": 0, "page_size": 25,
-            "section_name": "trending_songs", "section_content": "Global",
-            "secondary_section_content": "Now", "page": 1, "disable_shuffle": False
+            "start_index": (page - 1) * DISCOVERY_PAGE_SIZE, "page_size": DISCOVERY_PAGE_SIZE,
+            "section_name": section.get("section_name", "trending_songs"),
+            "section_content": section.get("section_content", "Global"),
+            "secondary_section_content": section.get("secondary_section_content", "Now"),
+            "page": page, "disable_shuffle": False
         }
 
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = http_client.session().post(url, headers=headers, json=payload, timeout=10)
             if response.status_code != 200:
                 log(f"❌ [MusicModule] Ошибка API Suno: {response.status_code}. Проверьте токен!")
-                return []
+                return None
 
             data = response.json()
             tracks = []
@@ -148,101 +267,317 @@ class MusicModule(RadioModule):
                         audio_url = item.get('audio_url')
                         title = item.get('title', 'Unknown Title')
                         song_id = item.get('id')
+                        artist = item.get('display_name') or ''
                         image_url = item.get('image_large_url') or item.get('image_url')
 
                         if audio_url and song_id:
                             tracks.append({
                                 'title': title, 'url': audio_url,
                                 'id': song_id, 'image': image_url,
-                                'is_local': False
+                                'artist': artist, 'is_local': False
                             })
             return tracks
 
         except Exception as e:
             log(f"❌ [MusicModule] Ошибка соединения с API: {e}")
-            return []
+            return None
 
-    def _get_local_tracks(self):
-        """Резервный источник: локальная папка."""
+    def _get_local_tracks(self, source=None):
+        """Резервный источник: музыка из каталога (с файлами на диске)."""
         try:
-            files = [f for f in os.listdir(config.MUSIC_DIR) if f.endswith(".mp3")]
-            tracks = []
-            for f in files:
-                # Игнорируем файлы, созданные DJ или рекламой
-                if f.startswith("dj_") or f.startswith("ad_") or f.startswith("news_"): 
-                    continue
-                    
-                tracks.append({
-                    'title': os.path.splitext(f)[0],
-                    'url': os.path.join(config.MUSIC_DIR, f),
-                    'id': f, 'image': '', 'is_local': True
-                })
-            return tracks
-        except Exception:
+            # Пока работает inotify, каталог уже актуален — папку не читаем
+            if not library_watcher.is_live():
+                catalog.sync_local()
+            return catalog.local_tracks(LOCAL_REFILL_LIMIT, source)
+        except Exception as e:
+            log(f"❌ [MusicModule] Ошибка чтения каталога: {e}")
             return []
 
+    def _on_library_change(self, added, removed):
+        """
+        Новые файлы в MUSIC_DIR сразу попадают в ротацию (если локальная
+        библиотека разрешена в настройках), удаленные — убираются из нее.
+        """
+        if self.config.get("use_local_backup", "yes") != "yes":
+            added = []
+        with self.track_cond:
+            count = sum(self.rotation.add(track) for track in added)
+            for path in removed:
+                self.rotation.remove(os.path.basename(path))
+            self.track_cond.notify_all()
+        if count:
+            log(f"📥 [MusicModule] Новые треки в библиотеке добавлены в ротацию: {count}.")
+
+    def _discover_round(self):
+        """
+        Один шаг обхода: следующая страница очередного раздела (по кругу).
+        Возвращает новые треки без повторов или None, если API недоступен.
+        """
+        try:
+            cursor = json.loads(catalog.get_state("suno_cursor") or "{}")
+        except ValueError:
+            cursor = {}
+        index = cursor.get("section", 0) % len(DISCOVERY_SECTIONS)
+        section = DISCOVERY_SECTIONS[index]
+        key = "/".join(section.get(k, "") for k in ("section_name", "section_content", "secondary_section_content"))
+        pages = cursor.setdefault("pages", {})
+        page = pages.get(key, 1)
+
+        tracks = self._fetch_suno_tracks(section, page)
+        if tracks is None:
+            return None
+
+        # Пустая страница — раздел пройден, начинаем его сначала
+        pages[key] = page + 1 if tracks else 1
+        cursor["section"] = index + 1
+        catalog.set_state("suno_cursor", json.dumps(cursor))
+
+        now = time.time()
+        while self.recent_ids and next(iter(self.recent_ids.values())) < now - DISCOVERY_MEMORY_SEC:
+            self.recent_ids.popitem(last=False)
+
+        # Отсеиваем звучавшие недавно (по каталогу) и уже стоящие в плейлисте
+        stats = catalog.play_stats(track['id'] for track in tracks)
+        repeat_since = now - DISCOVERY_REPEAT_HOURS * 3600
+        fresh = []
+        for track in tracks:
+            track['play_count'], track['last_played'] = stats.get(track['id'], (0, None))
+            if (track['last_played'] or 0) >= repeat_since or track['id'] in self.recent_ids:
+                continue
+            self.recent_ids[track['id']] = now
+            fresh.append(track)
+
+        log(f"📡 [MusicModule] {key}, стр. {page}: новых треков {len(fresh)} из {len(tracks)}.")
+        return fresh
+
+    def _discovery_thread(self):
+        """
+        Фоновый поиск музыки: пополняет плейлист заранее, пока в нем еще
+        есть треки, поэтому загрузчик не ждет ответа API.
+        """
+        while True:
+            with self.track_cond:
+                while len(self.rotation) >= DISCOVERY_LOW_WATER:
+                    self.track_cond.wait()
+
+            new_tracks = self._discover_round()
+            if new_tracks:
+                self.empty_rounds = 0
+            else:
+                self.empty_rounds += 1
+                # API недоступен или страницы раз за разом из одних повторов — берем треки из каталога
+                if new_tracks is None or self.empty_rounds >= DISCOVERY_MAX_EMPTY_ROUNDS:
+                    new_tracks = self._fallback_tracks(new_tracks is None)
+
+            added = 0
+            if new_tracks:
+                with self.track_cond:
+                    added = sum(self.rotation.add(track) for track in new_tracks)
+                    self.track_cond.notify_all()
+            if added:
+                log(f"✅ [MusicModule] Загружено в ротацию: {added} треков.")
+            else:
+                # Листаем дальше с нарастающей паузой, не заваливая API
+                delay = min(DISCOVERY_BACKOFF_MAX_SEC, 2 ** max(1, self.empty_rounds))
+                if self.empty_rounds >= DISCOVERY_MAX_EMPTY_ROUNDS:
+                    log(f"❌ [MusicModule] Нет новых треков. Пауза {delay} сек.")
+                time.sleep(delay)
+
+    def _fallback_tracks(self, api_down):
+        """
+        Треки из каталога, когда Suno не дает новых: локальная библиотека
+        (если разрешена) и ранее скачанные треки, звучавшие раньше всех.
+        """
+        use_local = self.config.get("use_local_backup", "yes") == "yes"
+        reason = "API недоступен" if api_down else f"{self.empty_rounds} раундов без новых треков"
+        where = "локальную библиотеку" if use_local else "скачанные ранее треки"
+        log(f"⚠️ [MusicModule] {reason}. Переход на {where}.")
+        return self._get_local_tracks(None if use_local else 'suno')
+
+    def _take_track(self, timeout):
+        """Выбирает следующий трек ротацией (ждет до timeout сек). None — пул пуст."""
+        with self.track_cond:
+            if not len(self.rotation) and timeout:
+                self.track_cond.wait(timeout)
+            track_meta = self.rotation.pick()
+            if track_meta is None:
+                return None
+            # Будим фоновый поиск: возможно, пора пополнить плейлист
+            self.track_cond.notify_all()
+            return track_meta
+
+    def _validate_track(self, song_path):
+        """
+        Проверяет скачанный MP3 по кадрам (весь файл, без ffprobe).
+        Мелкие повреждения (мусор между кадрами, оборванный конец) чинит,
+        сильно поврежденный файл удаляет. Возвращает длительность или None.
+        """
+        try:
+            data = mp3_frames.read_file(song_path)
+            result = mp3_frames.scan(data)
+            damaged = result.junk_bytes + result.tail_bytes
+
+            if result.duration < MIN_TRACK_SEC or damaged > MAX_JUNK_RATIO * len(data):
+                log(f"🚫 [MusicModule] Файл поврежден или не MP3 (кадров: {result.frames}, "
+                    f"мусора: {damaged} байт): {os.path.basename(song_path)}")
+                os.remove(song_path)
+                return None
+
+            if damaged:
+                tmp_path = song_path + ".tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(mp3_frames.repair(data, result))
+                os.replace(tmp_path, song_path)
+                log(f"🩹 [MusicModule] Файл починен (убрано {damaged} байт мусора): {os.path.basename(song_path)}")
+            return result.duration
+        except OSError as e:
+            log(f"❌ [MusicModule] Ошибка проверки файла {song_path}: {e}")
+            return None
+
+    def _prepare_track(self, track_meta):
+        """Готовит файл трека (выполняется в пуле загрузки). None — трек пропускается."""
+        duration = None
+        if track_meta.get('is_local'):
+            # Локальный файл уже на диске; пока трек в очереди, кэш его не удалит
+            song_path = track_meta['url']
+            track_cache.hold(song_path)
+        else:
+            # Удаленный файл надо скачать
+            safe_title = self._sanitize_filename(track_meta['title'])
+            # Ограничиваем длину имени файла, чтобы не было ошибок ОС
+            safe_title = safe_title[:50] 
+            filename = f"{safe_title}_{track_meta['id']}.mp3"
+            song_path = os.path.join(config.MUSIC_DIR, filename)
+
+            # Найденный или скачанный трек сразу защищен: освобождение места не удалит его до эфира
+            if track_cache.lookup(song_path, hold=True):
+                log(f"🗃️ [MusicModule] Трек уже в кэше: {track_meta['title']}")
+            elif not track_meta['url'].startswith(('http://', 'https://')):
+                # Трек Suno из каталога (адрес — путь на диске), а файл уже удален из кэша
+                log(f"⚠️ [MusicModule] Пропуск трека (файла больше нет): {track_meta['title']}")
+                return None
+            else:
+                log(f"📥 [MusicModule] Скачивание: {track_meta['title']}...")
+                started = time.monotonic()
+                if not self._download_file(track_meta['url'], song_path):
+                    prefetch.record_download(False)
+                    log(f"⚠️ [MusicModule] Пропуск трека (ошибка загрузки): {track_meta['title']}")
+                    return None
+                elapsed = time.monotonic() - started
+                size = os.path.getsize(song_path)
+
+                # Битый файл не должен дойти до эфира
+                duration = self._validate_track(song_path)
+                if duration is None:
+                    prefetch.record_download(False)
+                    return None
+                prefetch.record_download(True, size, elapsed)
+                track_cache.add(song_path, hold=True)
+                catalog.add_track(track_meta, song_path, duration)
+
+        loudness.submit(track_meta, song_path)
+        # Обложку кэшируем заранее, чтобы в эфире отдавать ее со своего сервера
+        artwork.fetch(track_meta.get('image'), song_path)
+        # Перекодирование в формат эфира идет в фоне, пока трек ждет в очереди
+        pretranscode.submit(song_path)
+        duration = duration or catalog.track_duration(song_path) or DEFAULT_TRACK_SEC
+        return {"song_path": song_path, "meta": track_meta, "duration": duration}
+
     def _downloader_thread(self):
-        """Фоновый процесс: следит за буфером и качает музыку."""
-        track_list = []
+        """
+        Фоновый процесс: следит за буфером и качает музыку.
+        Несколько треков скачиваются одновременно в пуле, но в буфер
+        попадают строго в порядке плейлиста.
+        """
+        pending = collections.deque()  # Загрузки в порядке плейлиста
+        pool = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="music-download")
         
         while True:
-            # 1. Если буфер полон, спим
-            if music_queue.full():
-                time.sleep(2)
+            # 1. Запускаем загрузки, пока есть свободные потоки и буфер (в секундах) не набран
+            while len(pending) < DOWNLOAD_WORKERS and prefetch.wants_more(len(pending)):
+                # 2. Берем трек из ротации (пул заранее пополняет фоновый поиск);
+                # ждем, только если ничего не качается
+                track_meta = self._take_track(0 if pending else 5)
+                if track_meta is None:
+                    break
+                pending.append(pool.submit(self._prepare_track, track_meta))
+
+            if not pending:
+                # Буфер полон — ждем, пока эфир заберет трек (очередь сама разбудит)
+                music_queue.wait_for(lambda: prefetch.wants_more(0))
                 continue
 
-            # 2. Если список воспроизведения пуст, получаем новый
-            if not track_list:
-                log("📡 [MusicModule] Обновление плейлиста...")
-                
-                # Пробуем API
-                new_tracks = self._fetch_suno_tracks()
-                
-                # Если API пусто, пробуем локалку (если разрешено)
-                if not new_tracks and self.config.get("use_local_backup", "yes") == "yes":
-                    log("⚠️ [MusicModule] API недоступен. Переход на локальную библиотеку.")
-                    new_tracks = self._get_local_tracks()
-
-                if new_tracks:
-                    random.shuffle(new_tracks)
-                    track_list.extend(new_tracks)
-                    log(f"✅ [MusicModule] Загружено в список: {len(new_tracks)} треков.")
-                else:
-                    log("❌ [MusicModule] Нет доступных треков. Пауза 30 сек.")
-                    time.sleep(30)
-                    continue
-
-            # 3. Берем трек из списка и готовим файл
-            track_meta = track_list.pop(0)
-            
-            if track_meta.get('is_local'):
-                # Локальный файл уже на диске
-                ready_item = {"song_path": track_meta['url'], "meta": track_meta}
-                music_queue.put(ready_item)
-                log(f"💿 [MusicModule] Локальный файл добавлен в очередь: {track_meta['title']}")
+            # 3. Ждем самый ранний трек — остальные тем временем качаются
+            try:
+                ready_item = pending.popleft().result()
+            except Exception as e:
+                log(f"❌ [MusicModule] Ошибка подготовки трека: {e}")
+                continue
+            if ready_item is None:
+                continue
+
+            prefetch.record_track(ready_item["duration"])
+            music_queue.put(ready_item)
+            if ready_item["meta"].get('is_local'):
+                log(f"💿 [MusicModule] Локальный файл добавлен в очередь: {ready_item['meta']['title']}")
             else:
-                # Удаленный файл надо скачать
-                safe_title = self._sanitize_filename(track_meta['title'])
-                # Ограничиваем длину имени файла, чтобы не было ошибок ОС
-                safe_title = safe_title[:50] 
-                filename = f"{safe_title}_{track_meta['id']}.mp3"
-                song_path = os.path.join(config.MUSIC_DIR, filename)
-                
-                log(f"📥 [MusicModule] Скачивание: {track_meta['title']}...")
-                if self._download_file(track_meta['url'], song_path):
-                     ready_item = {"song_path": song_path, "meta": track_meta}
-                     music_queue.put(ready_item)
-                     log(f"✅ [MusicModule] Готово. В буфере: {music_queue.qsize()}/{config.BUFFER_SIZE}")
-                else:
-                    log(f"⚠️ [MusicModule] Пропуск трека (ошибка загрузки).")
-                    continue
+                cache = track_cache.get_stats()
+                buffer = prefetch.get_stats()
+                log(f"✅ [MusicModule] Готово. В буфере: {buffer['buffered_sec'] / 60:.1f}/{buffer['target_sec'] / 60:.1f} мин "
+                    f"({buffer['buffered_tracks']} тр.; кэш: {cache['tracks']} тр., {cache['size_mb']:.0f} МБ, попаданий {cache['hits']}, "
+                    f"промахов {cache['misses']}, удалено {cache['evictions']})")
+
+    @staticmethod
+    def get_buffer_stats():
+        """Сколько секунд музыки готово к эфиру, текущая цель и замеры загрузок."""
+        return prefetch.get_stats()
 
     @staticmethod
     def peek_next_meta():
         """Позволяет DJ подсмотреть следующий трек."""
-        if not music_queue.empty():
-            try:
-                return music_queue.queue[0]['meta']
-            except:
-                return None
-        return None
\ No newline at end of file
+        item = music_queue.peek()
+        return item['meta'] if item else None
+
+    # --- УПРАВЛЕНИЕ ОЧЕРЕДЬЮ (для админки) ---
+
+    @staticmethod
+    def get_queue():
+        """Очередь готовых треков в порядке эфира."""
+        return [{"id": item_id, "title": item["meta"].get("title", ""),
+                 "duration": item["duration"], "priority": priority}
+                for item_id, priority, item in music_queue.items()]
+
+    @staticmethod
+    def play_next(item_id):
+        """Переносит трек из очереди в ее начало."""
+        return music_queue.play_next(item_id)
+
+    @staticmethod
+    def remove_queued(item_id):
+        """Убирает трек из очереди (он не прозвучит)."""
+        item = music_queue.remove(item_id)
+        if item is None:
+            return False
+        track_cache.release(item["song_path"])
+        pretranscode.discard(item["song_path"])
+        return True
+
+    def inject_local(self, song_path):
+        """Ставит файл из MUSIC_DIR следующим в эфир. Возвращает id в очереди или None."""
+        song_path = os.path.abspath(song_path)
+        if (os.path.dirname(song_path) != os.path.abspath(config.MUSIC_DIR)
+                or not song_path.endswith(".mp3") or not os.path.isfile(song_path)):
+            return None
+
+        track_meta = catalog.find_by_path(song_path) or catalog.add_local(song_path) or {
+            'title': os.path.splitext(os.path.basename(song_path))[0], 'url': song_path,
+            'id': os.path.basename(song_path), 'image': '', 'is_local': True
+        }
+        track_cache.hold(song_path)
+        loudness.submit(track_meta, song_path)
+        artwork.fetch(track_meta.get('image'), song_path)
+        duration = catalog.track_duration(song_path) or DEFAULT_TRACK_SEC
+        item = {"song_path": song_path, "meta": track_meta, "duration": duration}
+        item_id = music_queue.put(item, play_queue.PRIORITY_NEXT)
+        log(f"⏭️ [MusicModule] Оператор поставил следующим: {track_meta['title']}")
+        return item_id
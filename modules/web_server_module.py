@@ -7,6 +7,7 @@ import os
 import logging
 from .base_module import RadioModule
 import config
+import artwork
 
 # Глушим логи Flask, чтобы не засорять консоль радио
 log_flask = logging.getLogger('werkzeug')
@@ -40,6 +41,13 @@ class WebServerModule(RadioModule):
             # Отдаем главную страницу
             return send_from_directory(config.WEB_DIR, 'index.html')
 
+        @self.app.route('/artwork/<name>')
+        def serve_artwork(name):
+            # Имя варианта — хэш адреса обложки, содержимое не меняется: кэшируем на год
+            resp = make_response(send_from_directory(artwork.ARTWORK_DIR, name))
+            resp.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            return resp
+
         @self.app.route('/<path:path>')
         def serve_static(path):
             # Отдаем картинки, скрипты и т.д.
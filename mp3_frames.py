@@ -0,0 +1,255 @@
+# /opt/radio/mp3_frames.py
+
+from collections import namedtuple
+
+# Разбор заголовков MP3 (MPEG Audio) кадров без внешних процессов.
+# Используется вещателем, чтобы отправлять кадры в эфир как есть.
+
+# Таблицы битрейтов (кбит/с) по индексу из заголовка. 0 = free format (не поддерживаем).
+_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+# Частоты дискретизации по версии MPEG (1, 2, 2.5)
+_SAMPLE_RATES = {
+    1: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    2.5: (11025, 12000, 8000),
+}
+
+_VERSIONS = {0b00: 2.5, 0b10: 2, 0b11: 1}
+_LAYERS = {0b01: 3, 0b10: 2, 0b11: 1}
+
+FrameHeader = namedtuple(
+    "FrameHeader",
+    ["version", "layer", "bitrate", "sample_rate", "channels", "size", "samples", "protected"]
+)
+
+# Итог проверки файла: ranges — непрерывные участки кадров [(начало, конец)],
+# junk_bytes — мусор между кадрами, tail_bytes — обрывок/мусор после последнего кадра
+ScanResult = namedtuple(
+    "ScanResult",
+    ["frames", "duration", "audio_start", "ranges", "junk_bytes", "tail_bytes", "id3v1"]
+)
+
+
+def parse_header(data, offset=0):
+    """
+    Разбирает 4-байтовый заголовок кадра по смещению offset.
+    Возвращает FrameHeader или None, если там нет корректного заголовка.
+    """
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset], data[offset + 1], data[offset + 2], data[offset + 3]
+
+    # 11 бит синхронизации
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+
+    version = _VERSIONS.get((b1 >> 3) & 0b11)
+    layer = _LAYERS.get((b1 >> 1) & 0b11)
+    bitrate_index = (b2 >> 4) & 0x0F
+    sr_index = (b2 >> 2) & 0b11
+    if version is None or layer is None or bitrate_index in (0, 15) or sr_index == 3:
+        return None
+
+    bitrate = _BITRATES[(1 if version == 1 else 2, layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sr_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == 0b11 else 2
+
+    if layer == 1:
+        samples = 384
+        size = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    elif layer == 2 or version == 1:
+        samples = 1152
+        size = 144 * bitrate * 1000 // sample_rate + padding
+    else:
+        # Layer III в MPEG-2/2.5 — половинные кадры
+        samples = 576
+        size = 72 * bitrate * 1000 // sample_rate + padding
+
+    return FrameHeader(version, layer, bitrate, sample_rate, channels, size, samples, not (b1 & 1))
+
+
+def frame_duration(header):
+    """Длительность кадра в секундах."""
+    return header.samples / header.sample_rate
+
+
+def id3v2_size(data):
+    """Размер ID3v2-тега в начале файла (0, если тега нет)."""
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def find_frame(data, start=0):
+    """
+    Ищет ближайший кадр начиная со start.
+    Кадр считается настоящим, только если сразу за ним идет еще один заголовок
+    (или конец данных), — так отсеиваются случайные 0xFF в мусоре.
+    Возвращает смещение или -1.
+    """
+    pos = start
+    end = len(data)
+    while True:
+        pos = data.find(b"\xff", pos)
+        if pos < 0 or pos + 4 > end:
+            return -1
+        if _is_confirmed_frame(data, pos):
+            return pos
+        pos += 1
+
+
+def _is_confirmed_frame(data, pos):
+    """Кадр по смещению pos корректен и за ним следует кадр, ID3v1-тег или конец данных."""
+    header = parse_header(data, pos)
+    if header is None:
+        return False
+    nxt = pos + header.size
+    end = len(data)
+    return (nxt == end
+            or (nxt < end and parse_header(data, nxt) is not None)
+            or data[nxt:nxt + 3] == b"TAG")
+
+
+def iter_frames(data, start=None):
+    """
+    Генератор (offset, FrameHeader) по всем кадрам в data.
+    Пропускает ID3v2 в начале и мусор между кадрами (с ресинхронизацией).
+    Обрезанный последний кадр не возвращается.
+    """
+    pos = id3v2_size(data) if start is None else start
+    pos = find_frame(data, pos)
+    end = len(data)
+    while 0 <= pos < end:
+        header = parse_header(data, pos)
+        if header is not None and pos + header.size > end:
+            return
+        if header is None or not _is_confirmed_frame(data, pos):
+            pos = find_frame(data, pos + 1)
+            continue
+        yield pos, header
+        pos += header.size
+
+
+def _is_info_frame(data, offset, header):
+    """Первый кадр — служебный заголовок Xing/Info/VBRI (не звучит)."""
+    if header.layer != 3:
+        return False
+    mono = header.channels == 1
+    if header.version == 1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    tag = offset + 4 + (2 if header.protected else 0) + side_info
+    return data[tag:tag + 4] in (b"Xing", b"Info") or data[offset + 36:offset + 40] == b"VBRI"
+
+
+def scan(data):
+    """
+    Проходит по всем кадрам файла: точная длительность (служебный кадр
+    Xing/Info не считается) и разметка поврежденных участков.
+    """
+    audio_start = id3v2_size(data)
+    frames, duration, ranges = 0, 0.0, []
+    for offset, header in iter_frames(data):
+        if frames or not _is_info_frame(data, offset, header):
+            duration += frame_duration(header)
+        frames += 1
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1][1] = offset + header.size
+        else:
+            ranges.append([offset, offset + header.size])
+
+    audio_end = ranges[-1][1] if ranges else audio_start
+    tail = data[audio_end:]
+    id3v1 = len(tail) >= 128 and tail[-128:-125] == b"TAG"
+    tail_bytes = len(tail) - (128 if id3v1 else 0)
+    audio_bytes = sum(end - start for start, end in ranges)
+    junk_bytes = max(0, len(data) - audio_start - len(tail) - audio_bytes)
+    return ScanResult(frames, duration, audio_start, [tuple(r) for r in ranges], junk_bytes, tail_bytes, id3v1)
+
+
+def repair(data, result):
+    """Собирает файл заново: ID3v2, только целые кадры, ID3v1 (если был)."""
+    out = bytearray(data[:result.audio_start])
+    for start, end in result.ranges:
+        out += data[start:end]
+    if result.id3v1:
+        out += data[-128:]
+    return bytes(out)
+
+
+# Один шаг global_gain в Layer III = 1.5 дБ
+GAIN_STEP_DB = 1.5
+
+
+def _granule_gain_positions(header):
+    """
+    Битовые смещения полей global_gain от начала side info кадра Layer III.
+    MPEG-1: две гранулы на канал, MPEG-2/2.5: одна.
+    """
+    mono = header.channels == 1
+    if header.version == 1:
+        pos = 9 + (5 if mono else 3) + 4 * header.channels
+        granules, block = 2, 59
+    else:
+        pos = 8 + (1 if mono else 2)
+        granules, block = 1, 63
+
+    positions = []
+    for _ in range(granules):
+        for _ in range(header.channels):
+            # part2_3_length (12) + big_values (9), затем global_gain (8)
+            positions.append(pos + 21)
+            pos += block
+    return positions
+
+
+def apply_gain(data, steps):
+    """
+    Меняет громкость без перекодирования (как mp3gain): сдвигает global_gain
+    каждой гранулы на steps шагов по 1.5 дБ. Возвращает новый bytearray
+    или None, если файл не подходит (не Layer III или кадры с CRC).
+    """
+    out = bytearray(data)
+    for offset, header in iter_frames(data):
+        if header.layer != 3 or header.protected:
+            return None
+
+        side_info = offset + 4
+        for bitpos in _granule_gain_positions(header):
+            i = side_info + bitpos // 8
+            shift = 8 - bitpos % 8
+            window = (out[i] << 8) | out[i + 1]
+            gain = (window >> shift) & 0xFF
+            gain = min(255, max(0, gain + steps))
+            window = (window & ~(0xFF << shift)) | (gain << shift)
+            out[i], out[i + 1] = (window >> 8) & 0xFF, window & 0xFF
+    return out
+
+
+def silent_frame(bitrate, sample_rate):
+    """
+    Кадр тишины MPEG-1 Layer III (стерео, без CRC): заголовок и нули.
+    Нулевой side info означает пустые гранулы — декодер выдает тишину.
+    """
+    bitrate_index = _BITRATES[(1, 3)].index(bitrate)
+    sr_index = _SAMPLE_RATES[1].index(sample_rate)
+    header = bytes([0xFF, 0xFB, (bitrate_index << 4) | (sr_index << 2), 0x00])
+    return header + bytes(parse_header(header).size - 4)
+
+
+def read_file(filepath):
+    """Читает файл целиком (треки небольшие, несколько МБ)."""
+    with open(filepath, "rb") as f:
+        return f.read()
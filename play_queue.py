@@ -0,0 +1,130 @@
+# /opt/radio/play_queue.py
+
+import itertools
+import threading
+import collections
+from logger import log
+
+# Очередь готовых к эфиру элементов с приоритетами.
+# Уровней приоритета немного и их число фиксировано, поэтому просмотр
+# головы — O(1). Удаление по id тоже O(1): запись помечается мертвой и
+# выбрасывается, когда доходит до головы своего уровня. Производитель и
+# потребитель ждут на одном Condition и просыпаются сразу, без опроса.
+# Подписчики (add_listener) узнают о каждом изменении очереди.
+
+PRIORITY_NEXT = 0     # "Сыграть следующим" (оператор)
+PRIORITY_REQUEST = 1  # Заявки
+PRIORITY_NORMAL = 2   # Обычная ротация
+_LEVELS = 3
+
+
+class PlayQueue:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.levels = [collections.deque() for _ in range(_LEVELS)]
+        self.index = {}  # id -> запись [id, элемент, приоритет, жива]
+        self.ids = itertools.count(1)
+        self.duration = 0.0  # Сумма item["duration"] живых элементов
+        self.listeners = []  # callback(событие, элемент): "put", "take", "remove", "move"
+
+    def __len__(self):
+        with self.cond:
+            return len(self.index)
+
+    def add_listener(self, callback):
+        """
+        Подписка на изменения очереди. callback вызывается под блокировкой
+        очереди, поэтому должен быть быстрым и не обращаться к очереди.
+        """
+        with self.cond:
+            self.listeners.append(callback)
+
+    def _notify(self, event, item):
+        for callback in self.listeners:
+            try:
+                callback(event, item)
+            except Exception as e:
+                log(f"⚠️ [PlayQueue] Ошибка подписчика: {e}")
+
+    def put(self, item, priority=PRIORITY_NORMAL, front=False):
+        """Добавляет элемент; front=True — в начало своего уровня. Возвращает id."""
+        with self.cond:
+            item_id = next(self.ids)
+            item["queue_id"] = item_id
+            entry = [item_id, item, priority, True]
+            if front:
+                self.levels[priority].appendleft(entry)
+            else:
+                self.levels[priority].append(entry)
+            self.index[item_id] = entry
+            self.duration += item.get("duration", 0.0)
+            self.cond.notify_all()
+            self._notify("put", item)
+            return item_id
+
+    def _head(self):
+        """Живая запись в голове очереди (вызывать под cond)."""
+        for level in self.levels:
+            while level and not level[0][3]:
+                level.popleft()  # Удаленные записи выбрасываем лениво
+            if level:
+                return level[0]
+        return None
+
+    def _take(self, entry):
+        self.levels[entry[2]].popleft()
+        del self.index[entry[0]]
+        self.duration -= entry[1].get("duration", 0.0)
+        self.cond.notify_all()
+        self._notify("take", entry[1])
+        return entry[1]
+
+    def get(self, timeout=None):
+        """Забирает следующий элемент, ожидая его появления. None — по таймауту."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self._head() is not None, timeout):
+                return None
+            return self._take(self._head())
+
+    def peek(self):
+        """Следующий элемент без извлечения (или None)."""
+        with self.cond:
+            entry = self._head()
+            return entry[1] if entry else None
+
+    def remove(self, item_id):
+        """Убирает элемент по id. Возвращает его или None."""
+        with self.cond:
+            entry = self.index.pop(item_id, None)
+            if entry is None:
+                return None
+            entry[3] = False
+            self.duration -= entry[1].get("duration", 0.0)
+            self.cond.notify_all()
+            self._notify("remove", entry[1])
+            return entry[1]
+
+    def play_next(self, item_id):
+        """Переносит элемент в начало очереди. False, если его нет."""
+        with self.cond:
+            old = self.index.get(item_id)
+            if old is None:
+                return False
+            old[3] = False  # Старая запись выбросится лениво, как при remove()
+            entry = [item_id, old[1], PRIORITY_NEXT, True]
+            self.levels[PRIORITY_NEXT].appendleft(entry)
+            self.index[item_id] = entry
+            self.cond.notify_all()
+            self._notify("move", old[1])
+            return True
+
+    def items(self):
+        """Снимок очереди в порядке воспроизведения: [(id, приоритет, элемент)]."""
+        with self.cond:
+            return [(entry[0], entry[2], entry[1])
+                    for level in self.levels for entry in level if entry[3]]
+
+    def wait_for(self, predicate, timeout=None):
+        """Ждет (без опроса), пока predicate() не станет истинным; проверяется при каждом изменении очереди."""
+        with self.cond:
+            return self.cond.wait_for(predicate, timeout)
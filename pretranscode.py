@@ -0,0 +1,189 @@
+# /opt/radio/pretranscode.py
+
+import os
+import time
+import shutil
+import itertools
+import threading
+import subprocess
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import config
+import mp3_frames
+from logger import log
+
+# Фоновое приведение элементов эфира к формату вещания.
+# Скачанный трек или речь DJ сразу после появления один раз перекодируется
+# в формат эфира: MP3 BROADCAST_SAMPLE_RATE / BROADCAST_BITRATE, стерео, без
+# тишины в начале и в конце, без ID3 и служебного кадра Xing. Перекодирование
+# делают отдельные процессы FFmpeg (не больше PRETRANSCODE_WORKERS сразу),
+# пока элемент ждет в очереди. К моменту эфира остаются одинаковые кадры,
+# которые в режиме "passthrough" просто склеиваются. В остальных режимах
+# эфир и так перекодируется в реальном времени, и второе сжатие MP3 только
+# ухудшило бы звук и удвоило нагрузку на CPU, поэтому задачи не ставятся.
+
+WORKERS = max(0, int(getattr(config, "PRETRANSCODE_WORKERS", 2)))  # 0 — выключено
+ENABLED = WORKERS > 0 and getattr(config, "BROADCAST_MODE", "transcode") == "passthrough"
+TRIM_SILENCE_DB = float(getattr(config, "PRETRANSCODE_TRIM_DB", -50.0))
+# Паузы короче этого в начале/конце не обрезаются
+TRIM_MIN_SEC = 0.1
+TIMEOUT_SEC = 300
+
+BROADCAST_BITRATE = int(getattr(config, "BROADCAST_BITRATE", 320))
+BROADCAST_SAMPLE_RATE = int(getattr(config, "BROADCAST_SAMPLE_RATE", 44100))
+AIR_DIR = getattr(config, "AIR_DIR", os.path.join(config.BASE_DIR, "air"))
+
+# Тишина в конце срезается тем же фильтром на развернутом звуке
+_TRIM = f"silenceremove=start_periods=1:start_duration={TRIM_MIN_SEC}:start_threshold={TRIM_SILENCE_DB}dB"
+_TRIM_FILTER = f"{_TRIM},areverse,{_TRIM},areverse"
+# Низкий приоритет через nice(1): preexec_fn небезопасен в многопоточном процессе
+_NICE = ['nice', '-n', '5'] if shutil.which('nice') else []
+
+_pool = None
+_jobs = collections.defaultdict(collections.deque)  # исходный путь -> Future в порядке постановки
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_stats = {"items": 0, "failed": 0, "busy_sec": 0.0, "audio_sec": 0.0, "trimmed_sec": 0.0}
+_started_at = time.monotonic()
+_started_wall = time.time()
+
+
+def _output_path(filepath):
+    os.makedirs(AIR_DIR, exist_ok=True)
+    name = os.path.splitext(os.path.basename(filepath))[0]
+    return os.path.join(AIR_DIR, f"{name}_{int(time.time() * 1000)}_{next(_ids)}.mp3")
+
+
+def _duration(filepath):
+    try:
+        return mp3_frames.scan(mp3_frames.read_file(filepath)).duration
+    except OSError:
+        return 0.0
+
+
+def transcode(filepath):
+    """
+    Перекодирует файл в формат эфира (в вызывающем потоке).
+    Возвращает путь к новому файлу в AIR_DIR или None при ошибке.
+    """
+    air_path = _output_path(filepath)
+    command = _NICE + [
+        config.FFMPEG_PATH, '-y', '-v', 'error',
+        '-i', filepath,
+        '-map', '0:a',
+        '-map_metadata', '-1',
+        '-af', _TRIM_FILTER,
+        '-acodec', 'libmp3lame',
+        '-ab', f'{BROADCAST_BITRATE}k',
+        '-ar', str(BROADCAST_SAMPLE_RATE),
+        '-ac', '2',
+        '-write_xing', '0',
+        '-id3v2_version', '0',
+        '-f', 'mp3',
+        air_path
+    ]
+
+    started = time.monotonic()
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       timeout=TIMEOUT_SEC)
+    except Exception as e:
+        with _lock:
+            _stats["failed"] += 1
+        log(f"⚠️ [PreTranscode] Не удалось привести файл к формату эфира ({e}): {filepath}")
+        try:
+            os.remove(air_path)
+        except OSError:
+            pass
+        return None
+
+    elapsed = time.monotonic() - started
+    duration = _duration(air_path)
+    trimmed = max(0.0, _duration(filepath) - duration)
+    with _lock:
+        _stats["items"] += 1
+        _stats["busy_sec"] += elapsed
+        _stats["audio_sec"] += duration
+        _stats["trimmed_sec"] += trimmed
+    speed = f", x{duration / elapsed:.0f}" if elapsed > 0 else ""
+    log(f"🔁 [PreTranscode] {os.path.basename(filepath)}: {elapsed:.1f} сек{speed}, "
+        f"обрезано тишины {trimmed:.1f} сек, загрузка пула {get_stats()['utilization'] * 100:.0f}%")
+    return air_path
+
+
+def _remove_stale():
+    """Удаляет файлы, оставшиеся в AIR_DIR от прошлого запуска."""
+    try:
+        for entry in os.scandir(AIR_DIR):
+            if entry.is_file() and entry.stat().st_mtime < _started_wall:
+                os.remove(entry.path)
+    except OSError:
+        pass
+
+
+def submit(filepath):
+    """
+    Ставит файл на перекодирование в фоне (только в режиме "passthrough").
+    Результат забирается через take().
+    """
+    global _pool
+    if not ENABLED:
+        return
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="pretranscode")
+            _remove_stale()
+        _jobs[filepath].append(_pool.submit(transcode, filepath))
+
+
+def take(filepath, timeout=TIMEOUT_SEC):
+    """
+    Забирает результат самой ранней фоновой задачи для файла, дожидаясь ее.
+    None — файл не ставился в submit() или перекодировать не удалось.
+    """
+    with _lock:
+        queued = _jobs.get(filepath)
+        if not queued:
+            return None
+        future = queued.popleft()
+        if not queued:
+            del _jobs[filepath]
+    try:
+        return future.result(timeout)
+    except Exception as e:
+        log(f"⚠️ [PreTranscode] Результат не получен ({e}): {filepath}")
+        return None
+
+
+def discard(filepath):
+    """Элемент убран из очереди: отменяет задачу или удаляет ее результат."""
+    with _lock:
+        queued = _jobs.get(filepath)
+        if not queued:
+            return
+        future = queued.pop()
+        if not queued:
+            del _jobs[filepath]
+    if future.cancel():
+        return
+
+    def remove_result(done):
+        air_path = done.result() if not done.exception() else None
+        if air_path:
+            try:
+                os.remove(air_path)
+            except OSError:
+                pass
+    future.add_done_callback(remove_result)
+
+
+def get_stats():
+    """Счетчики перекодирования и загрузка пула (доля времени, когда процессы заняты)."""
+    with _lock:
+        stats = dict(_stats)
+        stats["workers"] = WORKERS if ENABLED else 0
+        stats["pending"] = sum(not f.done() for queued in _jobs.values() for f in queued)
+    elapsed = time.monotonic() - _started_at
+    stats["avg_sec"] = stats["busy_sec"] / stats["items"] if stats["items"] else 0.0
+    stats["utilization"] = stats["busy_sec"] / (WORKERS * elapsed) if ENABLED and elapsed > 0 else 0.0
+    return stats
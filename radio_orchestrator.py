@@ -5,15 +5,21 @@ import json
 import time
 import importlib
 import threading
+import queue
 
 import config
 import utils
 import broadcaster
+import loudness
+import track_cache
+import catalog
 from logger import log
 from modules import music_module
 
 SETTINGS_FILE = "module_settings.json"
 SCHEDULE_FILE = "schedule.json"
+# Сколько ждать следующее событие, чтобы пустить его трек под речь (режим микшера)
+BED_WAIT_SEC = 0.5
 
 def load_modules():
     modules = {}
@@ -51,6 +57,97 @@ def load_settings(modules):
     
     return settings
 
+def load_schedule(schedule):
+    """Перечитывает расписание. При ошибке возвращает предыдущее."""
+    try:
+        with open(SCHEDULE_FILE, "r", encoding="utf-8") as f:
+            schedule = json.load(f)
+        log(f"📜 Расписание обновлено: {len(schedule)} событий.")
+    except Exception as e:
+        log(f"⚠️ Ошибка чтения {SCHEDULE_FILE}: {e}.")
+    return schedule
+
+def lookahead_worker(modules, ready_queue):
+    """
+    Фоновый конвейер: вызывает prepare() для событий расписания заранее
+    и складывает готовые результаты в ready_queue (вместе с событием, которое
+    ждет места в очереди, — не больше LOOKAHEAD_DEPTH).
+    События готовятся строго по порядку, поэтому контекст (last_track_meta,
+    next_track_title) совпадает с тем, что будет в эфире к моменту их звучания.
+    """
+    schedule = []
+    schedule_index = 0
+    last_prepared_meta = None
+
+    while True:
+        # Перезагружаем расписание, когда цикл доходит до начала
+        if schedule_index == 0:
+            schedule = load_schedule(schedule)
+            if not schedule:
+                log("❌ Расписание пустое. Жду 60 сек...")
+                time.sleep(60)
+                continue
+
+        # Получаем текущее событие
+        event = schedule[schedule_index]
+        event_type = event.get("type")
+        handler = modules.get(event_type)
+
+        if not handler:
+            log(f"⚠️ Пропускаю событие: нет модуля для типа '{event_type}'.")
+        else:
+            log(f"▶️  Подготовка события: {event_type.upper()}")
+
+            # --- СОБИРАЕМ КОНТЕКСТ ---
+            # Это данные, которые передаются модулю для работы.
+            # ВАЖНО: передаем 'all_modules', чтобы DJ мог найти модуль Facts.
+            # last_track_meta — последний подготовленный трек: к моменту эфира
+            # этого события он как раз отзвучит.
+            context = {
+                'last_track_meta': last_prepared_meta,
+                'all_modules': modules
+            }
+
+            # Пытаемся узнать, какой трек будет следующим (для DJ Intro).
+            # Конвейер — единственный потребитель буфера музыки, поэтому
+            # голова очереди — это именно тот трек, который получит следующий MUSIC.
+            next_index = (schedule_index + 1) % len(schedule)
+            if schedule[next_index].get("type") == "music":
+                if 'music' in modules and hasattr(modules['music'], 'peek_next_meta'):
+                    next_meta = modules['music'].peek_next_meta()
+                    if next_meta:
+                        context['next_track_title'] = next_meta.get('title', 'следующий трек')
+
+            # --- ЗАПУСК МОДУЛЯ ---
+            try:
+                result = handler.prepare(event, context)
+
+                # Если модуль вернул аудиофайл — ставим его в очередь эфира
+                if result and result.get("audio_path") and os.path.exists(result["audio_path"]):
+
+                    # Запоминаем, что будет играть (если это музыка)
+                    if event_type == "music":
+                        last_prepared_meta = result.get("meta")
+
+                    # Приводим файл к формату эфира заранее (формат в passthrough-режиме,
+                    # громкость — по индексу громкости, если трек уже проанализирован)
+                    gain_db = loudness.get_gain_db(result.get("meta", {}).get("loudness_key"))
+                    result["air_path"] = broadcaster.prepare_for_air(result["audio_path"], gain_db)
+
+                    # Блокируемся, если очередь полна: вместе с этим событием
+                    # готово LOOKAHEAD_DEPTH событий (минимум два)
+                    ready_queue.put((event_type, result))
+
+                elif handler and not getattr(handler, 'is_system', False):
+                    # Если модуль не вернул файл и это не системный модуль (как facts)
+                    log(f"ℹ️ Модуль {event_type.upper()} завершил работу без аудио.")
+
+            except Exception as e:
+                log(f"❌ Критическая ошибка в модуле {event_type}: {e}")
+
+        # Переход к следующему событию
+        schedule_index = (schedule_index + 1) % len(schedule)
+
 def main():
     log("🚀 --- MAFIOZNIK RADIO ORCHESTRATOR v3.1 (Modular) --- 🚀")
     
@@ -95,86 +192,68 @@ def main():
     else:
         log("⚠️ Файл modules/web_server_module.py не найден.")
         
-    # 4. --- ОСНОВНОЙ ЦИКЛ ВЕЩАНИЯ ---
+    # 4. --- КОНВЕЙЕР ПОДГОТОВКИ (LOOKAHEAD) ---
+    # Готовим следующие события, пока текущее звучит в эфире
+    depth = max(1, int(getattr(config, "LOOKAHEAD_DEPTH", 1)))
+    # Еще одно готовое событие воркер держит у себя, пока ждет места в очереди,
+    # поэтому очередь на одно короче глубины (но не меньше 1)
+    ready_queue = queue.Queue(maxsize=max(1, depth - 1))
+    lookahead_thread = threading.Thread(
+        target=lookahead_worker,
+        args=(modules, ready_queue),
+        daemon=True
+    )
+    lookahead_thread.start()
+    log(f"🔭 Конвейер подготовки запущен (глубина: {ready_queue.maxsize + 1}).")
+
+    # 5. --- ОСНОВНОЙ ЦИКЛ ВЕЩАНИЯ ---
     broadcaster.start_stream()
-    schedule = []
-    schedule_index = 0
-    last_played_meta = None
 
+    upcoming = None
     while True:
-        # Перезагружаем расписание, когда цикл доходит до начала
-        if schedule_index == 0:
-            try:
-                with open(SCHEDULE_FILE, "r", encoding="utf-8") as f: 
-                    schedule = json.load(f)
-                log(f"📜 Расписание обновлено: {len(schedule)} событий.")
-            except Exception as e:
-                log(f"⚠️ Ошибка чтения {SCHEDULE_FILE}: {e}.")
-                if not schedule:
-                    log("❌ Расписание пустое. Жду 60 сек...")
-                    time.sleep(60)
-                    continue
-        
-        # Получаем текущее событие
-        event = schedule[schedule_index]
-        event_type = event.get("type")
-        handler = modules.get(event_type)
-        
-        if not handler:
-            log(f"⚠️ Пропускаю событие: нет модуля для типа '{event_type}'.")
-        else:
-            log(f"▶️  Обработка события: {event_type.upper()}")
-            
-            # --- СОБИРАЕМ КОНТЕКСТ ---
-            # Это данные, которые передаются модулю для работы.
-            # ВАЖНО: передаем 'all_modules', чтобы DJ мог найти модуль Facts.
-            context = {
-                'last_track_meta': last_played_meta,
-                'all_modules': modules 
-            }
-            
-            # Пытаемся узнать, какой трек будет следующим (для DJ Intro)
-            next_index = (schedule_index + 1) % len(schedule)
-            if schedule[next_index].get("type") == "music":
-                if 'music' in modules and hasattr(modules['music'], 'peek_next_meta'):
-                    next_meta = modules['music'].peek_next_meta()
-                    if next_meta: 
-                        context['next_track_title'] = next_meta.get('title', 'следующий трек')
+        # Берем следующее готовое событие (блокируемся, если конвейер не успел)
+        event_type, result = upcoming or ready_queue.get()
+        upcoming = None
 
-            # --- ЗАПУСК МОДУЛЯ ---
+        # Речь в режиме микшера звучит поверх начала следующего трека — берем его заранее
+        bed = None
+        if broadcaster.talks_over(event_type):
             try:
-                result = handler.prepare(event, context)
-                
-                # Если модуль вернул аудиофайл — играем его
-                if result and result.get("audio_path") and os.path.exists(result["audio_path"]):
-                    
-                    # Обновляем метаданные на сайте (now_playing.json)
-                    utils.update_now_playing(result["meta"])
-                    log(f"🎙️ В ЭФИРЕ: {result['meta']['title']}")
-                    
-                    # Отправляем аудио в FFmpeg
-                    broadcaster.feed_to_stream(result["audio_path"])
-                    
-                    # Запоминаем, что играло (если это музыка)
-                    if event_type == "music": 
-                        last_played_meta = result.get("meta")
-                    
-                    # Удаляем временный файл, если модуль попросил (cleanup=True)
-                    if result.get("cleanup"):
-                        try: 
-                            os.remove(result["audio_path"])
-                        except OSError as e: 
-                            log(f"⚠️ Ошибка удаления файла: {e}")
-                
-                elif handler and not getattr(handler, 'is_system', False):
-                    # Если модуль не вернул файл и это не системный модуль (как facts)
-                    log(f"ℹ️ Модуль {event_type.upper()} завершил работу без аудио.")
-                    
-            except Exception as e:
-                log(f"❌ Критическая ошибка в модуле {event_type}: {e}")
+                upcoming = ready_queue.get(timeout=BED_WAIT_SEC)
+            except queue.Empty:
+                pass
+            if upcoming and upcoming[0] == "music":
+                bed = upcoming[1].get("air_path") or upcoming[1]["audio_path"]
 
-        # Переход к следующему событию
-        schedule_index = (schedule_index + 1) % len(schedule)
+        try:
+            # Обновляем метаданные на сайте (now_playing.json)
+            utils.update_now_playing(result["meta"])
+            log(f"🎙️ В ЭФИРЕ: {result['meta']['title']}")
+
+            # Отправляем аудио в FFmpeg
+            broadcaster.feed_to_stream(result.get("air_path") or result["audio_path"], event_type, bed)
+        except Exception as e:
+            log(f"❌ Ошибка воспроизведения события {event_type}: {e}")
+        finally:
+            # Удаляем копию, перекодированную под формат эфира
+            air_path = result.get("air_path")
+            if air_path and air_path != result["audio_path"]:
+                try:
+                    os.remove(air_path)
+                except OSError as e:
+                    log(f"⚠️ Ошибка удаления файла: {e}")
+
+            # Трек отыграл: обновляем историю эфира в кэше треков
+            if event_type == "music":
+                track_cache.release(result["audio_path"])
+                catalog.record_play(result["audio_path"])
+
+            # Удаляем временный файл, если модуль попросил (cleanup=True)
+            if result.get("cleanup"):
+                try:
+                    os.remove(result["audio_path"])
+                except OSError as e:
+                    log(f"⚠️ Ошибка удаления файла: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,176 @@
+# /opt/radio/rotation.py
+
+import time
+import random
+import collections
+import config
+
+# Ротация музыки без повторов.
+# Кандидаты разложены по корзинам веса: чем чаще и недавнее трек звучал,
+# тем ниже его корзина и меньше шанс выбора. Выбор — случайная корзина
+# пропорционально ее суммарному весу (корзин фиксированное число), затем
+# случайный трек в ней: O(1) независимо от размера библиотеки. Добавление
+# и удаление тоже O(1) (удаление — обменом с последним элементом корзины).
+# Треки и исполнители, звучавшие в последних N выборах, пропускаются.
+
+TRACK_SEPARATION = int(getattr(config, "ROTATION_TRACK_SEPARATION", 50))
+ARTIST_SEPARATION = int(getattr(config, "ROTATION_ARTIST_SEPARATION", 3))
+
+# Корзина i имеет вес 2^-i на трек
+WEIGHT_CLASSES = 8
+_WEIGHTS = [2.0 ** -i for i in range(WEIGHT_CLASSES)]
+# Сколько раз перевыбираем, если трек нарушает разнесение
+MAX_ATTEMPTS = 16
+
+DAY = 86400
+
+
+def weight_class(play_count=0, last_played=None, now=None):
+    """
+    Корзина трека: +1 за каждое удвоение числа проигрываний,
+    +2, если звучал за последние сутки, +1 — за последнюю неделю.
+    """
+    cls = (play_count or 0).bit_length()
+    if last_played:
+        age = (now or time.time()) - last_played
+        if age < DAY:
+            cls += 2
+        elif age < 7 * DAY:
+            cls += 1
+    return min(cls, WEIGHT_CLASSES - 1)
+
+
+class _Window:
+    """Последние N значений с проверкой вхождения за O(1)."""
+
+    def __init__(self, size):
+        self.items = collections.deque()
+        self.counts = collections.Counter()
+        self.size = size
+
+    def push(self, value):
+        if self.size <= 0:
+            return
+        self.items.append(value)
+        self.counts[value] += 1
+        if len(self.items) > self.size:
+            old = self.items.popleft()
+            self.counts[old] -= 1
+            if not self.counts[old]:
+                del self.counts[old]
+
+    def __contains__(self, value):
+        return value in self.counts
+
+
+class Rotation:
+    """Пул треков-кандидатов с взвешенным выбором без повторов (не потокобезопасен)."""
+
+    def __init__(self, track_separation=TRACK_SEPARATION, artist_separation=ARTIST_SEPARATION):
+        self.buckets = [[] for _ in range(WEIGHT_CLASSES)]
+        self.where = {}  # id трека -> (корзина, индекс в корзине)
+        self.recent_tracks = _Window(track_separation)
+        self.recent_artists = _Window(artist_separation)
+
+    def __len__(self):
+        return len(self.where)
+
+    def add(self, track, now=None):
+        """Добавляет трек (dict с 'id'; учитываются 'play_count', 'last_played', 'artist')."""
+        key = track['id']
+        if key in self.where:
+            return False
+        cls = weight_class(track.get('play_count'), track.get('last_played'), now)
+        bucket = self.buckets[cls]
+        self.where[key] = (cls, len(bucket))
+        bucket.append(track)
+        return True
+
+    def remove(self, key):
+        """Убирает трек из пула. None, если его там нет."""
+        if key not in self.where:
+            return None
+        return self._remove_at(*self.where[key])
+
+    def _remove_at(self, cls, index):
+        bucket = self.buckets[cls]
+        track = bucket[index]
+        last = bucket.pop()
+        if index < len(bucket):
+            bucket[index] = last
+            self.where[last['id']] = (cls, index)
+        del self.where[track['id']]
+        return track
+
+    def _sample(self):
+        """Случайная позиция (корзина, индекс) с учетом весов корзин."""
+        r = random.random() * sum(len(b) * w for b, w in zip(self.buckets, _WEIGHTS))
+        fallback = None
+        for cls, bucket in enumerate(self.buckets):
+            if not bucket:
+                continue
+            fallback = cls
+            r -= len(bucket) * _WEIGHTS[cls]
+            if r < 0:
+                break
+        return fallback, random.randrange(len(self.buckets[fallback]))
+
+    def _penalty(self, track):
+        penalty = 2 if track['id'] in self.recent_tracks else 0
+        artist = track.get('artist')
+        if artist and artist in self.recent_artists:
+            penalty += 1
+        return penalty
+
+    def pick(self):
+        """
+        Выбирает и убирает из пула следующий трек. Если за MAX_ATTEMPTS
+        не нашлось трека без нарушения разнесения, берется наименее плохой.
+        """
+        if not self.where:
+            return None
+
+        best, best_penalty = None, None
+        for _ in range(MAX_ATTEMPTS):
+            position = self._sample()
+            penalty = self._penalty(self.buckets[position[0]][position[1]])
+            if best is None or penalty < best_penalty:
+                best, best_penalty = position, penalty
+                if not penalty:
+                    break
+
+        track = self._remove_at(*best)
+        self.recent_tracks.push(track['id'])
+        if track.get('artist'):
+            self.recent_artists.push(track['artist'])
+        return track
+
+
+def _benchmark(size=100_000, picks=100_000):
+    now = time.time()
+    tracks = [{'id': f"t{i}", 'artist': f"a{i % 5000}",
+               'play_count': random.randrange(50),
+               'last_played': now - random.randrange(30 * DAY)} for i in range(size)]
+
+    rotation = Rotation()
+    started = time.perf_counter()
+    for track in tracks:
+        rotation.add(track, now)
+    add_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(picks):
+        track = rotation.pick()
+        rotation.add(track, now)  # Возвращаем, чтобы размер пула не менялся
+    pick_time = time.perf_counter() - started
+
+    print(f"Пул: {size} треков")
+    print(f"add:  {add_time / size * 1e6:.2f} мкс/трек")
+    print(f"pick: {pick_time / picks * 1e6:.2f} мкс/выбор (вместе с возвратом в пул)")
+    print(f"По корзинам: {[len(b) for b in rotation.buckets]}")
+
+
+if __name__ == "__main__":
+    # Бенчмарк: python rotation.py
+    for size in (1_000, 10_000, 100_000):
+        _benchmark(size, 100_000)
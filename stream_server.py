@@ -0,0 +1,223 @@
+# /opt/radio/stream_server.py
+
+import asyncio
+import socket
+import threading
+import config
+import mp3_frames
+from logger import log
+
+# Встроенная раздача потока слушателям (альтернатива Icecast).
+# Закодированный MP3 от вещателя пишется в один общий кольцевой буфер,
+# а каждый слушатель лишь хранит свою позицию в нем: данные не копируются
+# на каждого клиента, сокеты получают memoryview прямо из буфера.
+
+HOST = getattr(config, "STREAM_SERVER_HOST", "127.0.0.1")
+PORT = int(getattr(config, "STREAM_SERVER_PORT", 8001))
+STREAM_PATH = getattr(config, "STREAM_SERVER_PATH", "/stream")
+BITRATE = int(getattr(config, "BROADCAST_BITRATE", 320))
+
+BYTES_PER_SEC = BITRATE * 1000 // 8
+# Сколько секунд потока хранит буфер и сколько отдаем сразу при подключении
+BUFFER_SEC = float(getattr(config, "STREAM_SERVER_BUFFER_SEC", 30))
+BURST_SEC = float(getattr(config, "STREAM_SERVER_BURST_SEC", 3))
+
+SEND_CHUNK = 64 * 1024
+# Запас до "хвоста" буфера: клиент, отставший сильнее, отключается
+EVICT_MARGIN = 2 * SEND_CHUNK
+# Сколько ждем, пока медленный клиент освободит сокет
+SLOW_CLIENT_TIMEOUT = 10
+HEADER_TIMEOUT = 10
+MAX_HEADER_SIZE = 8192
+
+
+class RingBuffer:
+    """Кольцевой буфер с абсолютными позициями (сколько байт записано за все время)."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buf = bytearray(capacity)
+        self.view = memoryview(self.buf)
+        self.write_pos = 0
+
+    def oldest(self):
+        """Самая старая позиция, данные с которой еще лежат в буфере."""
+        return max(0, self.write_pos - self.capacity)
+
+    def write(self, data):
+        data = memoryview(data)
+        if len(data) > self.capacity:
+            # Больше буфера — имеет смысл хранить только хвост
+            self.write_pos += len(data) - self.capacity
+            data = data[-self.capacity:]
+
+        start = self.write_pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.view[start:start + first] = data[:first]
+        if first < len(data):
+            self.view[:len(data) - first] = data[first:]
+        self.write_pos += len(data)
+
+    def read_view(self, pos, limit):
+        """memoryview на данные с позиции pos (без копирования, не дальше конца кольца)."""
+        start = pos % self.capacity
+        size = min(self.write_pos - pos, limit, self.capacity - start)
+        return self.view[start:start + size]
+
+
+class StreamServer:
+    """HTTP-раздача одного потока тысячам слушателей в одном asyncio-цикле."""
+
+    def __init__(self):
+        self.ring = RingBuffer(max(int(BYTES_PER_SEC * BUFFER_SEC), 4 * EVICT_MARGIN))
+        self.loop = None
+        self.new_data = None
+        self.listeners = 0
+        self.tasks = set()
+        self.stats = {"connected": 0, "evicted": 0, "bytes_sent": 0}
+
+    # --- Вызывается из потока вещателя ---
+
+    def feed(self, chunk):
+        """Потокобезопасно добавляет закодированные данные в общий буфер."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._append, chunk)
+
+    # --- Все, что ниже, работает внутри asyncio-цикла ---
+
+    def _append(self, chunk):
+        self.ring.write(chunk)
+        # Будим всех ожидающих слушателей разом
+        if not self.new_data.done():
+            self.new_data.set_result(None)
+        self.new_data = self.loop.create_future()
+
+    def _burst_start(self):
+        """Позиция для нового слушателя: BURST_SEC назад, выровненная по MP3-кадру."""
+        floor = self.ring.oldest() + (EVICT_MARGIN if self.ring.write_pos > self.ring.capacity else 0)
+        pos = max(floor, self.ring.write_pos - int(BYTES_PER_SEC * BURST_SEC))
+        if pos >= self.ring.write_pos:
+            return self.ring.write_pos
+        window = bytes(self.ring.read_view(pos, 4096))
+        frame = mp3_frames.find_frame(window)
+        return pos + frame if frame >= 0 else pos
+
+    async def _wait_writable(self, sock):
+        waiter = self.loop.create_future()
+        self.loop.add_writer(sock.fileno(), lambda: waiter.done() or waiter.set_result(None))
+        try:
+            await asyncio.wait_for(waiter, SLOW_CLIENT_TIMEOUT)
+        finally:
+            self.loop.remove_writer(sock.fileno())
+
+    async def _read_request(self, sock):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = await asyncio.wait_for(self.loop.sock_recv(sock, 1024), HEADER_TIMEOUT)
+            if not chunk or len(data) > MAX_HEADER_SIZE:
+                return None
+            data += chunk
+        parts = data.split(b"\r\n", 1)[0].split()
+        return parts[1].decode("latin-1") if len(parts) >= 2 else None
+
+    async def _serve_client(self, sock, address):
+        try:
+            path = await self._read_request(sock)
+            if path is None:
+                return
+            if path.split("?", 1)[0] != STREAM_PATH:
+                await self.loop.sock_sendall(sock, b"HTTP/1.0 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+                return
+
+            await self.loop.sock_sendall(sock, (
+                "HTTP/1.0 200 OK\r\n"
+                "Content-Type: audio/mpeg\r\n"
+                "Cache-Control: no-cache, no-store\r\n"
+                "Connection: close\r\n"
+                "icy-name: Mafioznik Radio\r\n"
+                f"icy-br: {BITRATE}\r\n\r\n"
+            ).encode("latin-1"))
+        except (OSError, asyncio.TimeoutError):
+            return
+
+        self.listeners += 1
+        self.stats["connected"] += 1
+        pos = self._burst_start()
+        try:
+            while True:
+                if pos >= self.ring.write_pos:
+                    await self.new_data
+                    continue
+
+                # Отстал настолько, что буфер вот-вот перезапишет его данные
+                if self.ring.write_pos - pos > self.ring.capacity - EVICT_MARGIN:
+                    self.stats["evicted"] += 1
+                    log(f"🐢 [StreamServer] Медленный слушатель {address[0]} отключен (отстал от эфира).")
+                    return
+
+                view = self.ring.read_view(pos, SEND_CHUNK)
+                try:
+                    sent = sock.send(view)
+                except BlockingIOError:
+                    sent = 0
+                pos += sent
+                self.stats["bytes_sent"] += sent
+
+                if sent < len(view):
+                    await self._wait_writable(sock)
+
+        except asyncio.TimeoutError:
+            self.stats["evicted"] += 1
+            log(f"🐢 [StreamServer] Слушатель {address[0]} не принимает данные, отключен.")
+        except OSError:
+            pass  # Слушатель ушел
+        finally:
+            self.listeners -= 1
+
+    async def _client_task(self, sock, address):
+        try:
+            await self._serve_client(sock, address)
+        finally:
+            sock.close()
+
+    async def _accept_loop(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((HOST, PORT))
+        server.listen(1024)
+        server.setblocking(False)
+        log(f"📡 [StreamServer] Раздача потока: http://{HOST}:{PORT}{STREAM_PATH}")
+
+        while True:
+            sock, address = await self.loop.sock_accept(server)
+            sock.setblocking(False)
+            # Держим ссылку на задачу, иначе сборщик мусора может ее прервать
+            task = self.loop.create_task(self._client_task(sock, address))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    def run(self):
+        """Запускает собственный asyncio-цикл (вызывается в отдельном потоке)."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.new_data = self.loop.create_future()
+        try:
+            self.loop.run_until_complete(self._accept_loop())
+        except Exception as e:
+            log(f"❌ [StreamServer] Ошибка сервера: {e}")
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["listeners"] = self.listeners
+        return stats
+
+
+_server = None
+
+def start():
+    """Запускает сервер раздачи в фоновом потоке (один раз за время работы)."""
+    global _server
+    if _server is None:
+        _server = StreamServer()
+        threading.Thread(target=_server.run, daemon=True).start()
+    return _server
@@ -0,0 +1,53 @@
+# /opt/radio/tests/conftest.py
+
+import os
+import sys
+import tempfile
+import importlib.util
+import pytest
+
+# Модули радио читают config при импорте. В тестах вместо config.py берется
+# config.example.py, а все пути указывают во временную папку.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+if "config" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location("config", os.path.join(ROOT, "config.example.py"))
+    config = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(config)
+    _base = tempfile.mkdtemp(prefix="radio-tests-")
+    config.BASE_DIR = _base
+    config.WEB_DIR = _base
+    config.MUSIC_DIR = os.path.join(_base, "music")
+    config.LOG_FILE = os.path.join(_base, "logs.txt")
+    config.CATALOG_FILE = os.path.join(_base, "catalog.db")
+    config.TRACK_CACHE_INDEX_FILE = os.path.join(_base, "track_cache.json")
+    config.TTS_CACHE_DIR = os.path.join(_base, "tts_cache")
+    config.ARTWORK_DIR = os.path.join(_base, "artwork")
+    config.AIR_DIR = os.path.join(_base, "air")
+    os.makedirs(config.MUSIC_DIR)
+    sys.modules["config"] = config
+
+import config  # noqa: E402
+
+
+@pytest.fixture
+def music_dir(tmp_path, monkeypatch):
+    """Пустая MUSIC_DIR для одного теста."""
+    path = tmp_path / "music"
+    path.mkdir()
+    monkeypatch.setattr(config, "MUSIC_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def catalog_db(tmp_path, monkeypatch):
+    """Каталог в отдельном файле SQLite; соединение закрывается после теста."""
+    import catalog
+    monkeypatch.setattr(catalog, "CATALOG_FILE", str(tmp_path / "catalog.db"))
+    monkeypatch.setattr(catalog, "_conn", None)
+    yield catalog
+    if catalog._conn is not None:
+        catalog._conn.close()
@@ -0,0 +1,88 @@
+# /opt/radio/tests/test_artwork.py
+
+import os
+import pytest
+import artwork
+
+VARIANT = 1000  # Размер одного файла варианта
+GROUP = 4 * VARIANT  # Все варианты одной обложки
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Пустой кэш обложек на 2.5 обложки."""
+    monkeypatch.setattr(artwork, "ARTWORK_DIR", str(tmp_path / "artwork"))
+    monkeypatch.setattr(artwork, "MAX_SIZE_MB", 2.5 * GROUP / 1048576)
+    os.makedirs(artwork.ARTWORK_DIR)
+    return artwork
+
+
+def _cover(url, used):
+    """Кладет в кэш все варианты обложки url с временем использования used."""
+    key = artwork._key(url)
+    for name in artwork._names(key):
+        path = os.path.join(artwork.ARTWORK_DIR, name)
+        with open(path, "wb") as f:
+            f.write(bytes(VARIANT))
+        os.utime(path, (used, used))
+    return key
+
+
+def _present(key):
+    return artwork._cached(key)
+
+
+def test_evict_removes_least_recently_used_covers(cache):
+    old = _cover("https://cdn/old.jpg", 100)
+    middle = _cover("https://cdn/middle.jpg", 200)
+    new = _cover("https://cdn/new.jpg", 300)
+    cache._evict(keep=new)
+    assert not _present(old)
+    assert _present(middle) and _present(new)
+    assert not any(name.startswith(old) for name in os.listdir(cache.ARTWORK_DIR))
+
+
+def test_evict_keeps_just_saved_cover(cache, monkeypatch):
+    monkeypatch.setattr(artwork, "MAX_SIZE_MB", 0.5 * GROUP / 1048576)
+    other = _cover("https://cdn/other.jpg", 300)
+    fresh = _cover("https://cdn/fresh.jpg", 100)
+    cache._evict(keep=fresh)
+    assert _present(fresh) and not _present(other)
+
+
+def test_evict_uses_newest_variant_of_a_cover(cache):
+    first = _cover("https://cdn/first.jpg", 100)
+    second = _cover("https://cdn/second.jpg", 200)
+    # Обложку first недавно показали: variants() трогает только один ее файл
+    os.utime(os.path.join(cache.ARTWORK_DIR, artwork._name(first, artwork.COVER_SIZE, "jpg")), (300, 300))
+    third = _cover("https://cdn/third.jpg", 250)
+    cache._evict(keep=third)
+    assert _present(first) and not _present(second)
+
+
+def test_evict_ignores_unfinished_files(cache):
+    key = _cover("https://cdn/only.jpg", 100)
+    tmp_path = os.path.join(cache.ARTWORK_DIR, artwork._name("partial", artwork.COVER_SIZE, "jpg") + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(10 * GROUP))
+    cache._evict(keep=None)
+    assert _present(key) and os.path.exists(tmp_path)
+
+
+@pytest.mark.skipif(artwork.Image is None, reason="нужен Pillow")
+def test_variants_only_for_complete_covers(cache):
+    url = "https://cdn/cover.jpg"
+    assert cache.variants(url) is None
+    assert cache.variants("") is None
+    key = _cover(url, 100)
+    urls = cache.variants(url)
+    assert urls == {
+        "image": f"artwork/{key}_512.jpg",
+        "image_webp": f"artwork/{key}_512.webp",
+        "thumb": f"artwork/{key}_96.webp",
+    }
+    # Показ отмечает обложку как недавно использованную
+    assert os.stat(os.path.join(cache.ARTWORK_DIR, f"{key}_512.jpg")).st_mtime > 100
+
+    os.remove(os.path.join(cache.ARTWORK_DIR, f"{key}_96.jpg"))
+    assert cache.variants(url) is None
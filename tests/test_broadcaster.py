@@ -0,0 +1,41 @@
+# /opt/radio/tests/test_broadcaster.py
+
+import os
+import pytest
+import mp3_frames
+import broadcaster
+
+FRAME = mp3_frames.silent_frame(128, 44100)
+
+
+@pytest.fixture
+def filler(tmp_path, monkeypatch):
+    """Файл заполнителя в tmp_path; prepare_for_air() отдает его копию в AIR_DIR."""
+    path = tmp_path / "filler.mp3"
+    path.write_bytes(FRAME * 100)
+    monkeypatch.setattr(broadcaster, "BROADCAST_MODE", "passthrough")
+    monkeypatch.setattr(broadcaster, "FILLER_FILE", str(path))
+    air_dir = tmp_path / "air"
+    air_dir.mkdir()
+    return path, air_dir
+
+
+def test_filler_air_copy_is_removed(filler, monkeypatch):
+    path, air_dir = filler
+
+    def prepare_for_air(filepath, gain_db=None):
+        air_path = air_dir / "filler_1.mp3"
+        air_path.write_bytes(path.read_bytes())
+        return str(air_path)
+
+    monkeypatch.setattr(broadcaster, "prepare_for_air", prepare_for_air)
+    chunks = broadcaster._load_filler()
+    assert b"".join(chunk for chunk, _ in chunks) == FRAME * 100
+    assert os.listdir(air_dir) == []
+
+
+def test_filler_file_itself_is_kept(filler, monkeypatch):
+    path, _ = filler
+    monkeypatch.setattr(broadcaster, "prepare_for_air", lambda filepath, gain_db=None: filepath)
+    assert broadcaster._load_filler()
+    assert path.exists()
@@ -0,0 +1,149 @@
+# /opt/radio/tests/test_catalog.py
+
+import os
+import itertools
+import pytest
+import mp3_frames
+
+FRAME = mp3_frames.silent_frame(128, 44100)
+
+
+def _id3(title=None, artist=None):
+    """Минимальный тег ID3v2.3 с названием и исполнителем."""
+    frames = b""
+    for frame_id, value in (("TIT2", title), ("TPE1", artist)):
+        if value:
+            data = b"\x03" + value.encode("utf-8")
+            frames += frame_id.encode() + len(data).to_bytes(4, "big") + b"\0\0" + data
+    size = bytes((len(frames) >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return b"ID3\x03\x00\x00" + size + frames
+
+
+def _mp3(directory, name, frames=10, **tags):
+    path = os.path.join(str(directory), name)
+    with open(path, "wb") as f:
+        f.write(_id3(**tags) + FRAME * frames)
+    return path
+
+
+@pytest.fixture
+def clock(catalog_db, monkeypatch):
+    """Время в каталоге: каждое обращение на секунду позже предыдущего."""
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(catalog_db.time, "time", lambda: float(next(ticks)))
+
+
+def test_sync_local_imports_new_files_once(catalog_db, music_dir):
+    song = _mp3(music_dir, "song.mp3", title="Title", artist="Artist")
+    _mp3(music_dir, "dj_intro.mp3")
+    (music_dir / "notes.txt").write_text("not music")
+
+    new, gone = catalog_db.sync_local()
+    assert (new, gone) == ([song], [])
+    meta = catalog_db.find_by_path(song)
+    assert (meta["title"], meta["artist"], meta["id"], meta["is_local"]) == ("Title", "Artist", "song.mp3", True)
+    assert abs(catalog_db.track_duration(song) - 10 * 1152 / 44100) < 1e-6
+
+    # Папка не менялась — она даже не читается
+    assert catalog_db.sync_local() == ([], [])
+
+
+def test_sync_local_forgets_removed_files(catalog_db, music_dir):
+    keep = _mp3(music_dir, "keep.mp3")
+    drop = _mp3(music_dir, "drop.mp3")
+    catalog_db.sync_local()
+    os.remove(drop)
+
+    new, gone = catalog_db.sync_local()
+    assert (new, gone) == ([], [drop])
+    assert catalog_db.find_by_path(drop) is None
+    assert [t["url"] for t in catalog_db.local_tracks(10)] == [keep]
+
+
+def test_title_falls_back_to_file_name(catalog_db, music_dir):
+    path = _mp3(music_dir, "No Tags Here.mp3")
+    catalog_db.sync_local()
+    assert catalog_db.find_by_path(path)["title"] == "No Tags Here"
+
+
+def test_add_local_returns_only_new_music(catalog_db, music_dir):
+    song = _mp3(music_dir, "song.mp3", title="Song")
+    assert catalog_db.add_local(song)["url"] == song
+    assert catalog_db.add_local(song) is None
+    assert catalog_db.add_local(_mp3(music_dir, "news_today.mp3")) is None
+
+
+def test_add_local_picks_up_retagged_file(catalog_db, music_dir):
+    path = _mp3(music_dir, "song.mp3", title="Old")
+    catalog_db.add_local(path)
+    _mp3(music_dir, "song.mp3", frames=11, title="New")
+    catalog_db.add_local(path)
+    assert catalog_db.find_by_path(path)["title"] == "New"
+
+
+def test_local_tracks_pages_least_recently_played(catalog_db, music_dir, clock):
+    paths = [_mp3(music_dir, f"{n}.mp3") for n in range(5)]
+    catalog_db.sync_local()
+    for path in (paths[3], paths[1], paths[0]):
+        catalog_db.record_play(path)
+
+    # Сначала ни разу не звучавшие, затем звучавшие раньше всех
+    order = [t["url"] for t in catalog_db.local_tracks(10)]
+    assert sorted(order[:2]) == [paths[2], paths[4]]
+    assert order[2:] == [paths[3], paths[1], paths[0]]
+    assert [t["url"] for t in catalog_db.local_tracks(3)] == order[:3]
+
+    played = catalog_db.find_by_path(paths[0])
+    assert played["play_count"] == 1
+    assert played["last_played"] > catalog_db.find_by_path(paths[3])["last_played"]
+
+
+def test_local_tracks_filters_by_source(catalog_db, music_dir):
+    local = _mp3(music_dir, "local.mp3")
+    catalog_db.sync_local()
+    suno = _mp3(music_dir, "song_00000001-0000-0000-0000-000000000000.mp3")
+    catalog_db.add_track({"id": "00000001-0000-0000-0000-000000000000", "title": "Suno"}, suno)
+
+    assert {t["url"] for t in catalog_db.local_tracks(10)} == {local, suno}
+    assert [t["url"] for t in catalog_db.local_tracks(10, "local")] == [local]
+    only_suno = catalog_db.local_tracks(10, "suno")
+    assert [t["url"] for t in only_suno] == [suno]
+    assert only_suno[0]["is_local"] is False
+
+
+def test_forget_path_keeps_history(catalog_db, music_dir):
+    path = _mp3(music_dir, "song_00000001-0000-0000-0000-000000000000.mp3")
+    catalog_db.add_track({"id": "abc", "title": "Suno"}, path, 1.0)
+    catalog_db.record_play(path)
+    catalog_db.forget_path(path)
+    assert catalog_db.find_by_path(path) is None
+    assert catalog_db.local_tracks(10) == []
+    assert catalog_db.play_stats(["abc"])["abc"][0] == 1
+
+
+def test_play_stats_merges_copies_of_one_suno_track(catalog_db, music_dir, clock):
+    first = _mp3(music_dir, "a_1.mp3")
+    second = _mp3(music_dir, "b_1.mp3")
+    for path in (first, second):
+        catalog_db.add_track({"id": "same", "title": "Song"}, path, 1.0)
+    catalog_db.record_play(first)
+    catalog_db.record_play(second)
+    catalog_db.record_play(second)
+
+    stats = catalog_db.play_stats(["same", "unknown"])
+    assert stats == {"same": (3, catalog_db.find_by_path(second)["last_played"])}
+
+
+def test_play_stats_ignores_local_files_and_handles_many_ids(catalog_db, music_dir):
+    local = _mp3(music_dir, "local.mp3")
+    catalog_db.sync_local()
+    catalog_db.record_play(local)
+    assert catalog_db.play_stats(["local.mp3"]) == {}
+    # Больше 500 id — запрос идет порциями
+    assert catalog_db.play_stats(str(n) for n in range(1200)) == {}
+
+
+def test_state_round_trip(catalog_db):
+    assert catalog_db.get_state("cursor", "{}") == "{}"
+    catalog_db.set_state("cursor", '{"page": 2}')
+    assert catalog_db.get_state("cursor") == '{"page": 2}'
@@ -0,0 +1,155 @@
+# /opt/radio/tests/test_dj_prerender.py
+
+import os
+import queue
+import pytest
+import play_queue
+import pretranscode
+import tts_cache
+from modules import dj_module
+from modules.dj_module import DjModule
+
+ENGINE, VOICE = "edge-tts", "ru-RU-DmitryNeural"
+
+
+class _Stop(Exception):
+    pass
+
+
+class _Jobs(queue.Queue):
+    """Очередь заданий, на которой воркер останавливается, как только она пуста."""
+
+    def get(self, block=True, timeout=None):
+        if self.empty():
+            raise _Stop
+        return super().get()
+
+
+@pytest.fixture
+def dj(tmp_path, monkeypatch):
+    """DjModule на своей очереди музыки, без фонового потока и настоящего TTS."""
+    music_queue = play_queue.PlayQueue()
+    monkeypatch.setattr(dj_module, "music_queue", music_queue)
+    monkeypatch.setattr(DjModule, "_prerender_started", True)
+    monkeypatch.setattr(tts_cache, "CACHE_DIR", str(tmp_path / "tts"))
+    monkeypatch.setattr(tts_cache, "ENABLED", True)
+    monkeypatch.setattr(pretranscode, "submit", lambda filepath: None)
+
+    dj = DjModule()
+    dj.config = {"engine": ENGINE, "voice": VOICE, "fact_chance": 0}
+    dj.render_jobs = _Jobs()
+    dj.synthesized = []
+    music_queue.add_listener(dj._on_queue_change)
+
+    def synthesize(clean_text, engine, voice, output_filename):
+        dj.synthesized.append(clean_text)
+        with open(output_filename, "wb") as f:
+            f.write(b"speech")
+        return output_filename
+
+    monkeypatch.setattr(dj, "_synthesize", synthesize)
+    dj.music_queue = music_queue
+    return dj
+
+
+def _queue(dj, title):
+    return dj.music_queue.put({"song_path": f"/music/{title}.mp3", "meta": {"title": title}, "duration": 180.0})
+
+
+def _render(dj):
+    """Выполняет все накопившиеся задания заготовки."""
+    with pytest.raises(_Stop):
+        dj._prerender_worker()
+
+
+def test_queued_track_gets_intro_and_outro(dj):
+    queue_id = _queue(dj, "Song")
+    _render(dj)
+    render = dj.renders[queue_id]
+    assert (render["title"], render["engine"], render["voice"]) == ("Song", ENGINE, VOICE)
+    assert len(dj.synthesized) == 2
+
+    intro = dj._find_render("intro", "Song", ENGINE, VOICE)
+    assert intro == render["intro"] and tts_cache.owns(intro[1])
+
+    # prepare() берет заготовку и не синтезирует заново
+    result = dj.prepare({"mode": "intro"}, {"next_track_title": "Song"})
+    assert result["audio_path"] == intro[1] and result["cleanup"] is False
+    assert len(dj.synthesized) == 2
+
+
+def test_removed_track_is_not_rendered(dj):
+    queue_id = _queue(dj, "Gone")
+    dj.music_queue.remove(queue_id)
+    _render(dj)
+    assert dj.synthesized == []
+    assert queue_id not in dj.renders
+
+
+def test_remove_drops_finished_render(dj):
+    first = _queue(dj, "First")
+    _queue(dj, "Second")
+    _render(dj)
+    dj.music_queue.remove(first)
+    assert first not in dj.renders
+    # Голова очереди теперь Second — заготовка First не подходит
+    assert dj._find_render("intro", "First", ENGINE, VOICE) is None
+    assert dj._find_render("intro", "Second", ENGINE, VOICE) is not None
+
+
+def test_take_moves_render_to_outro(dj):
+    queue_id = _queue(dj, "Song")
+    _render(dj)
+    render = dj.renders[queue_id]
+    dj.music_queue.get(0)
+
+    assert queue_id not in dj.renders
+    assert dj.played_renders[queue_id] is render
+    assert dj._find_render("intro", "Song", ENGINE, VOICE) is None
+    assert dj._find_render("outro", "Song", ENGINE, VOICE) == render["outro"]
+
+
+def test_take_before_render_still_gets_outro(dj):
+    queue_id = _queue(dj, "Song")
+    dj.music_queue.get(0)
+    _render(dj)
+    assert dj.synthesized == []  # Трек уже не в очереди — заготовка не делается
+    assert dj.played_renders[queue_id] is None
+
+
+def test_played_renders_are_bounded(dj):
+    for n in range(dj_module.PLAYED_RENDERS + 2):
+        _queue(dj, f"Song {n}")
+    for _ in range(dj_module.PLAYED_RENDERS + 2):
+        dj.music_queue.get(0)
+    assert len(dj.played_renders) == dj_module.PLAYED_RENDERS
+
+
+@pytest.mark.parametrize("title, engine, voice", [
+    ("Other", ENGINE, VOICE),
+    ("Song", "google", VOICE),
+    ("Song", ENGINE, "ru-RU-SvetlanaNeural"),
+])
+def test_render_rejected_when_settings_changed(dj, title, engine, voice):
+    _queue(dj, "Song")
+    _render(dj)
+    assert dj._find_render("intro", title, engine, voice) is None
+
+
+def test_render_rejected_when_file_left_cache(dj):
+    queue_id = _queue(dj, "Song")
+    _render(dj)
+    os.remove(dj.renders[queue_id]["intro"][1])
+    assert dj._find_render("intro", "Song", ENGINE, VOICE) is None
+
+    # Без заготовки prepare() синтезирует подводку сама
+    result = dj.prepare({"mode": "intro"}, {"next_track_title": "Song"})
+    assert os.path.exists(result["audio_path"])
+
+
+def test_prerender_can_be_turned_off(dj):
+    dj.config["prerender"] = "no"
+    queue_id = _queue(dj, "Song")
+    _render(dj)
+    assert dj.synthesized == []
+    assert dj.renders[queue_id] is None
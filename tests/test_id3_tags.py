@@ -0,0 +1,109 @@
+# /opt/radio/tests/test_id3_tags.py
+
+import id3_tags
+
+PNG = b"\x89PNG\r\n\x1a\nfront"
+JPEG = b"\xff\xd8\xff\xe0back"
+
+
+def _syncsafe(n):
+    return bytes((n >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def _frame(version, frame_id, data, flags=0):
+    if version == 2:
+        return frame_id.encode() + len(data).to_bytes(3, "big") + data
+    size = _syncsafe(len(data)) if version == 4 else len(data).to_bytes(4, "big")
+    return frame_id.encode() + size + flags.to_bytes(2, "big") + data
+
+
+def _tag(version, *frames, flags=0):
+    body = b"".join(frames)
+    return b"ID3" + bytes((version, 0, flags)) + _syncsafe(len(body)) + body
+
+
+def _v1(title=b"", artist=b"", album=b""):
+    fields = b"".join(value.ljust(30, b"\0") for value in (title, artist, album))
+    return (b"TAG" + fields).ljust(128, b"\0")
+
+
+def test_v23_text_and_front_cover():
+    data = _tag(3,
+                _frame(3, "TIT2", b"\x00Title"),
+                _frame(3, "TPE1", b"\x01" + "Исполнитель".encode("utf-16")),
+                _frame(3, "APIC", b"\x00image/jpeg\x00\x04back\x00" + JPEG),
+                _frame(3, "APIC", b"\x00image/png\x00\x03\x00" + PNG))
+    tags = id3_tags.parse(data)
+    assert tags["title"] == "Title"
+    assert tags["artist"] == "Исполнитель"
+    assert (tags["picture_mime"], tags["picture"]) == ("image/png", PNG)
+
+
+def test_v24_syncsafe_sizes_and_multiple_values():
+    long_title = "Очень длинное название " * 8  # Больше 127 байт — размер кадра в syncsafe
+    data = _tag(4,
+                _frame(4, "TIT2", b"\x03" + long_title.encode("utf-8")),
+                _frame(4, "TPE1", b"\x03First\x00Second"),
+                _frame(4, "TALB", b"\x02" + "Альбом".encode("utf-16-be")))
+    tags = id3_tags.parse(data)
+    assert tags["title"] == long_title.strip()
+    assert tags["artist"] == "First, Second"
+    assert tags["album"] == "Альбом"
+
+
+def test_v22_frames_and_pic():
+    data = _tag(2,
+                _frame(2, "TT2", b"\x00Old"),
+                _frame(2, "TP1", b"\x00Band"),
+                _frame(2, "PIC", b"\x00JPG\x03cover\x00" + JPEG))
+    tags = id3_tags.parse(data)
+    assert (tags["title"], tags["artist"]) == ("Old", "Band")
+    assert (tags["picture_mime"], tags["picture"]) == ("image/jpeg", JPEG)
+
+
+def test_first_picture_when_no_front_cover():
+    data = _tag(3, _frame(3, "APIC", b"\x00image/jpeg\x00\x04\x00" + JPEG),
+                _frame(3, "APIC", b"\x00image/png\x00\x05\x00" + PNG))
+    assert id3_tags.parse(data)["picture"] == JPEG
+
+
+def test_linked_picture_is_ignored():
+    data = _tag(3, _frame(3, "APIC", b"\x00-->\x00\x03\x00http://example/cover.jpg"))
+    assert "picture" not in id3_tags.parse(data)
+
+
+def test_unsynchronised_v23_tag():
+    data = _tag(3, _frame(3, "APIC", b"\x00image/jpeg\x00\x03\x00\xff\x00\xd8"), flags=0x80)
+    assert id3_tags.parse(data)["picture"] == b"\xff\xd8"
+
+
+def test_compressed_frame_is_skipped():
+    data = _tag(3, _frame(3, "TIT2", b"\x00zipped", flags=0x0080), _frame(3, "TPE1", b"\x00Band"))
+    assert id3_tags.parse(data) == {"artist": "Band"}
+
+
+def test_v1_cp1251_fallback():
+    tail = _v1("Привет".encode("cp1251"), b"Artist", "Альбом".encode("utf-8"))
+    tags = id3_tags.parse(b"\x00" * 200 + tail)
+    assert tags == {"title": "Привет", "artist": "Artist", "album": "Альбом"}
+
+
+def test_v2_overrides_v1():
+    data = _tag(3, _frame(3, "TIT2", b"\x00From v2")) + b"\x00" * 200 + _v1(b"From v1", b"V1 artist")
+    assert id3_tags.parse(data) == {"title": "From v2", "artist": "V1 artist"}
+
+
+def test_padding_and_garbage():
+    assert id3_tags.parse(_tag(3, _frame(3, "TIT2", b"\x00Title"), b"\0" * 64)) == {"title": "Title"}
+    assert id3_tags.parse(b"ID3\x05\x00\x00\x00\x00\x00\x10" + bytes(16)) == {}
+    assert id3_tags.parse(b"") == {}
+
+
+def test_read_uses_head_and_tail(tmp_path):
+    path = tmp_path / "song.mp3"
+    path.write_bytes(_tag(3, _frame(3, "TIT2", b"\x00Head")) + b"\xff" * 5000 + _v1(b"", b"Tail"))
+    assert id3_tags.read(str(path)) == {"title": "Head", "artist": "Tail"}
+
+    short = tmp_path / "short.mp3"
+    short.write_bytes(b"abc")
+    assert id3_tags.read(str(short)) == {}
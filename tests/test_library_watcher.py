@@ -0,0 +1,96 @@
+# /opt/radio/tests/test_library_watcher.py
+
+import os
+import pytest
+import mp3_frames
+import library_watcher
+from library_watcher import IN_CLOSE_WRITE, IN_MOVED_TO, IN_MOVED_FROM, IN_DELETE, IN_DELETE_SELF, IN_Q_OVERFLOW
+from modules.music_module import MusicModule
+
+FRAME = mp3_frames.silent_frame(128, 44100)
+
+
+def _event(mask, name=b""):
+    """Одно событие inotify в двоичном виде (имя дополнено нулями, как в ядре)."""
+    padded = name + b"\0" * (-len(name) % 4 or 4) if name else b""
+    return library_watcher._EVENT.pack(1, mask, 0, len(padded)) + padded
+
+
+def _mp3(music_dir, name):
+    path = music_dir / name
+    path.write_bytes(FRAME * 5)
+    return str(path)
+
+
+@pytest.fixture
+def changes(catalog_db, music_dir, monkeypatch):
+    """Уведомления подписчиков: [(added, removed)]."""
+    monkeypatch.setattr(library_watcher, "_listeners", [])
+    seen = []
+    library_watcher.add_listener(lambda added, removed: seen.append((added, removed)))
+    return seen
+
+
+def test_new_file_is_indexed_and_announced(changes, music_dir, catalog_db):
+    path = _mp3(music_dir, "new song.mp3")
+    assert library_watcher._handle_events(_event(IN_CLOSE_WRITE, b"new song.mp3"))
+    [(added, removed)] = changes
+    assert [track["url"] for track in added] == [path] and removed == []
+    assert catalog_db.find_by_path(path)["is_local"]
+
+
+def test_moved_in_and_deleted_files(changes, music_dir, catalog_db):
+    old = _mp3(music_dir, "old.mp3")
+    catalog_db.add_local(old)
+    moved = _mp3(music_dir, "moved.mp3")
+    os.remove(old)
+    buf = _event(IN_MOVED_TO, b"moved.mp3") + _event(IN_DELETE, b"old.mp3")
+    assert library_watcher._handle_events(buf)
+    [(added, removed)] = changes
+    assert [track["url"] for track in added] == [moved]
+    assert removed == [old]
+    assert catalog_db.find_by_path(old) is None
+
+
+def test_downloads_and_temp_files_are_ignored(changes, music_dir):
+    _mp3(music_dir, "song_00000001-0000-0000-0000-000000000000.mp3")
+    _mp3(music_dir, "upload.mp3.part")
+    buf = (_event(IN_CLOSE_WRITE, b"song_00000001-0000-0000-0000-000000000000.mp3")
+           + _event(IN_CLOSE_WRITE, b"upload.mp3.part")
+           + _event(IN_MOVED_FROM, b"notes.txt"))
+    assert library_watcher._handle_events(buf)
+    assert changes == []
+
+
+def test_vanished_file_is_skipped(changes):
+    assert library_watcher._handle_events(_event(IN_CLOSE_WRITE, b"gone.mp3"))
+    assert changes == []
+
+
+def test_overflow_falls_back_to_full_sync(changes, music_dir):
+    path = _mp3(music_dir, "missed.mp3")
+    assert library_watcher._handle_events(_event(IN_Q_OVERFLOW))
+    assert [[track["url"] for track in added] for added, _ in changes] == [[path]]
+
+
+def test_lost_watch_is_reported(changes):
+    assert not library_watcher._handle_events(_event(IN_DELETE_SELF))
+
+
+@pytest.fixture
+def music(monkeypatch):
+    monkeypatch.setattr(MusicModule, "_downloader_started", True)
+    return MusicModule()
+
+
+def test_library_uploads_join_rotation(music):
+    music._on_library_change([{"id": "a.mp3", "title": "A", "url": "/music/a.mp3"}], [])
+    assert len(music.rotation) == 1
+    music._on_library_change([], ["/music/a.mp3"])
+    assert len(music.rotation) == 0
+
+
+def test_library_uploads_respect_use_local_backup(music):
+    music.config["use_local_backup"] = "no"
+    music._on_library_change([{"id": "a.mp3", "title": "A", "url": "/music/a.mp3"}], [])
+    assert len(music.rotation) == 0
@@ -0,0 +1,108 @@
+# /opt/radio/tests/test_mp3_frames.py
+
+import mp3_frames
+
+# MPEG-1 Layer III, 128 кбит/с, 44100 Гц, стерео, без CRC; нулевой side info — тишина
+FRAME = b"\xff\xfb\x90\x00" + bytes(413)
+ID3V2 = b"ID3\x03\x00\x00\x00\x00\x00\x0a" + bytes(10)
+ID3V1 = b"TAG" + bytes(125)
+
+
+def test_parse_header():
+    header = mp3_frames.parse_header(FRAME)
+    assert (header.version, header.layer, header.bitrate, header.sample_rate) == (1, 3, 128, 44100)
+    assert header.channels == 2 and not header.protected
+    assert header.size == len(FRAME) == 417
+    assert mp3_frames.frame_duration(header) == 1152 / 44100
+
+
+def test_parse_header_rejects_garbage():
+    assert mp3_frames.parse_header(b"\x00\x00\x00\x00") is None
+    assert mp3_frames.parse_header(b"\xff\xfb") is None
+    # Индекс битрейта 15 запрещен
+    assert mp3_frames.parse_header(b"\xff\xfb\xf0\x00") is None
+
+
+def test_id3v2_size_counts_header():
+    assert mp3_frames.id3v2_size(ID3V2) == 20
+    assert mp3_frames.id3v2_size(FRAME) == 0
+
+
+def test_find_frame_skips_unconfirmed_sync():
+    # 0xFF с похожим заголовком, за которым нет следующего кадра, — мусор
+    data = b"\xff\xfb\x90\x00junk" + FRAME + FRAME
+    assert mp3_frames.find_frame(data) == 8
+
+
+def _gains(data):
+    """Значения global_gain всех гранул всех кадров."""
+    gains = []
+    for offset, header in mp3_frames.iter_frames(data):
+        for bitpos in mp3_frames._granule_gain_positions(header):
+            i = offset + 4 + bitpos // 8
+            gains.append((((data[i] << 8) | data[i + 1]) >> (8 - bitpos % 8)) & 0xFF)
+    return gains
+
+
+def test_apply_gain_shifts_every_granule():
+    data = FRAME * 3
+    assert set(_gains(data)) == {0}
+    louder = mp3_frames.apply_gain(data, 4)
+    assert len(_gains(louder)) == 3 * 4  # 2 гранулы x 2 канала в каждом кадре
+    assert set(_gains(louder)) == {4}
+    assert bytes(mp3_frames.apply_gain(louder, -4)) == data
+
+
+def test_apply_gain_clamps_and_keeps_headers():
+    quieter = mp3_frames.apply_gain(FRAME, -10)
+    assert set(_gains(quieter)) == {0}
+    assert len(list(mp3_frames.iter_frames(bytes(quieter)))) == 1
+
+
+def test_apply_gain_refuses_crc_frames():
+    protected = bytearray(FRAME)
+    protected[1] = 0xFA  # Бит защиты сброшен — у кадра есть CRC
+    assert mp3_frames.apply_gain(bytes(protected) * 2, 1) is None
+
+
+def test_silent_frame():
+    assert mp3_frames.silent_frame(128, 44100) == FRAME
+    header = mp3_frames.parse_header(mp3_frames.silent_frame(320, 48000))
+    assert (header.bitrate, header.sample_rate, header.size) == (320, 48000, 960)
+
+
+def test_scan_clean_file():
+    data = ID3V2 + FRAME * 10 + ID3V1
+    result = mp3_frames.scan(data)
+    assert result.frames == 10
+    assert abs(result.duration - 10 * 1152 / 44100) < 1e-9
+    assert result.audio_start == len(ID3V2)
+    assert result.ranges == [(20, 20 + 10 * len(FRAME))]
+    assert (result.junk_bytes, result.tail_bytes, result.id3v1) == (0, 0, True)
+
+
+def test_scan_marks_junk_and_truncated_tail():
+    data = FRAME * 3 + b"\x00garbage\x00" + FRAME * 2 + FRAME[:100]
+    result = mp3_frames.scan(data)
+    # Кадр прямо перед мусором не подтвержден следующим заголовком и тоже считается мусором
+    assert result.frames == 4
+    assert result.ranges == [(0, 2 * len(FRAME)), (3 * len(FRAME) + 9, 5 * len(FRAME) + 9)]
+    assert result.junk_bytes == len(FRAME) + 9
+    assert result.tail_bytes == 100
+    assert not result.id3v1
+
+
+def test_scan_skips_info_frame_duration():
+    info = bytearray(FRAME)
+    info[36:40] = b"Info"
+    result = mp3_frames.scan(bytes(info) + FRAME * 4)
+    assert result.frames == 5
+    assert abs(result.duration - 4 * 1152 / 44100) < 1e-9
+
+
+def test_repair_keeps_only_whole_frames_and_tags():
+    data = ID3V2 + FRAME * 3 + b"\x01\x02\x03" + FRAME * 2 + FRAME[:50] + ID3V1
+    repaired = mp3_frames.repair(data, mp3_frames.scan(data))
+    assert repaired == ID3V2 + FRAME * 4 + ID3V1
+    result = mp3_frames.scan(repaired)
+    assert (result.frames, result.junk_bytes, result.tail_bytes) == (4, 0, 0)
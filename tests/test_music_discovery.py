@@ -0,0 +1,105 @@
+# /opt/radio/tests/test_music_discovery.py
+
+import time
+import pytest
+from modules import music_module
+from modules.music_module import MusicModule
+
+
+class _Stop(Exception):
+    pass
+
+
+def _stop(delay):
+    raise _Stop
+
+
+@pytest.fixture
+def module(catalog_db, monkeypatch):
+    """MusicModule без фоновых потоков и с одной и той же страницей Suno."""
+    monkeypatch.setattr(MusicModule, "_downloader_started", True)
+    module = MusicModule()
+    module.page = [{"id": f"id{n}", "title": f"Song {n}", "url": f"https://cdn.example/{n}.mp3"}
+                   for n in range(3)]
+    module.pages = []
+    monkeypatch.setattr(module, "_fetch_suno_tracks",
+                        lambda section, page: module.pages.append(page) or list(map(dict, module.page)))
+    return module
+
+
+def _ids(tracks):
+    return [track["id"] for track in tracks]
+
+
+def test_known_ids_are_not_offered_twice(module):
+    assert _ids(module._discover_round()) == ["id0", "id1", "id2"]
+    assert module._discover_round() == []
+    assert module.pages == [1, 2]  # Курсор листает раздел дальше
+
+
+def test_recently_played_tracks_are_skipped(module, catalog_db, music_dir):
+    old = music_dir / "old.mp3"
+    new = music_dir / "new.mp3"
+    for path, track_id in ((old, "id0"), (new, "id1")):
+        path.write_bytes(b"")
+        catalog_db.add_track({"id": track_id, "title": track_id}, str(path), 1.0)
+    catalog_db.record_play(str(new))
+    with catalog_db._lock:
+        catalog_db._db().execute("UPDATE tracks SET play_count = 4, last_played = ? WHERE path = ?",
+                                 (time.time() - 2 * 86400, str(old)))
+
+    fresh = module._discover_round()
+    assert _ids(fresh) == ["id0", "id2"]
+    assert (fresh[0]["play_count"], fresh[1]["play_count"]) == (4, 0)
+
+
+def test_recent_ids_expire(module):
+    module._discover_round()
+    for key in module.recent_ids:
+        module.recent_ids[key] -= music_module.DISCOVERY_MEMORY_SEC + 1
+    assert _ids(module._discover_round()) == ["id0", "id1", "id2"]
+
+
+def test_empty_rounds_back_off_and_fall_back(module, monkeypatch):
+    delays, fallbacks = [], []
+    local = [{"id": "local.mp3", "title": "Local", "url": "/music/local.mp3", "is_local": True}]
+
+    def sleep(delay):
+        delays.append(delay)
+        if len(delays) == 5:
+            raise _Stop
+
+    def fallback(api_down):
+        fallbacks.append(api_down)
+        return list(map(dict, local))
+
+    monkeypatch.setattr(module, "_discover_round", lambda: [])
+    monkeypatch.setattr(module, "_fallback_tracks", fallback)
+    monkeypatch.setattr(music_module.time, "sleep", sleep)
+    with pytest.raises(_Stop):
+        module._discovery_thread()
+
+    # После DISCOVERY_MAX_EMPTY_ROUNDS пустых раундов плейлист пополняется из каталога,
+    # а повторный запас уже ничего не добавляет — пауза достигает предела
+    assert delays == [2, 4, 8, 16, music_module.DISCOVERY_BACKOFF_MAX_SEC]
+    assert fallbacks == [False, False]
+    assert len(module.rotation) == 1
+
+
+def test_api_down_falls_back_at_once(module, monkeypatch):
+    fallbacks = []
+    monkeypatch.setattr(module, "_discover_round", lambda: None)
+    monkeypatch.setattr(module, "_fallback_tracks", lambda api_down: fallbacks.append(api_down) or [])
+    monkeypatch.setattr(music_module.time, "sleep", _stop)
+    with pytest.raises(_Stop):
+        module._discovery_thread()
+    assert fallbacks == [True]
+
+
+def test_fallback_honours_use_local_backup(module, monkeypatch):
+    sources = []
+    monkeypatch.setattr(module, "_get_local_tracks", lambda source=None: sources.append(source) or [])
+    module._fallback_tracks(api_down=True)
+    module.config["use_local_backup"] = "no"
+    module._fallback_tracks(api_down=False)
+    assert sources == [None, "suno"]
@@ -0,0 +1,120 @@
+# /opt/radio/tests/test_play_queue.py
+
+import threading
+import play_queue
+from play_queue import PlayQueue, PRIORITY_NEXT, PRIORITY_REQUEST, PRIORITY_NORMAL
+
+
+def _item(name, duration=10.0):
+    return {"name": name, "duration": duration}
+
+
+def _names(queue):
+    return [item["name"] for _, _, item in queue.items()]
+
+
+def test_priorities_and_fifo_order():
+    queue = PlayQueue()
+    queue.put(_item("normal1"))
+    queue.put(_item("request"), PRIORITY_REQUEST)
+    queue.put(_item("normal2"))
+    queue.put(_item("next"), PRIORITY_NEXT)
+    queue.put(_item("front"), PRIORITY_NORMAL, front=True)
+
+    order = ["next", "request", "front", "normal1", "normal2"]
+    assert _names(queue) == order
+    assert [queue.get(0)["name"] for _ in range(5)] == order
+    assert len(queue) == 0 and queue.duration == 0.0
+
+
+def test_peek_and_timeout():
+    queue = PlayQueue()
+    assert queue.peek() is None
+    queue.put(_item("a"), PRIORITY_REQUEST)
+    assert queue.peek()["name"] == "a" and len(queue) == 1
+    assert queue.get(0)["name"] == "a"
+    assert queue.get(timeout=0.01) is None
+
+
+def test_put_assigns_ids_and_counts_duration():
+    queue = PlayQueue()
+    first = queue.put(_item("a", 30.0))
+    second = queue.put(_item("b", 12.5))
+    assert first != second
+    assert queue.peek()["queue_id"] == first
+    assert len(queue) == 2 and queue.duration == 42.5
+
+
+def test_remove_skips_entry_lazily():
+    queue = PlayQueue()
+    ids = [queue.put(_item(name)) for name in "abc"]
+    assert queue.remove(ids[0])["name"] == "a"
+    assert queue.remove(ids[0]) is None
+    assert queue.remove(999) is None
+    assert _names(queue) == ["b", "c"]
+    assert len(queue) == 2 and queue.duration == 20.0
+    assert queue.get(0)["name"] == "b"
+
+
+def test_play_next_moves_item_once():
+    queue = PlayQueue()
+    ids = [queue.put(_item(name)) for name in "abc"]
+    assert queue.play_next(ids[2])
+    assert not queue.play_next(999)
+    assert _names(queue) == ["c", "a", "b"]
+    assert [queue.get(0)["name"] for _ in range(3)] == ["c", "a", "b"]
+    assert queue.get(timeout=0.01) is None
+    assert queue.duration == 0.0
+
+
+def test_get_wakes_up_on_put():
+    queue = PlayQueue()
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get(timeout=5)))
+    consumer.start()
+    queue.put(_item("late"))
+    consumer.join(5)
+    assert not consumer.is_alive()
+    assert result[0]["name"] == "late"
+
+
+def test_wait_for_rechecks_on_change():
+    queue = PlayQueue()
+    done = []
+    waiter = threading.Thread(target=lambda: done.append(queue.wait_for(lambda: queue.duration >= 20, 5)))
+    waiter.start()
+    queue.put(_item("a"))
+    queue.put(_item("b"))
+    waiter.join(5)
+    assert done == [True]
+    assert queue.wait_for(lambda: queue.duration > 100, 0.01) is False
+
+
+def test_listeners_see_every_change():
+    queue = PlayQueue()
+    events = []
+    queue.add_listener(lambda event, item: events.append((event, item["name"])))
+    a = queue.put(_item("a"))
+    queue.put(_item("b"))
+    queue.play_next(queue.put(_item("c")))
+    queue.remove(a)
+    queue.get(0)
+    assert events == [("put", "a"), ("put", "b"), ("put", "c"), ("move", "c"),
+                      ("remove", "a"), ("take", "c")]
+
+
+def test_failing_listener_does_not_break_queue(monkeypatch):
+    logged = []
+    monkeypatch.setattr(play_queue, "log", logged.append)
+    queue = PlayQueue()
+    seen = []
+
+    def broken(event, item):
+        raise RuntimeError("boom")
+
+    queue.add_listener(broken)
+    queue.add_listener(lambda event, item: seen.append(event))
+    queue.put(_item("a"))
+    assert queue.get(0)["name"] == "a"
+    assert seen == ["put", "take"]
+    assert len(logged) == 2 and "boom" in logged[0]
@@ -0,0 +1,99 @@
+# /opt/radio/tests/test_pretranscode.py
+
+import os
+import threading
+import collections
+import pytest
+import pretranscode
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    """
+    Пул из одного процесса, где transcode() заменен заглушкой: результат —
+    файл в tmp_path, а задача для пути из gates ждет, пока ее не отпустят.
+    """
+    monkeypatch.setattr(pretranscode, "ENABLED", True)
+    monkeypatch.setattr(pretranscode, "WORKERS", 1)
+    monkeypatch.setattr(pretranscode, "_pool", None)
+    monkeypatch.setattr(pretranscode, "_jobs", collections.defaultdict(collections.deque))
+    gates = {}
+    done = []
+    started = threading.Event()
+
+    def transcode(filepath):
+        started.set()
+        if filepath in gates:
+            gates[filepath].wait(5)
+        air_path = str(tmp_path / f"{os.path.basename(filepath)}.{len(done)}.air")
+        with open(air_path, "wb") as f:
+            f.write(b"air")
+        done.append(air_path)
+        return air_path
+
+    monkeypatch.setattr(pretranscode, "transcode", transcode)
+    yield gates, done, started
+    if pretranscode._pool is not None:
+        for gate in gates.values():
+            gate.set()
+        pretranscode._pool.shutdown(wait=True)
+
+
+def test_take_returns_results_in_submit_order(jobs):
+    _, done, _ = jobs
+    pretranscode.submit("/music/a.mp3")
+    pretranscode.submit("/music/a.mp3")
+    first = pretranscode.take("/music/a.mp3")
+    second = pretranscode.take("/music/a.mp3")
+    assert [first, second] == done
+    assert pretranscode.take("/music/a.mp3") is None
+    assert pretranscode.get_stats()["pending"] == 0
+
+
+def test_take_without_submit(jobs):
+    assert pretranscode.take("/music/never.mp3") is None
+
+
+def test_discard_cancels_waiting_job(jobs):
+    gates, done, _ = jobs
+    gates["/music/busy.mp3"] = threading.Event()
+    pretranscode.submit("/music/busy.mp3")  # Занимает единственный процесс
+    pretranscode.submit("/music/queued.mp3")
+    pretranscode.discard("/music/queued.mp3")
+    gates["/music/busy.mp3"].set()
+
+    assert pretranscode.take("/music/busy.mp3") == done[0]
+    assert pretranscode.take("/music/queued.mp3") is None
+    pretranscode._pool.shutdown(wait=True)
+    assert len(done) == 1
+
+
+def test_discard_removes_result_of_running_job(jobs):
+    gates, done, started = jobs
+    gate = gates["/music/a.mp3"] = threading.Event()
+    pretranscode.submit("/music/a.mp3")
+    started.wait(5)
+    # Задачу уже не отменить — ее результат удаляется, когда она закончится
+    pretranscode.discard("/music/a.mp3")
+    gate.set()
+    pretranscode._pool.shutdown(wait=True)
+    assert len(done) == 1 and not os.path.exists(done[0])
+    assert pretranscode.take("/music/a.mp3") is None
+
+
+def test_discard_drops_latest_submission(jobs):
+    _, done, _ = jobs
+    pretranscode.submit("/music/a.mp3")
+    pretranscode.submit("/music/b.mp3")
+    pretranscode.submit("/music/a.mp3")
+    pretranscode.discard("/music/a.mp3")
+    first = pretranscode.take("/music/a.mp3")
+    assert first == done[0]
+    assert pretranscode.take("/music/a.mp3") is None
+
+
+def test_submit_is_off_outside_passthrough(jobs, monkeypatch):
+    monkeypatch.setattr(pretranscode, "ENABLED", False)
+    pretranscode.submit("/music/a.mp3")
+    assert pretranscode.take("/music/a.mp3") is None
+    assert pretranscode._pool is None
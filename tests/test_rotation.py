@@ -0,0 +1,100 @@
+# /opt/radio/tests/test_rotation.py
+
+import random
+import pytest
+import rotation
+from rotation import Rotation, weight_class, DAY
+
+NOW = 1_000_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(1234)
+
+
+def _track(n, artist=None, **extra):
+    return dict({"id": f"t{n}", "artist": artist or f"a{n}"}, **extra)
+
+
+def test_weight_class():
+    assert weight_class() == 0
+    assert weight_class(play_count=1) == 1
+    assert weight_class(play_count=8) == 4
+    assert weight_class(last_played=NOW - 3600, now=NOW) == 2
+    assert weight_class(last_played=NOW - 3 * DAY, now=NOW) == 1
+    assert weight_class(last_played=NOW - 30 * DAY, now=NOW) == 0
+    assert weight_class(play_count=10 ** 6, last_played=NOW, now=NOW) == rotation.WEIGHT_CLASSES - 1
+
+
+def test_add_and_remove_keep_index_consistent():
+    pool = Rotation()
+    for n in range(10):
+        assert pool.add(_track(n), NOW)
+    assert not pool.add(_track(3), NOW)
+    assert len(pool) == 10
+
+    assert pool.remove("t0")["id"] == "t0"
+    assert pool.remove("t0") is None
+    for key, (cls, index) in pool.where.items():
+        assert pool.buckets[cls][index]["id"] == key
+    assert len(pool) == 9
+
+
+def test_pick_returns_every_track_once():
+    pool = Rotation()
+    for n in range(50):
+        pool.add(_track(n, play_count=n), NOW)
+    picked = [pool.pick()["id"] for _ in range(50)]
+    assert sorted(picked) == sorted(f"t{n}" for n in range(50))
+    assert pool.pick() is None
+
+
+def test_rarely_played_tracks_win_more_often():
+    counts = {"fresh": 0, "stale": 0}
+    for _ in range(2000):
+        pool = Rotation(track_separation=0, artist_separation=0)
+        pool.add({"id": "fresh"}, NOW)
+        pool.add({"id": "stale", "play_count": 100, "last_played": NOW - 60}, NOW)
+        counts[pool.pick()["id"]] += 1
+    assert counts["fresh"] > 0.95 * 2000
+
+
+def test_recent_track_is_not_repeated():
+    pool = Rotation(track_separation=1, artist_separation=0)
+    pool.add(_track(1), NOW)
+    pool.add(_track(2), NOW)
+    first = pool.pick()
+    pool.add(first, NOW)
+    for _ in range(20):
+        track = pool.pick()
+        assert track["id"] != first["id"]
+        pool.add(track, NOW)
+        first = track
+
+
+def test_recent_artist_is_spread_out():
+    pool = Rotation(track_separation=0, artist_separation=1)
+    pool.add(_track(1, artist="same"), NOW)
+    pool.add(_track(2, artist="same"), NOW)
+    pool.add(_track(3, artist="other"), NOW)
+    first = pool.pick()
+    second = pool.pick()
+    assert {first["artist"], second["artist"]} == {"same", "other"}
+
+
+def test_least_bad_track_when_all_break_separation():
+    pool = Rotation(track_separation=5, artist_separation=5)
+    pool.add(_track(1), NOW)
+    track = pool.pick()
+    pool.add(track, NOW)
+    assert pool.pick()["id"] == track["id"]
+
+
+def test_window_forgets_old_values():
+    window = rotation._Window(2)
+    for value in ("a", "b", "a", "c"):
+        window.push(value)
+    assert "a" in window and "c" in window and "b" not in window
+    window.push("d")
+    assert "a" not in window
@@ -0,0 +1,142 @@
+# /opt/radio/tests/test_track_cache.py
+
+import os
+import pytest
+import track_cache
+
+SIZE = 1000
+
+
+@pytest.fixture
+def cache(music_dir, catalog_db, tmp_path, monkeypatch):
+    """Пустой кэш на 2.5 трека по SIZE байт без ограничения по возрасту."""
+    monkeypatch.setattr(track_cache, "INDEX_FILE", str(tmp_path / "track_cache.json"))
+    monkeypatch.setattr(track_cache, "MAX_SIZE_MB", 2.5 * SIZE / 1048576)
+    monkeypatch.setattr(track_cache, "MAX_AGE_DAYS", 0)
+    monkeypatch.setattr(track_cache, "_entries", {})
+    monkeypatch.setattr(track_cache, "_in_use", {})
+    monkeypatch.setattr(track_cache, "_loaded", False)
+    monkeypatch.setattr(track_cache, "_stats", dict.fromkeys(track_cache._stats, 0))
+    return track_cache
+
+
+def _download(music_dir, n):
+    """Файл с именем, как у скачанного трека Suno."""
+    path = music_dir / f"song_{n:08x}-0000-0000-0000-000000000000.mp3"
+    path.write_bytes(bytes(SIZE))
+    return str(path)
+
+
+def _age(cache, path, last_used):
+    cache._entries[os.path.basename(path)]["last_used"] = last_used
+
+
+def test_add_evicts_least_recently_played(cache, music_dir):
+    first, second = _download(music_dir, 1), _download(music_dir, 2)
+    cache.add(first)
+    cache.add(second)
+    _age(cache, first, 200)
+    _age(cache, second, 100)
+
+    third = _download(music_dir, 3)
+    cache.add(third)
+    assert not os.path.exists(second)
+    assert os.path.exists(first) and os.path.exists(third)
+    stats = cache.get_stats()
+    assert (stats["tracks"], stats["evictions"], stats["evicted_bytes"]) == (2, 1, SIZE)
+
+
+def test_add_with_hold_protects_new_track(cache, music_dir, monkeypatch):
+    monkeypatch.setattr(track_cache, "MAX_SIZE_MB", 0.5 * SIZE / 1048576)
+    unheld = _download(music_dir, 1)
+    cache.add(unheld)
+    # Без hold трек, не влезающий в лимит, удаляется сразу же
+    assert not os.path.exists(unheld)
+
+    held = _download(music_dir, 2)
+    cache.add(held, hold=True)
+    assert os.path.exists(held)
+
+    cache.release(held)
+    assert not os.path.exists(held)
+
+
+def test_lookup_with_hold_protects_until_release(cache, music_dir):
+    old, new = _download(music_dir, 1), _download(music_dir, 2)
+    cache.add(old)
+    cache.add(new)
+    _age(cache, old, 100)
+    _age(cache, new, 200)
+
+    assert cache.lookup(old, hold=True)
+    cache.add(_download(music_dir, 3))
+    assert os.path.exists(old) and not os.path.exists(new)
+
+    cache.release(old)
+    assert os.path.exists(old)  # release() обновил историю эфира — трек снова свежий
+    assert cache.get_stats()["hits"] == 1
+
+
+def test_hold_is_counted(cache, music_dir):
+    path = _download(music_dir, 1)
+    cache.add(path, hold=True)
+    cache.hold(path)
+    cache.release(path)
+    assert cache._in_use == {os.path.basename(path): 1}
+    cache.release(path)
+    assert cache._in_use == {}
+
+
+def test_pinned_track_is_never_evicted(cache, music_dir):
+    pinned = _download(music_dir, 1)
+    cache.add(pinned)
+    cache.pin(pinned)
+    _age(cache, pinned, 0)
+    for n in range(2, 5):
+        cache.add(_download(music_dir, n))
+    assert os.path.exists(pinned)
+
+
+def test_lookup_counts_misses(cache, music_dir):
+    assert not cache.lookup(str(music_dir / "missing_00000009-0000-0000-0000-000000000000.mp3"), hold=True)
+    assert cache._in_use == {}
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_index_adopts_old_downloads_but_not_library(cache, music_dir):
+    download = _download(music_dir, 1)
+    library = music_dir / "My Favourite Song.mp3"
+    library.write_bytes(bytes(SIZE))
+    assert cache.get_stats()["tracks"] == 1
+    assert list(cache._entries) == [os.path.basename(download)]
+    assert not cache.is_download(str(library))
+
+
+def test_index_forgets_deleted_files(cache, music_dir, monkeypatch):
+    path = _download(music_dir, 1)
+    cache.add(path)
+    os.remove(path)
+    # Перезапуск: индекс читается с диска заново
+    monkeypatch.setattr(track_cache, "_entries", {})
+    monkeypatch.setattr(track_cache, "_loaded", False)
+    assert cache.get_stats()["tracks"] == 0
+
+
+def test_eviction_forgets_catalog_path(cache, music_dir, catalog_db):
+    first = _download(music_dir, 1)
+    catalog_db.add_track({"id": "00000001-0000-0000-0000-000000000000", "title": "Song"}, first, 1.0)
+    cache.add(first)
+    _age(cache, first, 0)
+    for n in range(2, 4):
+        cache.add(_download(music_dir, n))
+    assert not os.path.exists(first)
+    assert catalog_db.find_by_path(first) is None
+
+
+def test_files_outside_music_dir_are_ignored(cache, tmp_path):
+    outside = tmp_path / "elsewhere_00000001-0000-0000-0000-000000000000.mp3"
+    outside.write_bytes(bytes(SIZE))
+    cache.add(str(outside))
+    cache.hold(str(outside))
+    assert cache.get_stats()["tracks"] == 0
+    assert cache._in_use == {}
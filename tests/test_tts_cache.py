@@ -0,0 +1,79 @@
+# /opt/radio/tests/test_tts_cache.py
+
+import os
+import pytest
+import tts_cache
+
+SIZE = 1000
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Пустой кэш речи на 2.5 фразы по SIZE байт."""
+    monkeypatch.setattr(tts_cache, "CACHE_DIR", str(tmp_path / "tts"))
+    monkeypatch.setattr(tts_cache, "MAX_SIZE_MB", 2.5 * SIZE / 1048576)
+    monkeypatch.setattr(tts_cache, "_stats", dict.fromkeys(tts_cache._stats, 0))
+    return tts_cache
+
+
+def _store(cache, text, used=None):
+    """Синтезирует (пишет) фразу и кладет в кэш; used — время последнего использования."""
+    cache_key = cache.key(text, "gtts", "ru", None)
+    tmp_path = cache.temp_path(cache_key)
+    with open(tmp_path, "wb") as f:
+        f.write(bytes(SIZE))
+    filepath = cache.store(cache_key, tmp_path)
+    if used is not None:
+        os.utime(filepath, (used, used))
+    return cache_key, filepath
+
+
+def test_key_depends_on_everything_that_changes_sound():
+    base = tts_cache.key("Привет", "gtts", "ru", None)
+    assert base == tts_cache.key("Привет", "gtts", "ru", "")
+    assert len({base,
+                tts_cache.key("Привет!", "gtts", "ru", None),
+                tts_cache.key("Привет", "edge", "ru", None),
+                tts_cache.key("Привет", "gtts", "en", None),
+                tts_cache.key("Привет", "gtts", "ru", "+10%")}) == 5
+
+
+def test_lookup_miss_then_hit(cache):
+    cache_key = cache.key("Новости", "gtts", "ru", None)
+    assert cache.lookup(cache_key) is None
+    _, filepath = _store(cache, "Новости")
+    assert cache.lookup(cache_key) == filepath
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_store_evicts_least_recently_used(cache):
+    _, oldest = _store(cache, "one", used=100)
+    _, newer = _store(cache, "two", used=200)
+    _, latest = _store(cache, "three")
+    assert not os.path.exists(oldest)
+    assert os.path.exists(newer) and os.path.exists(latest)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_lookup_refreshes_phrase(cache):
+    first_key, first = _store(cache, "one", used=100)
+    _, second = _store(cache, "two", used=200)
+    assert cache.lookup(first_key) == first
+    _store(cache, "three")
+    assert os.path.exists(first) and not os.path.exists(second)
+
+
+def test_just_stored_phrase_is_kept(cache, monkeypatch):
+    monkeypatch.setattr(tts_cache, "MAX_SIZE_MB", 0.5 * SIZE / 1048576)
+    _, old = _store(cache, "old", used=100)
+    # Одна фраза уже больше лимита, но только что синтезированную не удаляем
+    _, new = _store(cache, "new")
+    assert os.path.exists(new) and not os.path.exists(old)
+
+
+def test_owns_only_finished_phrases(cache, tmp_path):
+    cache_key, filepath = _store(cache, "one")
+    assert cache.owns(filepath)
+    assert not cache.owns(cache.temp_path(cache_key))
+    assert not cache.owns(str(tmp_path / "dj_speech.mp3"))
@@ -0,0 +1,36 @@
+# /opt/radio/tests/test_utils.py
+
+import os
+import json
+import pytest
+import config
+import artwork
+import utils
+
+
+@pytest.fixture
+def now_playing(tmp_path, monkeypatch):
+    """Пишет now_playing.json в tmp_path и возвращает функцию его чтения."""
+    monkeypatch.setattr(config, "WEB_DIR", str(tmp_path))
+    monkeypatch.setattr(artwork, "ARTWORK_DIR", str(tmp_path / "artwork"))
+
+    def read():
+        with open(os.path.join(config.WEB_DIR, "now_playing.json"), encoding="utf-8") as f:
+            return json.load(f)
+    return read
+
+
+def test_track_without_cover(now_playing):
+    # Трек Suno без image_large_url/image_url приходит с image=None
+    utils.update_now_playing({"title": "Song", "image": None})
+    assert now_playing() == {"title": "Song", "image": "", "status": "live"}
+
+
+def test_remote_cover_is_passed_through(now_playing):
+    utils.update_now_playing({"title": "Song", "image": "https://cdn/cover.jpg"})
+    assert now_playing()["image"] == "https://cdn/cover.jpg"
+
+
+def test_unprocessed_embedded_cover_is_hidden(now_playing):
+    utils.update_now_playing({"title": "Song", "image": artwork.EMBEDDED_PREFIX + "abc"})
+    assert now_playing()["image"] == ""
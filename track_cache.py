@@ -0,0 +1,185 @@
+# /opt/radio/track_cache.py
+
+import os
+import re
+import json
+import time
+import threading
+import config
+import catalog
+from logger import log
+
+# Управляемый кэш скачанных треков в MUSIC_DIR.
+# Кэш ведет только файлы, которые скачал сам (индекс на диске); остальные
+# файлы в папке — это курируемая локальная библиотека, она не удаляется
+# никогда. Когда кэш превышает лимит по размеру или трек давно не звучал,
+# удаляются треки, игравшие раньше всех (LRU по истории эфира). Треки,
+# стоящие в очереди или закрепленные через pin(), не удаляются.
+
+INDEX_FILE = getattr(config, "TRACK_CACHE_INDEX_FILE", os.path.join(config.BASE_DIR, "track_cache.json"))
+MAX_SIZE_MB = float(getattr(config, "TRACK_CACHE_MAX_MB", 2048))
+MAX_AGE_DAYS = float(getattr(config, "TRACK_CACHE_MAX_AGE_DAYS", 30))
+# Скачанные до появления кэша треки узнаем по имени: {title}_{id Suno}.mp3
+_DOWNLOAD_NAME = re.compile(r"_[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\.mp3$")
+
+_entries = {}   # имя файла -> {"size", "added", "last_used", "pinned"}
+_in_use = {}    # имя файла -> сколько раз стоит в очередях
+_lock = threading.Lock()
+_loaded = False
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "evicted_bytes": 0}
+
+
+def _load_index():
+    """Загружает индекс при первом обращении (вызывать под _lock)."""
+    global _entries, _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if os.path.exists(INDEX_FILE):
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                _entries = json.load(f)
+        except Exception as e:
+            log(f"⚠️ [TrackCache] Не удалось прочитать индекс кэша: {e}")
+
+    # Файлы, удаленные вручную, забываем; старые загрузки берем под управление
+    _entries = {name: entry for name, entry in _entries.items()
+                if os.path.exists(os.path.join(config.MUSIC_DIR, name))}
+    try:
+        for name in os.listdir(config.MUSIC_DIR):
+            if name not in _entries and _DOWNLOAD_NAME.search(name):
+                st = os.stat(os.path.join(config.MUSIC_DIR, name))
+                _entries[name] = {"size": st.st_size, "added": st.st_mtime,
+                                  "last_used": st.st_mtime, "pinned": False}
+    except OSError as e:
+        log(f"⚠️ [TrackCache] Не удалось просмотреть {config.MUSIC_DIR}: {e}")
+
+
+def _save_index():
+    tmp_path = INDEX_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_entries, f, ensure_ascii=False)
+    os.replace(tmp_path, INDEX_FILE)
+
+
+def _key(filepath):
+    """Имя в индексе или None, если файл лежит вне MUSIC_DIR."""
+    if os.path.dirname(os.path.abspath(filepath)) != os.path.abspath(config.MUSIC_DIR):
+        return None
+    return os.path.basename(filepath)
+
+
+def is_download(filepath):
+    """Файл — скачанный трек Suno (его ведет кэш, а не локальная библиотека)."""
+    return bool(_DOWNLOAD_NAME.search(os.path.basename(filepath)))
+
+
+def lookup(filepath, hold=False):
+    """
+    Проверяет, есть ли скачанный трек в кэше (считает попадания и промахи).
+    hold=True — найденный трек сразу защищается от удаления, как после hold().
+    """
+    with _lock:
+        _load_index()
+        hit = os.path.exists(filepath)
+        _stats["hits" if hit else "misses"] += 1
+        name = _key(filepath)
+        if hit and hold and name is not None:
+            _in_use[name] = _in_use.get(name, 0) + 1
+        return hit
+
+
+def add(filepath, hold=False):
+    """
+    Регистрирует только что скачанный трек и освобождает место при необходимости.
+    hold=True — трек сразу защищен, как после hold(): освобождение места его не удалит.
+    """
+    name = _key(filepath)
+    if name is None:
+        return
+    with _lock:
+        _load_index()
+        now = time.time()
+        _entries[name] = {"size": os.path.getsize(filepath), "added": now,
+                          "last_used": now, "pinned": False}
+        if hold:
+            _in_use[name] = _in_use.get(name, 0) + 1
+        _evict()
+        _save_index()
+
+
+def pin(filepath, pinned=True):
+    """Закрепляет трек в кэше (или снимает закрепление)."""
+    name = _key(filepath)
+    with _lock:
+        _load_index()
+        if name in _entries:
+            _entries[name]["pinned"] = pinned
+            _save_index()
+
+
+def hold(filepath):
+    """Трек поставлен в очередь — до release() его удалять нельзя."""
+    name = _key(filepath)
+    if name is None:
+        return
+    with _lock:
+        _in_use[name] = _in_use.get(name, 0) + 1
+
+
+def release(filepath):
+    """Трек отыграл: обновляет историю эфира и снимает защиту от удаления."""
+    name = _key(filepath)
+    if name is None:
+        return
+    with _lock:
+        _load_index()
+        if _in_use.get(name, 0) > 1:
+            _in_use[name] -= 1
+        else:
+            _in_use.pop(name, None)
+        if name in _entries:
+            _entries[name]["last_used"] = time.time()
+            _evict()
+            _save_index()
+
+
+def _evict():
+    """Удаляет устаревшие треки, затем самые давно игравшие, пока кэш не влезет в лимит."""
+    now = time.time()
+    max_size = MAX_SIZE_MB * 1024 * 1024
+    total = sum(entry["size"] for entry in _entries.values())
+    candidates = sorted(
+        (name for name, entry in _entries.items() if not entry["pinned"] and name not in _in_use),
+        key=lambda name: _entries[name]["last_used"]
+    )
+
+    for name in candidates:
+        expired = MAX_AGE_DAYS > 0 and now - _entries[name]["last_used"] > MAX_AGE_DAYS * 86400
+        if not expired and total <= max_size:
+            break  # Дальше только более свежие треки
+        try:
+            os.remove(os.path.join(config.MUSIC_DIR, name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log(f"⚠️ [TrackCache] Не удалось удалить {name}: {e}")
+            continue
+        catalog.forget_path(os.path.join(config.MUSIC_DIR, name))
+        size = _entries.pop(name)["size"]
+        total -= size
+        _stats["evictions"] += 1
+        _stats["evicted_bytes"] += size
+        log(f"🧹 [TrackCache] Удален из кэша: {name} ({size / 1048576:.1f} МБ)")
+
+
+def get_stats():
+    """Попадания, промахи, удаления и текущий размер кэша."""
+    with _lock:
+        _load_index()
+        stats = dict(_stats)
+        stats["tracks"] = len(_entries)
+        stats["size_mb"] = sum(entry["size"] for entry in _entries.values()) / 1048576
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
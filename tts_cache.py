@@ -0,0 +1,98 @@
+# /opt/radio/tts_cache.py
+
+import os
+import hashlib
+import threading
+import config
+from logger import log
+
+# Кэш синтезированной речи DJ.
+# Файл называется хэшем (текст, движок, голос, скорость): одинаковая фраза
+# с теми же настройками синтезируется один раз, дальше берется с диска без
+# обращения к TTS. Кэш ограничен по размеру; удаляются фразы, которые
+# дольше всех не звучали (время использования — mtime файла).
+
+CACHE_DIR = getattr(config, "TTS_CACHE_DIR", os.path.join(config.BASE_DIR, "tts_cache"))
+MAX_SIZE_MB = float(getattr(config, "TTS_CACHE_MAX_MB", 200))
+ENABLED = MAX_SIZE_MB > 0
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def key(text, engine, voice, rate):
+    """Ключ фразы: хэш всего, от чего зависит звучание."""
+    raw = "\0".join((text, engine, voice or "", rate or ""))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def path_for(cache_key):
+    return os.path.join(CACHE_DIR, f"{cache_key}.mp3")
+
+
+def temp_path(cache_key):
+    """Куда синтезировать фразу перед store() (в той же папке — переименование атомарно)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, f"{cache_key}.{threading.get_ident()}.part")
+
+
+def owns(filepath):
+    """Файл — готовая фраза из кэша: удалять его после эфира нельзя."""
+    return (filepath.endswith(".mp3")
+            and os.path.dirname(os.path.abspath(filepath)) == os.path.abspath(CACHE_DIR))
+
+
+def lookup(cache_key):
+    """Путь к готовой фразе или None. Попадание отмечает фразу как недавно использованную."""
+    filepath = path_for(cache_key)
+    with _lock:
+        try:
+            os.utime(filepath)
+        except OSError:
+            _stats["misses"] += 1
+            return None
+        _stats["hits"] += 1
+        return filepath
+
+
+def store(cache_key, tmp_path):
+    """Переносит синтезированный файл в кэш и освобождает место при необходимости. Возвращает путь в кэше."""
+    filepath = path_for(cache_key)
+    with _lock:
+        os.replace(tmp_path, filepath)
+        _evict(keep=filepath)
+    return filepath
+
+
+def _evict(keep):
+    """Удаляет самые давно звучавшие фразы, пока кэш не влезет в лимит (вызывать под _lock)."""
+    entries = []
+    total = 0
+    for entry in os.scandir(CACHE_DIR):
+        if entry.is_file() and entry.name.endswith(".mp3"):
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+    max_size = MAX_SIZE_MB * 1024 * 1024
+    for _, size, filepath in sorted(entries):
+        if total <= max_size:
+            break
+        if filepath == keep:
+            continue
+        try:
+            os.remove(filepath)
+        except OSError as e:
+            log(f"⚠️ [TTSCache] Не удалось удалить {filepath}: {e}")
+            continue
+        total -= size
+        _stats["evictions"] += 1
+
+
+def get_stats():
+    """Попадания, промахи и удаления кэша речи."""
+    with _lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
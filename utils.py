@@ -3,6 +3,7 @@
 import os
 import json
 import config
+import artwork
 from logger import log
 
 def update_now_playing(track_info):
@@ -10,11 +11,18 @@ def update_now_playing(track_info):
     Обновляет JSON-файл с информацией о текущем треке.
     Используется Оркестратором для обновления статуса на сайте.
     """
+    image = track_info.get('image') or ""  # У трека Suno без обложки приходит None
     data = {
         "title": track_info.get('title', 'Unknown Track'),
-        "image": track_info.get('image', ''),
+        "image": image,
         "status": "live"
     }
+    # Если обложка уже в локальном кэше — отдаем уменьшенные варианты с нашего сервера
+    local_art = artwork.variants(image)
+    if local_art:
+        data.update(local_art)
+    elif image.startswith(artwork.EMBEDDED_PREFIX):
+        data["image"] = ""  # Встроенная обложка еще не обработана (или нет Pillow) — отдать нечего
     try:
         filepath = os.path.join(config.WEB_DIR, "now_playing.json")
         with open(filepath, "w", encoding="utf-8") as f: